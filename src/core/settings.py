@@ -158,6 +158,79 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = "media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Fila de processamento de áudio (psy_records.jobs)
+AUDIO_JOBS_DIR = os.getenv("AUDIO_JOBS_DIR", os.path.join(MEDIA_ROOT, "audio_jobs"))
+# Worker em thread dentro do processo web; desative quando houver workers dedicados
+# (`python manage.py process_audio_jobs`)
+AUDIO_JOBS_EMBEDDED_WORKER = os.getenv("AUDIO_JOBS_EMBEDDED_WORKER", "True") == "True"
+AUDIO_JOBS_POLL_INTERVAL = float(os.getenv("AUDIO_JOBS_POLL_INTERVAL", "2"))
+AUDIO_JOBS_HEARTBEAT_INTERVAL = int(os.getenv("AUDIO_JOBS_HEARTBEAT_INTERVAL", "30"))
+# Jobs em execução sem heartbeat por esse tempo (segundos) voltam para a fila
+AUDIO_JOBS_STALE_AFTER = int(os.getenv("AUDIO_JOBS_STALE_AFTER", "300"))
+AUDIO_JOBS_MAX_ATTEMPTS = int(os.getenv("AUDIO_JOBS_MAX_ATTEMPTS", "3"))
+# Jobs simultâneos por worker (cada job roda ffmpeg e mantém o áudio em memória)
+AUDIO_JOBS_CONCURRENCY = int(os.getenv("AUDIO_JOBS_CONCURRENCY", "1"))
+# Limites de admissão: acima deles o upload é recusado em vez de enfileirado
+AUDIO_JOBS_MAX_QUEUED = int(os.getenv("AUDIO_JOBS_MAX_QUEUED", "50"))
+AUDIO_JOBS_MAX_QUEUED_PER_USER = int(os.getenv("AUDIO_JOBS_MAX_QUEUED_PER_USER", "10"))
+# Transcreve os segmentos já recebidos enquanto a sessão ainda é gravada
+AUDIO_INCREMENTAL_TRANSCRIPTION = os.getenv("AUDIO_INCREMENTAL_TRANSCRIPTION", "True") == "True"
+# Chamadas de transcrição simultâneas por job (um segmento por chamada)
+AUDIO_TRANSCRIPTION_FANOUT = int(os.getenv("AUDIO_TRANSCRIPTION_FANOUT", "3"))
+# Sobreposição entre segmentos para que nenhum corte caia no meio de uma frase
+AUDIO_SEGMENT_OVERLAP_SECONDS = int(os.getenv("AUDIO_SEGMENT_OVERLAP_SECONDS", "10"))
+# Remove silêncios longos antes de enviar o áudio (exige re-encodificar)
+AUDIO_TRIM_SILENCE = os.getenv("AUDIO_TRIM_SILENCE", "False") == "True"
+# Abaixo desse volume (dB) e por pelo menos esse tempo (segundos), o trecho é silêncio
+AUDIO_SILENCE_THRESHOLD_DB = int(os.getenv("AUDIO_SILENCE_THRESHOLD_DB", "-40"))
+AUDIO_SILENCE_MIN_SECONDS = float(os.getenv("AUDIO_SILENCE_MIN_SECONDS", "2"))
+# Cache de transcrições por conteúdo do áudio (psy_records.transcription_cache)
+AUDIO_TRANSCRIPTION_CACHE_MAX_AGE_DAYS = int(os.getenv("AUDIO_TRANSCRIPTION_CACHE_MAX_AGE_DAYS", "30"))
+AUDIO_TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv("AUDIO_TRANSCRIPTION_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Clientes do Gemini reaproveitados por API key (psy_records.gemini_clients)
+GEMINI_CLIENT_POOL_SIZE = int(os.getenv("GEMINI_CLIENT_POOL_SIZE", "32"))
+GEMINI_CLIENT_IDLE_TTL = int(os.getenv("GEMINI_CLIENT_IDLE_TTL", "600"))
+# Cota de disco dos áudios e saídas do ffmpeg em AUDIO_JOBS_DIR (psy_records.scratch); 0 = sem limite
+AUDIO_SCRATCH_MAX_BYTES = int(os.getenv("AUDIO_SCRATCH_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Idade mínima (segundos) para `clean_audio_scratch` remover arquivos sem job em andamento
+# e descartar uploads em partes sem nenhuma parte nova
+AUDIO_SCRATCH_ORPHAN_AGE = int(os.getenv("AUDIO_SCRATCH_ORPHAN_AGE", str(6 * 60 * 60)))
+# Contexto clínico enviado ao modelo em cada resumo (psy_records.history): acima do orçamento
+# (tokens estimados), as sessões além das últimas PATIENT_HISTORY_RECENT_SESSIONS são resumidas
+PATIENT_HISTORY_TOKEN_BUDGET = int(os.getenv("PATIENT_HISTORY_TOKEN_BUDGET", "4000"))
+PATIENT_HISTORY_RECENT_SESSIONS = int(os.getenv("PATIENT_HISTORY_RECENT_SESSIONS", "5"))
+# Por quanto tempo (segundos) uma chave de idempotência de envio é lembrada (psy_records.idempotency)
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", str(24 * 60 * 60)))
+# Os áudios das sessões vão direto para AUDIO_JOBS_DIR (psy_records.upload_handlers)
+FILE_UPLOAD_HANDLERS = [
+    "psy_records.upload_handlers.AudioUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+# Servidor alternativo para a API do Gemini (vazio = API oficial)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+# Limite de requisições por API key e retentativas em 429/5xx (psy_records.rate_limit)
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "4"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_SECONDS = float(os.getenv("GEMINI_BACKOFF_SECONDS", "2"))
+GEMINI_BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "60"))
+# Acompanhamento do processamento nas páginas (psy_records.status)
+AUDIO_STATUS_POLL_INTERVAL = float(os.getenv("AUDIO_STATUS_POLL_INTERVAL", "1"))
+# Duração máxima de cada conexão SSE/long-poll. Cada conexão aberta ocupa uma thread do
+# gunicorn durante esse tempo: em produção use workers com threads (`--worker-class gthread
+# --threads N`, como no Dockerfile); com workers síncronos, poucas abas abertas bloqueiam o site
+AUDIO_STATUS_STREAM_SECONDS = int(os.getenv("AUDIO_STATUS_STREAM_SECONDS", "25"))
+# Jobs concluídos há menos que isso ainda aparecem (para a página saber que terminaram)
+AUDIO_STATUS_RECENT_SECONDS = int(os.getenv("AUDIO_STATUS_RECENT_SECONDS", "300"))
+# Gera o prontuário em streaming, mostrando o texto parcial na página
+AUDIO_SUMMARY_STREAMING = os.getenv("AUDIO_SUMMARY_STREAMING", "True") == "True"
+# Intervalo mínimo (segundos) entre gravações do texto parcial no banco
+AUDIO_PARTIAL_SAVE_INTERVAL = float(os.getenv("AUDIO_PARTIAL_SAVE_INTERVAL", "0.5"))
+
+# Token (Bearer) para o Prometheus coletar /metrics; vazio = só usuários da equipe
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -18,11 +18,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
 
+from psy_records.views import MetricsView
+
 urlpatterns = [
     path('', include('patients.urls')),
     path('user/', include('user.urls')),
     path('records/', include('psy_records.urls')),
     path('admin/', admin.site.urls),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 def root_redirect(request):
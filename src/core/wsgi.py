@@ -13,4 +13,8 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+# Retoma jobs de áudio pendentes ao subir o processo web
+from psy_records.jobs import ensure_embedded_worker  # noqa: E402
+
+ensure_embedded_worker()
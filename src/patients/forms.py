@@ -13,5 +13,9 @@ class PatientForm(forms.ModelForm):
 class PatientSummaryForm(forms.ModelForm):
     class Meta:
         model = Patient
-        fields = ['objectives', 'clinical_demand', 'clinical_procedures', 'clinical_analysis', 'clinical_conclusion']
+        fields = ['objectives', 'clinical_demand', 'clinical_procedures', 'clinical_analysis', 'clinical_conclusion', 'version']
         exclude = ['first_name', 'second_name', 'full_name', 'birth_date']
+        # Versão lida quando a página foi aberta: a gravação é recusada se um processamento alterou os campos
+        widgets = {
+            'version': forms.HiddenInput(),
+        }
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_patient_clinical_analysis_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Versão'),
+        ),
+    ]
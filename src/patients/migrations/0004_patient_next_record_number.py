@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def set_next_record_number(apps, schema_editor):
+    Patient = apps.get_model('patients', 'Patient')
+    PsyRecord = apps.get_model('psy_records', 'PsyRecord')
+    last = (
+        PsyRecord.objects.filter(patient=OuterRef('pk'))
+        .order_by()
+        .values('patient')
+        .annotate(last=Max('record_number'))
+        .values('last')
+    )
+    Patient.objects.update(next_record_number=Coalesce(Subquery(last), Value(0)) + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0003_patient_version'),
+        ('psy_records', '0013_clinical_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='next_record_number',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Próximo número de prontuário'),
+        ),
+        migrations.RunPython(set_next_record_number, migrations.RunPython.noop),
+    ]
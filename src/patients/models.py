@@ -1,6 +1,29 @@
 from django.db import models
+from django.db.models import Count, F, Max
 from django.conf import settings
 
+# Campos clínicos acumulados sessão a sessão (ver psy_records.history)
+CLINICAL_FIELDS = (
+    'objectives',
+    'clinical_demand',
+    'clinical_procedures',
+    'clinical_analysis',
+    'clinical_conclusion',
+)
+
+
+class PatientQuerySet(models.QuerySet):
+    def with_record_stats(self):
+        """
+        Anota o número de prontuários e a data da última sessão na mesma
+        consulta dos pacientes, para as listagens não fazerem um COUNT por linha.
+        """
+        return self.annotate(
+            record_total=Count('psy_records'),
+            last_session_date=Max('psy_records__date'),
+        )
+
+
 class Patient(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -18,6 +41,12 @@ class Patient(models.Model):
     clinical_procedures = models.TextField(verbose_name='Procedimentos', blank=True, null=True)
     clinical_analysis = models.TextField(verbose_name='Análise', blank=True, null=True)
     clinical_conclusion = models.TextField(verbose_name='Conclusões', blank=True, null=True)
+    # Incrementada a cada gravação dos campos clínicos (controle de concorrência otimista)
+    version = models.PositiveIntegerField('Versão', default=0)
+    # Número do próximo prontuário (ver psy_records.models.allocate_record_numbers)
+    next_record_number = models.PositiveIntegerField('Próximo número de prontuário', default=1, editable=False)
+
+    objects = PatientQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         if not self.full_name:
@@ -27,8 +56,25 @@ class Patient(models.Model):
                 self.full_name = self.first_name
         super().save(*args, **kwargs)
 
+    def save_clinical_fields(self) -> bool:
+        """
+        Grava os campos clínicos somente se eles não mudaram desde que o
+        paciente foi lido (mesma `version`). Retorna False em caso de conflito,
+        sem gravar nada: quem chamou relê o paciente e decide o que fazer.
+        """
+        updated = Patient.objects.filter(pk=self.pk, version=self.version).update(
+            version=F('version') + 1,
+            **{field: getattr(self, field) for field in CLINICAL_FIELDS},
+        )
+        if updated:
+            self.version += 1
+        return bool(updated)
+
     @property
     def records_count(self):
+        # Anotado por Patient.objects.with_record_stats(); sem a anotação, uma consulta
+        if 'record_total' in self.__dict__:
+            return self.record_total
         return self.psy_records.count()
 
     def __str__(self):
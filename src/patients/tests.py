@@ -1,3 +1,100 @@
+from datetime import date
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from patients.models import Patient
+from psy_records.models import PsyRecord
+from user.models import User
+
+
+class TestPatientDetailView(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='teste', password='senha123')
+        self.patient = Patient.objects.create(user=user, first_name='Paciente', birth_date=date(1990, 1, 1))
+        self.client.force_login(user)
+
+    def post_summary(self, version, objectives):
+        return self.client.post(reverse('patients:detail', args=[self.patient.pk]), {
+            'objectives': objectives,
+            'clinical_demand': '',
+            'clinical_procedures': '',
+            'clinical_analysis': '',
+            'clinical_conclusion': '',
+            'version': version,
+        })
+
+    def test_edit_saves_clinical_fields(self):
+        response = self.post_summary(0, 'Editado.')
+
+        self.assertEqual(response.status_code, 302)
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.objectives, 'Editado.')
+        self.assertEqual(self.patient.version, 1)
+
+    def test_edit_of_outdated_version_is_rejected(self):
+        self.patient.objectives = 'Acrescentado pelo processamento.'
+        self.patient.save_clinical_fields()
+
+        response = self.post_summary(0, 'Editado.')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.objectives, 'Acrescentado pelo processamento.')
+
+
+class TestPatientUpdateView(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='teste', password='senha123')
+        self.patient = Patient.objects.create(user=user, first_name='Paciente', birth_date=date(1990, 1, 1))
+        self.client.force_login(user)
+
+    def test_edit_writes_only_personal_data(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('patients:update', args=[self.patient.pk]), {
+                'first_name': 'Outro',
+                'second_name': '',
+                'full_name': 'Outro Nome',
+                'birth_date': '1990-01-01',
+            })
+
+        self.assertEqual(response.status_code, 302)
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE'))
+        for field in ('objectives', 'version', 'next_record_number'):
+            self.assertNotIn(field, update)
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.full_name, 'Outro Nome')
+
+
+class TestPatientListView(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='teste', password='senha123')
+        self.client.force_login(self.user)
+
+    def add_patient(self, name, sessions=()):
+        patient = Patient.objects.create(user=self.user, first_name=name, birth_date=date(1990, 1, 1))
+        PsyRecord.objects.bulk_create([PsyRecord(patient=patient, date=session) for session in sessions])
+        return patient
+
+    def test_list_shows_record_stats(self):
+        self.add_patient('Ana', [date(2025, 1, 1), date(2025, 3, 2)])
+
+        response = self.client.get(reverse('patients:list'))
+
+        self.assertContains(response, '2 prontuários')
+        self.assertContains(response, 'última sessão em 02/03/2025')
+
+    def test_queries_do_not_grow_with_patients(self):
+        self.add_patient('Ana', [date(2025, 1, 1)])
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('patients:list'))
+
+        for name in ('Bruno', 'Carla', 'Davi'):
+            self.add_patient(name, [date(2025, 1, 1), date(2025, 2, 1)])
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse('patients:list'))
 
-# Create your tests here.
+        self.assertEqual(len(many), len(few))
@@ -5,6 +5,7 @@ from django.views.generic import (
     DeleteView,
 )
 from django.core.paginator import Paginator
+from django.http import HttpResponseRedirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from .models import Patient
@@ -18,7 +19,7 @@ class PatientListView(LoginRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        return Patient.objects.filter(user=self.request.user).order_by('full_name')
+        return Patient.objects.filter(user=self.request.user).with_record_stats().order_by('full_name')
 
 
 class PatientCreateView(LoginRequiredMixin, CreateView):
@@ -44,7 +45,18 @@ class PatientDetailView(LoginRequiredMixin, UpdateView):
         return reverse_lazy("patients:detail", kwargs={"pk": self.object.pk})
 
     def get_queryset(self):
-        return Patient.objects.filter(user=self.request.user)
+        return Patient.objects.filter(user=self.request.user).with_record_stats()
+
+    def form_valid(self, form):
+        self.object = form.save(commit=False)
+        if not self.object.save_clinical_fields():
+            form.add_error(
+                None,
+                "Os dados clínicos deste paciente foram atualizados por um prontuário processado "
+                "enquanto você editava. Recarregue a página para ver a versão atual antes de salvar.",
+            )
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -53,10 +65,12 @@ class PatientDetailView(LoginRequiredMixin, UpdateView):
         records = patient.psy_records.all().order_by('-record_number')
 
         paginator = Paginator(records, self.paginate_by)
+        # O total já veio anotado com o paciente; evita o COUNT do paginador
+        paginator.count = patient.records_count
         page_number = self.request.GET.get('page')
         page_obj = paginator.get_page(page_number)
 
-        context['form'] = kwargs.get('form') or PatientSummaryForm(instance=self.get_object())
+        context['form'] = kwargs.get('form') or PatientSummaryForm(instance=patient)
 
         context['records_page'] = page_obj
         context['is_paginated'] = page_obj.has_other_pages()
@@ -75,6 +89,12 @@ class PatientUpdateView(LoginRequiredMixin, UpdateView):
     def get_queryset(self):
         return Patient.objects.filter(user=self.request.user)
 
+    def form_valid(self, form):
+        # Só os dados pessoais: os campos clínicos podem ter mudado desde que o formulário foi aberto
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=[*form.Meta.fields])
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class PatientDeleteView(LoginRequiredMixin, DeleteView):
     model = Patient
@@ -1,3 +1,18 @@
 from django.contrib import admin
 
+from .models import AudioJob, AudioUpload
+
 # Register your models here.
+
+
+@admin.register(AudioJob)
+class AudioJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "record", "user", "status", "attempts", "created_at", "finished_at")
+    list_filter = ("status", "kind")
+    readonly_fields = ("created_at", "started_at", "heartbeat_at", "finished_at")
+
+
+@admin.register(AudioUpload)
+class AudioUploadAdmin(admin.ModelAdmin):
+    list_display = ("id", "patient", "user", "status", "next_index", "size", "updated_at")
+    list_filter = ("status",)
@@ -0,0 +1,159 @@
+"""
+Servidor local que imita o endpoint `generateContent` do Gemini.
+
+Serve para testes de carga sem gastar a cota real: com
+GEMINI_BASE_URL=http://127.0.0.1:<porta>, o `google.genai` da aplicação
+passa a falar com este servidor. As respostas seguem os schemas usados na
+pipeline (`{"transcription": ...}` para áudio e `ResultPsySummaryData` para o
+resumo), com latência e erros configuráveis.
+
+Uso: `python manage.py fake_gemini --latency 2 --error-rate 0.05`.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT = re.compile(r"/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)")
+
+TRANSCRIPTION_TEXT = (
+    "Psicólogo: Como foi a sua semana?\n"
+    "Paciente: Foi mais tranquila, consegui dormir melhor e voltei a caminhar."
+)
+SUMMARY = {
+    "psy_record": "Paciente relata melhora do sono e retomada de atividade física.",
+    "objectives": "Reduzir sintomas de ansiedade.",
+    "clinical_demand": "Ansiedade e insônia.",
+    "clinical_procedures": "Terapia cognitivo-comportamental.",
+    "clinical_analysis": "Evolução favorável.",
+    "clinical_conclusion": "Manter acompanhamento semanal.",
+}
+
+
+@dataclass
+class FakeGeminiConfig:
+    # Latência fixa de cada resposta, mais uma parte aleatória de até `jitter`
+    latency: float = 0.5
+    jitter: float = 0.0
+    # Latência extra por MB de áudio enviado (simula o tempo de transcrição)
+    latency_per_mb: float = 0.0
+    # Fração das requisições que falham com `error_status`
+    error_rate: float = 0.0
+    error_status: int = 429
+    retry_after: int | None = 1
+    # Quantos pedaços cada resposta em streaming tem
+    stream_chunks: int = 5
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    server: "FakeGeminiServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        match = ENDPOINT.search(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not match:
+            self._send_json(404, _error(404, "NOT_FOUND", f"Rota desconhecida: {self.path}"))
+            return
+
+        config = self.server.config
+        request = json.loads(body or b"{}")
+        time.sleep(
+            config.latency
+            + random.uniform(0, config.jitter)
+            + config.latency_per_mb * _inline_bytes(request) / (1024 * 1024)
+        )
+        self.server.count_request()
+
+        if random.random() < config.error_rate:
+            headers = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else {}
+            status = "RESOURCE_EXHAUSTED" if config.error_status == 429 else "UNAVAILABLE"
+            self._send_json(config.error_status, _error(config.error_status, status, "Erro simulado"), headers)
+            return
+
+        text = json.dumps(_answer(request), ensure_ascii=False)
+        if match.group("method") == "streamGenerateContent":
+            self._send_stream(text)
+        else:
+            self._send_json(200, _candidate(text))
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, text: str):
+        size = max(1, -(-len(text) // max(1, self.server.config.stream_chunks)))
+        events = b"".join(
+            f"data: {json.dumps(_candidate(text[i:i + size]))}\r\n\r\n".encode()
+            for i in range(0, len(text), size)
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(events)))
+        self.end_headers()
+        self.wfile.write(events)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: FakeGeminiConfig | None = None):
+        super().__init__(address, FakeGeminiHandler)
+        self.config = config or FakeGeminiConfig()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+def _inline_bytes(request: dict) -> int:
+    """Tamanho aproximado (base64) do áudio enviado na requisição."""
+    total = 0
+    for content in request.get("contents", []):
+        for part in content.get("parts", []):
+            inline = part.get("inlineData") or part.get("inline_data") or {}
+            total += len(inline.get("data", "")) * 3 // 4
+    return total
+
+
+def _answer(request: dict) -> dict:
+    if _inline_bytes(request):
+        return {"transcription": TRANSCRIPTION_TEXT}
+    return SUMMARY
+
+
+def _candidate(text: str) -> dict:
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": text}]},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "modelVersion": "fake-gemini",
+    }
+
+
+def _error(code: int, status: str, message: str) -> dict:
+    return {"error": {"code": code, "message": message, "status": status}}
@@ -0,0 +1,90 @@
+"""
+Clientes do Gemini reaproveitados entre jobs.
+
+Criar um `genai.Client` por job refaz a configuração e descarta o pool de
+conexões HTTP (e o handshake TLS) a cada sessão. Aqui cada API key tem um
+cliente por processo, identificado pelo hash da chave (a chave em si não
+fica como índice). Os clientes sem uso há mais de GEMINI_CLIENT_IDLE_TTL
+segundos e, acima de GEMINI_CLIENT_POOL_SIZE, os menos usados são
+descartados.
+"""
+import hashlib
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+from google import genai
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+_clients: "OrderedDict[str, tuple[genai.Client, float]]" = OrderedDict()
+# Hash da key de cada cliente criado, inclusive dos que já saíram do pool
+_client_keys: "weakref.WeakKeyDictionary[genai.Client, str]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def get_client(api_key: str) -> genai.Client:
+    """Cliente do Gemini para a API key, reaproveitado entre chamadas e threads."""
+    key = _key(api_key)
+    now = time.monotonic()
+    with _lock:
+        _evict_idle(now)
+        entry = _clients.pop(key, None)
+        if entry:
+            client = entry[0]
+        else:
+            client = _new_client(api_key)
+            _client_keys[client] = key
+        _clients[key] = (client, now)
+        while len(_clients) > settings.GEMINI_CLIENT_POOL_SIZE:
+            # Não fecha o cliente: outra thread pode estar no meio de uma chamada;
+            # as conexões são liberadas quando a última referência deixa de existir
+            _clients.popitem(last=False)
+    return client
+
+
+def key_hash(client) -> str | None:
+    """Hash da API key de um cliente criado por `get_client` (None para outros objetos)."""
+    try:
+        return _client_keys.get(client)
+    except TypeError:
+        return None
+
+
+def _new_client(api_key: str) -> genai.Client:
+    # GEMINI_BASE_URL aponta para outro servidor (ex.: `manage.py fake_gemini` nos testes de carga)
+    if settings.GEMINI_BASE_URL:
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=settings.GEMINI_BASE_URL))
+    return genai.Client(api_key=api_key)
+
+
+def invalidate_client(api_key: str) -> None:
+    """Descarta o cliente da chave (ex.: o usuário trocou a API key)."""
+    if not api_key:
+        return
+    with _lock:
+        if _clients.pop(_key(api_key), None):
+            logger.info("Cliente do Gemini descartado após troca de API key")
+
+
+def clear_clients() -> None:
+    with _lock:
+        _clients.clear()
+
+
+def _evict_idle(now: float) -> None:
+    ttl = settings.GEMINI_CLIENT_IDLE_TTL
+    # Em ordem do uso mais antigo para o mais recente
+    while _clients:
+        key, (_, last_used) = next(iter(_clients.items()))
+        if now - last_used <= ttl:
+            break
+        del _clients[key]
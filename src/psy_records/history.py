@@ -0,0 +1,234 @@
+"""
+Histórico clínico do paciente e o contexto limitado enviado ao modelo.
+
+Os campos clínicos do paciente (objetivos, demanda, ...) só crescem: cada
+sessão acrescenta um trecho. Mandar o texto inteiro em todo resumo deixava
+cada sessão mais lenta e mais cara que a anterior. Aqui:
+
+- `ClinicalHistoryEntry` guarda o histórico completo, um registro por sessão
+  (e uma "base" com o texto dos campos quando ele muda fora do processamento,
+  por edição manual ou dados anteriores ao histórico);
+- o modelo recebe `patient_context`: o resumo do histórico antigo
+  (`ClinicalDigest`) mais o texto das últimas PATIENT_HISTORY_RECENT_SESSIONS
+  sessões;
+- quando esse contexto passa de PATIENT_HISTORY_TOKEN_BUDGET, as sessões mais
+  antigas são incorporadas ao resumo (`plan_compaction`/`apply_compaction`;
+  a chamada ao Gemini fica em `pipeline.compact_patient_history`), só com o
+  resumo anterior e o que ainda não tinha sido resumido.
+
+Os campos do próprio paciente continuam com o texto completo, como o
+psicólogo vê e edita.
+"""
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from patients.models import CLINICAL_FIELDS
+
+from .models import ClinicalDigest, ClinicalHistoryEntry
+
+logger = logging.getLogger(__name__)
+
+FIELDS = CLINICAL_FIELDS
+
+# Releituras do paciente quando os campos mudam no meio da gravação de uma sessão
+MERGE_ATTEMPTS = 5
+
+# Aproximação para português: ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+
+
+class ConcurrentUpdate(Exception):
+    """Os campos do paciente continuaram mudando enquanto a sessão era gravada."""
+
+
+def patient_context(patient) -> dict:
+    """Campos clínicos enviados ao modelo: resumo do histórico antigo e sessões recentes."""
+    digest = sync_baseline(patient)
+    return _context(digest, _window(patient, digest))
+
+
+def estimate_tokens(context: dict) -> int:
+    return sum(len(text) for text in context.values()) // CHARS_PER_TOKEN
+
+
+def sync_baseline(patient) -> ClinicalDigest:
+    """
+    Resumo do histórico do paciente, recomeçado a partir de uma nova base
+    quando os campos foram alterados fora do processamento das sessões.
+    """
+    digest, _ = ClinicalDigest.objects.get_or_create(patient=patient)
+    current = fields_sha256(patient)
+    if digest.fields_sha256 != current:
+        logger.info(f"Campos clínicos do paciente {patient.pk} alterados fora do histórico; nova base")
+        ClinicalHistoryEntry.objects.create(
+            patient=patient,
+            kind=ClinicalHistoryEntry.Kind.BASELINE,
+            fields={field: getattr(patient, field) or "" for field in FIELDS},
+        )
+        digest.summary = {}
+        digest.compacted_through = None
+        digest.fields_sha256 = current
+        digest.save(update_fields=["summary", "compacted_through", "fields_sha256", "updated_at"])
+    return digest
+
+
+def record_session(patient, record, additions: dict) -> None:
+    """
+    Acrescenta aos campos do paciente o texto novo da sessão e o registra no
+    histórico. Gerar de novo o prontuário da mesma sessão substitui o trecho
+    que ela tinha acrescentado.
+
+    A gravação usa a `version` do paciente: se os campos mudaram depois de
+    lidos (edição manual ou outro processamento), o paciente é relido e o
+    acréscimo é refeito sobre o texto atual, em vez de sobrescrevê-lo.
+
+    Deve rodar dentro da transação que grava o prontuário.
+    """
+    additions = {field: (additions.get(field) or "").strip() for field in FIELDS}
+    for attempt in range(1, MERGE_ATTEMPTS + 1):
+        if _merge_session(patient, record, additions):
+            return
+        logger.info(
+            f"Campos do paciente {patient.pk} alterados durante a gravação da sessão "
+            f"(tentativa {attempt}); aplicando de novo sobre o texto atual"
+        )
+        patient.refresh_from_db(fields=[*FIELDS, "version"])
+    raise ConcurrentUpdate(f"Campos do paciente {patient.pk} alterados repetidamente durante a gravação")
+
+
+def _merge_session(patient, record, additions: dict) -> bool:
+    digest = sync_baseline(patient)
+    entry = ClinicalHistoryEntry.objects.filter(
+        record=record, kind=ClinicalHistoryEntry.Kind.SESSION
+    ).first()
+    previous = entry.fields if entry else {}
+
+    for field in FIELDS:
+        setattr(patient, field, _replace_or_append(getattr(patient, field) or "", previous.get(field, ""), additions[field]))
+    if not patient.save_clinical_fields():
+        return False
+
+    if entry:
+        entry.fields = additions
+        entry.save(update_fields=["fields"])
+    else:
+        ClinicalHistoryEntry.objects.create(patient=patient, record=record, fields=additions)
+    digest.fields_sha256 = fields_sha256(patient)
+    digest.save(update_fields=["fields_sha256", "updated_at"])
+    return True
+
+
+def extract_additions(sent: dict, returned: dict) -> dict:
+    """
+    O texto novo de cada campo na resposta do modelo. A resposta já deve
+    trazer só o acréscimo; se ele repetir o contexto enviado, a repetição é
+    descartada.
+    """
+    return {field: _addition(sent.get(field) or "", returned.get(field) or "") for field in FIELDS}
+
+
+@dataclass(frozen=True)
+class CompactionPlan:
+    patient_id: int
+    digest_id: int
+    # Resumo sobre o qual o novo foi calculado; se mudar até o fim, o novo é descartado
+    previous_through_id: int | None
+    through_id: int
+    payload: dict
+
+
+def plan_compaction(patient) -> CompactionPlan | None:
+    """
+    O que incorporar ao resumo para o contexto voltar ao orçamento de tokens;
+    None se ele já cabe ou se só restam as sessões recentes.
+    """
+    digest = sync_baseline(patient)
+    entries = _window(patient, digest)
+    tokens = estimate_tokens(_context(digest, entries))
+    if tokens <= settings.PATIENT_HISTORY_TOKEN_BUDGET:
+        return None
+
+    keep = settings.PATIENT_HISTORY_RECENT_SESSIONS
+    foldable = entries[:max(0, len(entries) - keep)]
+    if not foldable:
+        logger.warning(
+            f"Contexto do paciente {patient.pk} com ~{tokens} tokens, mas só há sessões recentes para resumir"
+        )
+        return None
+
+    return CompactionPlan(
+        patient_id=patient.pk,
+        digest_id=digest.pk,
+        previous_through_id=digest.compacted_through_id,
+        through_id=foldable[-1].pk,
+        payload={
+            "previous_summary": {field: digest.summary.get(field, "") for field in FIELDS},
+            "entries": [{field: entry.fields.get(field, "") for field in FIELDS} for entry in foldable],
+            "max_chars_per_field": summary_chars_per_field(),
+        },
+    )
+
+
+def apply_compaction(plan: CompactionPlan, summary: dict) -> bool:
+    """Grava o novo resumo, a menos que o histórico tenha mudado de base enquanto ele era gerado."""
+    rebased = ClinicalHistoryEntry.objects.filter(
+        patient_id=plan.patient_id, kind=ClinicalHistoryEntry.Kind.BASELINE, pk__gt=plan.through_id
+    ).exists()
+    if rebased:
+        return False
+    updated = ClinicalDigest.objects.filter(
+        pk=plan.digest_id, compacted_through_id=plan.previous_through_id
+    ).update(
+        summary={field: (summary.get(field) or "").strip() for field in FIELDS},
+        compacted_through_id=plan.through_id,
+    )
+    return bool(updated)
+
+
+def summary_chars_per_field() -> int:
+    """Tamanho máximo de cada campo do resumo: metade do orçamento fica para as sessões recentes."""
+    return settings.PATIENT_HISTORY_TOKEN_BUDGET * CHARS_PER_TOKEN // (2 * len(FIELDS))
+
+
+def fields_sha256(patient) -> str:
+    values = [getattr(patient, field) or "" for field in FIELDS]
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode()).hexdigest()
+
+
+def _window(patient, digest: ClinicalDigest) -> list[ClinicalHistoryEntry]:
+    """Registros ainda não resumidos, a partir da base mais recente."""
+    entries = ClinicalHistoryEntry.objects.filter(patient=patient)
+    baseline = entries.filter(kind=ClinicalHistoryEntry.Kind.BASELINE).order_by("-pk").first()
+    if baseline:
+        entries = entries.filter(pk__gte=baseline.pk)
+    if digest.compacted_through_id:
+        entries = entries.filter(pk__gt=digest.compacted_through_id)
+    return list(entries.order_by("pk"))
+
+
+def _context(digest: ClinicalDigest, entries: list[ClinicalHistoryEntry]) -> dict:
+    context = {}
+    for field in FIELDS:
+        parts = [digest.summary.get(field, "")] + [entry.fields.get(field, "") for entry in entries]
+        context[field] = "\n\n".join(part.strip() for part in parts if part and part.strip())
+    return context
+
+
+def _addition(sent: str, returned: str) -> str:
+    sent, returned = sent.strip(), returned.strip()
+    if sent and returned.startswith(sent):
+        return returned[len(sent):].strip()
+    return returned
+
+
+def _replace_or_append(current: str, previous: str, addition: str) -> str:
+    if previous and previous in current:
+        start = current.rfind(previous)
+        return (current[:start] + addition + current[start + len(previous):]).strip()
+    if not addition:
+        return current
+    return f"{current.rstrip()}\n\n{addition}" if current.strip() else addition
@@ -0,0 +1,154 @@
+"""
+Chaves de idempotência para os envios de prontuário e de áudio.
+
+O navegador gera uma chave por envio (cabeçalho `Idempotency-Key`) e repete
+a mesma chave quando tenta de novo. A primeira requisição reserva a chave;
+as repetidas recebem a resposta original (com a posição atual do job que ela
+criou) em vez de criar outro prontuário e outro processamento no Gemini.
+Enquanto a primeira ainda está em andamento, as repetidas recebem 409.
+
+Só respostas JSON de sucesso são guardadas: depois de um erro (ou de um
+redirect, que pode estar levando uma mensagem de erro) a chave é liberada e
+a nova tentativa é processada normalmente.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .jobs import queue_position
+from .models import AudioJob, IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 100
+# Reserva sem resposta há mais tempo que isso: a requisição original morreu no meio
+IN_PROGRESS_TIMEOUT = timedelta(minutes=10)
+
+
+def request_key(request) -> str:
+    return (request.headers.get(HEADER) or "").strip()
+
+
+class IdempotentRequest:
+    """
+    Envolve o processamento de uma requisição que cria prontuário ou job.
+
+    `scope` identifica o endpoint e o objeto (ex.: "create:<paciente>"): a
+    mesma chave num envio diferente é recusada.
+    """
+
+    def __init__(self, request, scope: str):
+        self.request = request
+        self.scope = scope
+        self.key = request_key(request)
+        self.entry = None
+
+    def run(self, handler, *args, **kwargs) -> HttpResponse:
+        """Executa `handler` uma única vez por chave; sem chave, apenas executa."""
+        duplicate = self.start()
+        if duplicate is not None:
+            return duplicate
+        try:
+            response = handler(*args, **kwargs)
+        except Exception:
+            self.abandon()
+            raise
+        return self.finish(response)
+
+    def start(self) -> HttpResponse | None:
+        """Reserva a chave. Retorna a resposta a devolver se a requisição for repetida."""
+        if not self.key:
+            return None
+        if len(self.key) > MAX_KEY_LENGTH:
+            return JsonResponse({"success": False, "message": "Chave de idempotência inválida."}, status=400)
+
+        user = self.request.user
+        now = timezone.now()
+        IdempotencyKey.objects.filter(
+            user=user, created_at__lt=now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        ).delete()
+
+        try:
+            with transaction.atomic():
+                self.entry = IdempotencyKey.objects.create(user=user, key=self.key, scope=self.scope)
+            return None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, key=self.key).first()
+        if existing is None:
+            # A reserva anterior acabou de ser liberada: esta requisição assume a chave
+            return self.start()
+
+        if existing.scope != self.scope:
+            return JsonResponse(
+                {"success": False, "message": "Esta chave de idempotência já foi usada em outro envio."},
+                status=422,
+            )
+        if existing.response_status is None:
+            taken_over = IdempotencyKey.objects.filter(
+                pk=existing.pk,
+                response_status__isnull=True,
+                created_at__lt=now - IN_PROGRESS_TIMEOUT,
+            ).update(created_at=now)
+            if taken_over:
+                self.entry = existing
+                return None
+            return JsonResponse(
+                {"success": False, "message": "Este envio ainda está sendo processado. Aguarde alguns instantes."},
+                status=409,
+            )
+
+        logger.info(f"Requisição repetida com a chave {self.key}; devolvendo a resposta original")
+        return replay(existing)
+
+    def attach(self, record=None, job: AudioJob | None = None) -> None:
+        """Associa o prontuário e o job criados à chave, para as repetições acompanharem o job."""
+        if self.entry is None:
+            return
+        self.entry.record = record
+        self.entry.job = job
+        self.entry.save(update_fields=["record", "job"])
+
+    def finish(self, response: HttpResponse) -> HttpResponse:
+        """Guarda a resposta de sucesso; em caso de erro, libera a chave."""
+        if self.entry is None:
+            return response
+        body = _stored_body(response)
+        if body is None:
+            self.abandon()
+            return response
+        self.entry.response_status = response.status_code
+        self.entry.response_body = body
+        self.entry.save(update_fields=["response_status", "response_body"])
+        return response
+
+    def abandon(self) -> None:
+        if self.entry is not None:
+            IdempotencyKey.objects.filter(pk=self.entry.pk).delete()
+            self.entry = None
+
+
+def replay(entry: IdempotencyKey) -> HttpResponse:
+    """Resposta original de `entry`, com a posição atual do job na fila."""
+    data = json.loads(entry.response_body)
+    if entry.job is not None and "queue_position" in data:
+        position = queue_position(entry.job)
+        data.update(queued=position > 1, queue_position=position)
+    response = JsonResponse(data, status=entry.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _stored_body(response: HttpResponse) -> str | None:
+    """JSON da resposta a guardar; None se não for uma resposta de sucesso."""
+    if response.status_code >= 300 or not response.get("Content-Type", "").startswith("application/json"):
+        return None
+    body = response.content.decode()
+    if json.loads(body).get("success") is False:
+        return None
+    return body
@@ -0,0 +1,675 @@
+"""
+Fila persistente de processamento de áudio.
+
+Os views apenas gravam o áudio em disco e criam um `AudioJob`. Os jobs são
+executados por workers (`manage.py process_audio_jobs` ou o worker embutido
+no processo web), que os reivindicam atomicamente:
+
+- Postgres: `SELECT ... FOR UPDATE SKIP LOCKED`;
+- SQLite: UPDATE condicional (compare-and-swap) sobre o status, que é
+  serializado pelo lock de escrita do próprio banco.
+
+Os jobs de prontuário de um mesmo paciente formam uma fila própria: só
+começa o mais antigo, e só depois que o anterior terminou (`_lane_busy`),
+porque cada um lê e acrescenta os campos clínicos do paciente. Pacientes
+diferentes continuam em paralelo, até AUDIO_JOBS_CONCURRENCY.
+
+Jobs que ficam em execução sem sinal de vida (worker morto, deploy, timeout
+do gunicorn) são devolvidos à fila por `recover_stale_jobs`. Um job de
+prontuário que falha volta à fila até AUDIO_JOBS_MAX_ATTEMPTS tentativas (ou
+pelo botão "Tentar novamente", `retry_job`), e recomeça da primeira etapa que
+não terminou (`AudioJob.checkpoints`).
+"""
+import hashlib
+import os
+import socket
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, close_old_connections, transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+from .metrics import AUDIO_BYTES, JOBS, JOBS_IN_FLIGHT, observe_stage
+from . import scratch
+from .models import AudioJob, AudioUpload, PsyRecord, TranscriptSegment
+from .transcription_cache import hash_file
+from .upload_handlers import StoredAudioFile
+
+logger = logging.getLogger(__name__)
+
+
+def store_audio_upload(uploaded_file, suffix: str = ".webm") -> tuple[str, str]:
+    """
+    Grava o arquivo enviado no diretório da fila.
+
+    Retorna o caminho e o SHA-256 do conteúdo, calculado durante a gravação
+    (chave do cache de transcrições). Um upload recebido pelo
+    `AudioUploadHandler` já está no diretório da fila e só é assumido.
+    """
+    if isinstance(uploaded_file, StoredAudioFile):
+        return uploaded_file.claim()
+
+    path = scratch.audio_path(scratch.create_dir(), suffix.lstrip("."))
+    digest = hashlib.sha256()
+    try:
+        with observe_stage("upload_write"), open(path, "wb") as destination:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+                destination.write(chunk)
+    except Exception:
+        discard_audio(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def discard_audio(path: str) -> None:
+    """Remove o áudio (e o diretório de trabalho dele)."""
+    scratch.remove(path)
+
+
+class QueueFull(Exception):
+    """A fila de processamento não aceita novos jobs no momento."""
+
+
+def check_admission(user) -> None:
+    """
+    Verifica se a fila aceita mais um job do usuário.
+
+    Levanta `QueueFull` quando a fila global ou a cota do usuário está cheia,
+    ou quando o espaço em disco para os áudios passou da cota, para que o
+    view responda antes de gravar o upload.
+    """
+    try:
+        scratch.check_quota()
+    except scratch.ScratchFull as e:
+        raise QueueFull(str(e)) from e
+
+    queued = AudioJob.objects.filter(
+        status=AudioJob.Status.QUEUED, kind__in=[AudioJob.Kind.RECORD, AudioJob.Kind.SUMMARY]
+    )
+    if queued.count() >= settings.AUDIO_JOBS_MAX_QUEUED:
+        raise QueueFull("A fila de processamento está cheia. Tente novamente em alguns minutos.")
+    if queued.filter(user=user).count() >= settings.AUDIO_JOBS_MAX_QUEUED_PER_USER:
+        raise QueueFull(
+            "Você já tem muitos áudios aguardando processamento. "
+            "Aguarde a conclusão dos anteriores."
+        )
+
+
+def enqueue_audio_job(record: PsyRecord, user, audio_path: str, audio_sha256: str = '') -> AudioJob:
+    """Cria o job na fila e garante que exista um worker para consumi-lo."""
+    job = AudioJob.objects.create(
+        record=record,
+        user=user,
+        audio_path=audio_path,
+        audio_sha256=audio_sha256,
+        stage_times={AudioJob.Stage.QUEUED: timezone.now().isoformat()},
+    )
+    logger.info(f"Job {job.pk} enfileirado para o record_id {record.pk}")
+    ensure_embedded_worker()
+    return job
+
+
+def enqueue_summary_job(record: PsyRecord, user) -> AudioJob:
+    """Enfileira a geração do prontuário a partir da transcrição já guardada."""
+    job = AudioJob.objects.create(
+        kind=AudioJob.Kind.SUMMARY,
+        record=record,
+        user=user,
+        stage_times={AudioJob.Stage.QUEUED: timezone.now().isoformat()},
+    )
+    logger.info(f"Job {job.pk} enfileirado para gerar novamente o record_id {record.pk}")
+    ensure_embedded_worker()
+    return job
+
+
+def enqueue_segment_job(upload: AudioUpload, index: int) -> AudioJob:
+    """Enfileira a transcrição de um segmento de um upload ainda em gravação."""
+    job = AudioJob.objects.create(
+        kind=AudioJob.Kind.SEGMENT,
+        upload=upload,
+        segment_index=index,
+        user=upload.user,
+        audio_path=upload.path,
+    )
+    logger.info(f"Job {job.pk} enfileirado para o segmento {index} do upload {upload.pk}")
+    ensure_embedded_worker()
+    return job
+
+
+def queue_position(job: AudioJob) -> int:
+    """
+    Posição aproximada (1 = próximo) do job na fila; 0 se já saiu da fila.
+
+    Segue a ordem de `claim_next_job`: os usuários são atendidos em rodízio,
+    então de cada outro usuário ficam à frente no máximo tantos jobs quanto
+    os do próprio usuário à frente deste (um a mais para quem vem antes na
+    ordem justa). Só contam os jobs de prontuário; os de segmento são curtos.
+    """
+    if job.status != AudioJob.Status.QUEUED:
+        return 0
+    queued = AudioJob.objects.filter(status=AudioJob.Status.QUEUED, kind=AudioJob.Kind.RECORD).exclude(pk=job.pk)
+    own_ahead = queued.filter(user_id=job.user_id).filter(
+        Q(created_at__lt=job.created_at) | Q(created_at=job.created_at, pk__lt=job.pk)
+    ).count()
+
+    order = _users_in_fair_order()
+    served_before = set(order[:order.index(job.user_id)]) if job.user_id in order else set(order)
+    others = (
+        queued.exclude(user_id=job.user_id)
+        .order_by()
+        .values_list('user')
+        .annotate(total=Count('pk'))
+    )
+    ahead = own_ahead
+    for user_id, total in others:
+        ahead += min(total, own_ahead + 1 if user_id in served_before else own_ahead)
+    return ahead + 1
+
+
+def _users_in_fair_order() -> list[int]:
+    """
+    Usuários com jobs na fila, na ordem em que devem ser atendidos.
+
+    Round-robin justo: primeiro quem tem menos jobs em execução, depois quem
+    foi atendido há mais tempo e, por fim, quem tem o job mais antigo. Assim um
+    reprocessamento em massa de um usuário não bloqueia as sessões dos outros.
+    """
+    waiting = dict(
+        AudioJob.objects.filter(status=AudioJob.Status.QUEUED)
+        .order_by()
+        .values_list('user')
+        .annotate(oldest=Min('created_at'))
+    )
+    if not waiting:
+        return []
+
+    running = dict(
+        AudioJob.objects.filter(status=AudioJob.Status.RUNNING, user__in=waiting)
+        .order_by()
+        .values_list('user')
+        .annotate(total=Count('pk'))
+    )
+    last_served = dict(
+        AudioJob.objects.filter(user__in=waiting, started_at__isnull=False)
+        .order_by()
+        .values_list('user')
+        .annotate(last=Max('started_at'))
+    )
+    never = datetime.min.replace(tzinfo=dt_timezone.utc)
+    return sorted(
+        waiting,
+        key=lambda user_id: (
+            running.get(user_id, 0),
+            last_served.get(user_id) or never,
+            waiting[user_id],
+        ),
+    )
+
+
+def claim_next_job(worker_id: str) -> AudioJob | None:
+    """Reivindica atomicamente o próximo job, respeitando a divisão entre usuários."""
+    for user_id in _users_in_fair_order():
+        job = _claim_for_user(user_id, worker_id)
+        if job is not None:
+            return job
+    return None
+
+
+# Jobs que alteram o paciente; os de segmento só transcrevem e ficam fora das filas por paciente
+LANE_KINDS = (AudioJob.Kind.RECORD, AudioJob.Kind.SUMMARY)
+
+
+def _lane_busy() -> Exists:
+    """
+    Se o paciente do job tem outro job de prontuário em execução ou mais
+    antigo na fila.
+
+    Como o job mais antigo na fila bloqueia os seguintes, dois workers nunca
+    começam dois jobs do mesmo paciente, mesmo quando um deles ainda não
+    gravou a reivindicação (o mais antigo continua na fila até lá).
+    """
+    return Exists(
+        AudioJob.objects.filter(
+            kind__in=LANE_KINDS,
+            record__patient_id=OuterRef('record__patient_id'),
+        ).filter(
+            Q(status=AudioJob.Status.RUNNING)
+            | Q(status=AudioJob.Status.QUEUED, created_at__lt=OuterRef('created_at'))
+            | Q(status=AudioJob.Status.QUEUED, created_at=OuterRef('created_at'), pk__lt=OuterRef('pk'))
+        ).exclude(pk=OuterRef('pk'))
+    )
+
+
+def _segment_running() -> Exists:
+    """
+    Se um job de segmento do mesmo áudio ainda está transcrevendo.
+
+    O job do prontuário espera por ele: antes disso transcreveria o mesmo
+    trecho de novo e, ao terminar, apagaria o áudio que o ffmpeg do segmento
+    ainda está lendo.
+    """
+    return Exists(
+        AudioJob.objects.filter(
+            kind=AudioJob.Kind.SEGMENT,
+            status=AudioJob.Status.RUNNING,
+            audio_path=OuterRef('audio_path'),
+        )
+    )
+
+
+def _claim_for_user(user_id: int, worker_id: str) -> AudioJob | None:
+    now = timezone.now()
+    queued = AudioJob.objects.filter(
+        status=AudioJob.Status.QUEUED, user_id=user_id
+    ).filter(
+        ~Q(kind__in=LANE_KINDS) | ~_lane_busy()
+    ).filter(
+        ~Q(kind=AudioJob.Kind.RECORD) | ~_segment_running()
+    ).order_by('created_at', 'pk')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = queued.select_for_update(skip_locked=True, of=('self',)).first()
+            if job is None:
+                return None
+            job.status = AudioJob.Status.RUNNING
+            job.worker_id = worker_id
+            job.attempts += 1
+            job.started_at = now
+            job.heartbeat_at = now
+            job.save(update_fields=['status', 'worker_id', 'attempts', 'started_at', 'heartbeat_at'])
+            return job
+
+    # Fallback (SQLite): tenta marcar um candidato; só um worker vence o UPDATE.
+    for job_id in queued.values_list('pk', flat=True)[:10]:
+        claimed = queued.filter(pk=job_id).update(
+            status=AudioJob.Status.RUNNING,
+            worker_id=worker_id,
+            attempts=F('attempts') + 1,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if claimed:
+            return AudioJob.objects.get(pk=job_id)
+    return None
+
+
+def recover_stale_jobs() -> int:
+    """
+    Devolve à fila os jobs em execução cujo worker parou de enviar sinal.
+
+    Jobs que já esgotaram as tentativas são marcados como falhos.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.AUDIO_JOBS_STALE_AFTER)
+    stale = AudioJob.objects.filter(status=AudioJob.Status.RUNNING, heartbeat_at__lt=cutoff)
+
+    requeued = stale.filter(attempts__lt=settings.AUDIO_JOBS_MAX_ATTEMPTS).update(
+        status=AudioJob.Status.QUEUED,
+        stage=AudioJob.Stage.QUEUED,
+        worker_id='',
+        heartbeat_at=None,
+    )
+    if requeued:
+        logger.warning(f"{requeued} job(s) travado(s) devolvido(s) à fila")
+
+    for job in stale.filter(attempts__gte=settings.AUDIO_JOBS_MAX_ATTEMPTS):
+        # O áudio de um segmento ainda pertence ao upload em andamento
+        _finish_job(
+            job,
+            success=False,
+            error="Processamento interrompido repetidamente.",
+            discard=job.kind == AudioJob.Kind.RECORD,
+        )
+        PsyRecord.objects.filter(pk=job.record_id).update(
+            content="⚠ Erro ao processar áudio: processamento interrompido."
+        )
+    return requeued
+
+
+def run_job(job: AudioJob) -> bool:
+    """Executa um job já reivindicado e registra o resultado."""
+    with JOBS_IN_FLIGHT.track(kind=job.kind):
+        return _run_job(job)
+
+
+def _run_job(job: AudioJob) -> bool:
+    if job.kind == AudioJob.Kind.SEGMENT:
+        return _run_segment_job(job)
+    if job.kind == AudioJob.Kind.SUMMARY:
+        return _run_summary_job(job)
+
+    from .pipeline import PROMPT_TRANSCRIPTION, _process_audio_background, get_patient_data, is_permanent_error
+
+    record = job.record
+    patient = record.patient
+    user = job.user
+
+    needs_audio = 'transcribe' not in job.checkpoints
+    if needs_audio and not os.path.exists(job.audio_path):
+        logger.error(f"Arquivo de áudio do job {job.pk} não encontrado: {job.audio_path}")
+        PsyRecord.objects.filter(pk=record.pk).update(
+            content="⚠ Erro ao processar áudio: arquivo de áudio não encontrado."
+        )
+        _finish_job(job, success=False, error="Arquivo de áudio não encontrado.")
+        return False
+
+    with _Heartbeat(job.pk):
+        set_job_stage(job, AudioJob.Stage.TRANSCODING)
+        if needs_audio:
+            AUDIO_BYTES.inc(os.path.getsize(job.audio_path))
+        if needs_audio and not job.audio_sha256:
+            # Job sem o hash do envio (ex.: enfileirado antes do hash por partes)
+            job.audio_sha256 = hash_file(job.audio_path)
+            job.save(update_fields=['audio_sha256'])
+
+        failures = []
+        success = _process_audio_background(
+            record.pk,
+            patient.pk,
+            job.audio_path,
+            user.api_key,
+            PROMPT_TRANSCRIPTION,
+            user.system_prompt,
+            get_patient_data(patient),
+            transcribed_segments(record, job.audio_path),
+            audio_sha256=job.audio_sha256,
+            on_stage=lambda stage: set_job_stage(job, stage),
+            on_partial=PartialOutputWriter(job),
+            checkpoints=job.checkpoints,
+            on_checkpoint=lambda stage, result: save_checkpoint(job, stage, result),
+            on_error=failures.append,
+        )
+
+    error = '' if success else "Não foi possível processar o áudio."
+    failure = failures[0] if failures else None
+    retry = not is_permanent_error(failure) and job.attempts < settings.AUDIO_JOBS_MAX_ATTEMPTS
+    if not success and retry:
+        _requeue_job(job, error)
+        logger.warning(
+            f"Job {job.pk} falhou na tentativa {job.attempts} e voltou à fila "
+            f"(etapas concluídas: {', '.join(job.checkpoints) or 'nenhuma'})"
+        )
+        return False
+    if failure:
+        # Só agora: enquanto o job volta à fila, o prontuário mantém o aviso de processamento
+        PsyRecord.objects.filter(pk=record.pk).update(content=f"⚠ Erro ao processar áudio: {failure}")
+    # Sem a transcrição, o áudio fica para o "Tentar novamente" (até a limpeza do espaço de trabalho)
+    _finish_job(job, success=success, error=error, discard=success or 'transcribe' in job.checkpoints)
+    return success
+
+
+def save_checkpoint(job: AudioJob, stage: str, result) -> None:
+    """Guarda o resultado de uma etapa concluída (ver `pipeline.AUDIO_STAGES`)."""
+    job.checkpoints = {**job.checkpoints, stage: result}
+    job.save(update_fields=['checkpoints'])
+
+
+def _requeue_job(job: AudioJob, error: str) -> None:
+    """Devolve à fila um job que falhou; a nova tentativa aproveita as etapas concluídas."""
+    job.status = AudioJob.Status.QUEUED
+    job.stage = AudioJob.Stage.QUEUED
+    job.stage_times = {**job.stage_times, AudioJob.Stage.QUEUED: timezone.now().isoformat()}
+    job.worker_id = ''
+    job.heartbeat_at = None
+    job.partial_output = ''
+    job.error = error
+    job.save(update_fields=[
+        'status', 'stage', 'stage_times', 'worker_id', 'heartbeat_at', 'partial_output', 'error',
+        'attempts', 'finished_at',
+    ])
+
+
+def can_retry(job: AudioJob) -> bool:
+    """Se um job que falhou ainda pode ser executado de novo."""
+    if job.status != AudioJob.Status.FAILED or job.kind == AudioJob.Kind.SEGMENT:
+        return False
+    if job.kind == AudioJob.Kind.SUMMARY or 'transcribe' in job.checkpoints:
+        return True
+    return bool(job.audio_path) and os.path.exists(job.audio_path)
+
+
+def retry_job(job: AudioJob) -> AudioJob:
+    """
+    Coloca de novo na fila um job que falhou ("Tentar novamente"), com as
+    tentativas zeradas. Ele recomeça da primeira etapa que não terminou.
+    """
+    job.attempts = 0
+    job.finished_at = None
+    job.stage_times = {}
+    _requeue_job(job, '')
+    logger.info(f"Job {job.pk} enfileirado novamente (etapas concluídas: {', '.join(job.checkpoints) or 'nenhuma'})")
+    ensure_embedded_worker()
+    return job
+
+
+def transcribed_segments(record: PsyRecord, audio_path: str) -> list[str]:
+    """
+    Transcrições feitas durante a gravação para o áudio do job, em ordem.
+
+    Só a sequência contínua a partir do segmento 0 é aproveitada; o que vier
+    depois de uma lacuna é transcrito novamente junto com o final da sessão.
+    """
+    upload = AudioUpload.objects.filter(record=record, path=audio_path).first()
+    if upload is None:
+        return []
+
+    texts = []
+    for segment in upload.segments.order_by('index'):
+        if segment.index != len(texts):
+            break
+        texts.append(segment.text)
+    return texts
+
+
+def _run_summary_job(job: AudioJob) -> bool:
+    from .pipeline import _regenerate_from_transcript
+
+    with _Heartbeat(job.pk):
+        success = _regenerate_from_transcript(
+            job.record_id,
+            job.record.patient_id,
+            job.user.api_key,
+            job.user.system_prompt,
+            on_stage=lambda stage: set_job_stage(job, stage),
+            on_partial=PartialOutputWriter(job),
+        )
+
+    _finish_job(job, success=success, error='' if success else "Não foi possível gerar o prontuário.")
+    return success
+
+
+def _run_segment_job(job: AudioJob) -> bool:
+    from .pipeline import PROMPT_TRANSCRIPTION, transcribe_audio_segment
+
+    upload = job.upload
+    already_done = TranscriptSegment.objects.filter(upload=upload, index=job.segment_index).exists()
+    # Depois de finalizado, o job do prontuário transcreve o que faltar
+    if already_done or upload.status != AudioUpload.Status.OPEN:
+        _finish_job(job, success=True, discard=False)
+        return True
+
+    with _Heartbeat(job.pk):
+        set_job_stage(job, AudioJob.Stage.TRANSCRIBING)
+        text = transcribe_audio_segment(
+            upload.path, job.segment_index, job.user.api_key, PROMPT_TRANSCRIPTION
+        )
+
+    if text is None:
+        _finish_job(job, success=False, error="Não foi possível transcrever o segmento.", discard=False)
+        return False
+
+    TranscriptSegment.objects.update_or_create(
+        upload=upload, index=job.segment_index, defaults={'text': text}
+    )
+    _finish_job(job, success=True, discard=False)
+    return True
+
+
+def set_job_stage(job: AudioJob, stage: str) -> None:
+    """Registra a etapa atual do job e o horário em que ela começou."""
+    if job.stage == stage:
+        return
+    job.stage = stage
+    job.stage_times = {**job.stage_times, stage: timezone.now().isoformat()}
+    job.save(update_fields=['stage', 'stage_times'])
+
+
+class PartialOutputWriter:
+    """
+    Grava o texto parcial do prontuário no job, no máximo uma vez a cada
+    AUDIO_PARTIAL_SAVE_INTERVAL, para a página acompanhar a geração.
+    """
+
+    def __init__(self, job: AudioJob):
+        self.job = job
+        self.saved_at = None
+
+    def __call__(self, text: str) -> None:
+        now = time.monotonic()
+        if self.saved_at is not None and now - self.saved_at < settings.AUDIO_PARTIAL_SAVE_INTERVAL:
+            return
+        self.saved_at = now
+        AudioJob.objects.filter(pk=self.job.pk).update(partial_output=text)
+
+
+def _finish_job(job: AudioJob, success: bool, error: str = '', discard: bool = True) -> None:
+    job.status = AudioJob.Status.DONE if success else AudioJob.Status.FAILED
+    job.error = error
+    job.finished_at = timezone.now()
+    job.stage = AudioJob.Stage.DONE if success else AudioJob.Stage.FAILED
+    job.stage_times = {**job.stage_times, job.stage: job.finished_at.isoformat()}
+    job.partial_output = ''
+    job.save(update_fields=['status', 'error', 'finished_at', 'stage', 'stage_times', 'partial_output'])
+    JOBS.inc(kind=job.kind, outcome=job.status)
+    if discard:
+        discard_audio(job.audio_path)
+    logger.info(f"Job {job.pk} finalizado com status {job.status}")
+
+
+class _Heartbeat:
+    """Atualiza `heartbeat_at` periodicamente enquanto o job executa."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        try:
+            while not self._stop.wait(settings.AUDIO_JOBS_HEARTBEAT_INTERVAL):
+                try:
+                    AudioJob.objects.filter(pk=self.job_id).update(heartbeat_at=timezone.now())
+                except Exception:
+                    logger.warning(f"Falha ao registrar heartbeat do job {self.job_id}", exc_info=True)
+        finally:
+            connection.close()
+
+
+class AudioJobWorker:
+    """
+    Laço que consome a fila de jobs até ser parado.
+
+    Executa no máximo `concurrency` jobs ao mesmo tempo num pool de threads de
+    tamanho fixo; só reivindica um novo job quando há vaga no pool, então o
+    restante permanece na fila (e disponível para outros workers).
+    """
+
+    def __init__(
+        self,
+        worker_id: str | None = None,
+        poll_interval: float | None = None,
+        concurrency: int | None = None,
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval if poll_interval is not None else settings.AUDIO_JOBS_POLL_INTERVAL
+        self.concurrency = max(1, concurrency or settings.AUDIO_JOBS_CONCURRENCY)
+        self._stop = threading.Event()
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once: bool = False) -> None:
+        """
+        Processa jobs da fila. Com `once=True`, termina quando a fila esvazia.
+        """
+        logger.info(f"Worker {self.worker_id} iniciado ({self.concurrency} slot(s))")
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="audio-job"
+            ) as pool:
+                while not self._stop.is_set():
+                    # Aguarda uma vaga no pool antes de tirar um job da fila
+                    if not self._slots.acquire(timeout=self.poll_interval):
+                        continue
+
+                    close_old_connections()
+                    try:
+                        recover_stale_jobs()
+                        job = claim_next_job(self.worker_id)
+                    except Exception:
+                        logger.error("Erro ao consultar a fila de jobs", exc_info=True)
+                        job = None
+
+                    if job is None:
+                        self._slots.release()
+                        if once:
+                            break
+                        self._stop.wait(self.poll_interval)
+                        continue
+
+                    pool.submit(self._run_in_slot, job)
+        finally:
+            connection.close()
+            logger.info(f"Worker {self.worker_id} finalizado")
+
+    def _run_in_slot(self, job: AudioJob) -> None:
+        try:
+            run_job(job)
+        except Exception:
+            logger.error(f"Erro inesperado no job {job.pk}", exc_info=True)
+        finally:
+            connection.close()
+            self._slots.release()
+
+
+_embedded_worker_lock = threading.Lock()
+_embedded_worker_thread: threading.Thread | None = None
+
+
+def ensure_embedded_worker() -> None:
+    """
+    Inicia (uma vez por processo) um worker em thread dentro do processo web.
+
+    Mantém o comportamento de instalação única (executável/runserver/gunicorn
+    sem processo dedicado). Em produção com workers dedicados, desative com
+    AUDIO_JOBS_EMBEDDED_WORKER=False.
+    """
+    global _embedded_worker_thread
+
+    if not settings.AUDIO_JOBS_EMBEDDED_WORKER:
+        return
+
+    with _embedded_worker_lock:
+        if _embedded_worker_thread is not None and _embedded_worker_thread.is_alive():
+            return
+        worker = AudioJobWorker()
+        _embedded_worker_thread = threading.Thread(
+            target=worker.run, name="audio-job-worker", daemon=True
+        )
+        _embedded_worker_thread.start()
@@ -0,0 +1,269 @@
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.core.management.base import BaseCommand, CommandError
+
+STAGES = ["queued", "transcoding", "transcribing", "summarizing"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Envia N áudios simultâneos para a aplicação (via HTTP, como o navegador) e mede "
+        "o tempo até cada prontuário ficar pronto. Use com `manage.py fake_gemini` para "
+        "não gastar a cota real."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Endereço da aplicação.")
+        parser.add_argument("--username", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--patient", type=int, required=True, help="ID do paciente que recebe os prontuários.")
+        parser.add_argument("--uploads", type=int, default=10, help="Total de áudios enviados.")
+        parser.add_argument("--concurrency", type=int, default=None, help="Envios simultâneos (padrão: todos).")
+        parser.add_argument("--audio-seconds", type=float, default=60, help="Duração de cada áudio gerado.")
+        parser.add_argument(
+            "--audio-file", default=None,
+            help="Usa este arquivo em todos os envios em vez de gerar áudios (o cache de transcrições será usado).",
+        )
+        parser.add_argument("--timeout", type=float, default=600, help="Tempo máximo por prontuário (segundos).")
+        parser.add_argument("--poll-interval", type=float, default=0.5)
+        parser.add_argument(
+            "--pid", type=int, action="append", default=[],
+            help="PID do servidor/worker para medir o pico de memória (pode repetir).",
+        )
+
+    def handle(self, *args, **options):
+        self.base_url = options["url"].rstrip("/")
+        self.options = options
+        temp_dir = tempfile.mkdtemp(prefix="benchmark_audio_")
+        try:
+            audio_files = self._prepare_audio(temp_dir)
+            sampler = RssSampler(options["pid"])
+            sampler.start()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"] or options["uploads"]) as executor:
+                results = list(executor.map(self._run_one, audio_files))
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self._report(results, elapsed, sampler.peak)
+
+    def _prepare_audio(self, temp_dir: str) -> list[str]:
+        if self.options["audio_file"]:
+            return [self.options["audio_file"]] * self.options["uploads"]
+        if not shutil.which("ffmpeg"):
+            raise CommandError("ffmpeg não encontrado para gerar os áudios (use --audio-file).")
+
+        files = []
+        for i in range(self.options["uploads"]):
+            path = os.path.join(temp_dir, f"sessao_{i:03d}.webm")
+            # Frequências diferentes: cada áudio tem outro hash e não cai no cache de transcrições
+            subprocess.run(
+                ["ffmpeg", "-nostdin", "-loglevel", "error", "-f", "lavfi",
+                 "-i", f"sine=frequency={200 + i}:duration={self.options['audio_seconds']}",
+                 "-ac", "1", "-c:a", "libopus", "-b:a", "32k", path],
+                check=True,
+            )
+            files.append(path)
+        return files
+
+    def _run_one(self, audio_path: str) -> dict:
+        session = Session(self.base_url)
+        result = {"ok": False, "upload_seconds": None, "total_seconds": None, "stages": {}, "error": ""}
+        try:
+            session.login(self.options["username"], self.options["password"])
+            started = time.perf_counter()
+            response = session.upload_audio(self.options["patient"], audio_path)
+            result["upload_seconds"] = time.perf_counter() - started
+            if not response.get("record_id"):
+                raise RuntimeError(response.get("message") or "Resposta sem record_id")
+
+            job = session.wait_for_record(
+                self.options["patient"], response["record_id"], self.options["timeout"], self.options["poll_interval"]
+            )
+            result["total_seconds"] = time.perf_counter() - started
+            result["stages"] = stage_durations(job.get("stage_times") or {})
+            result["ok"] = job["status"] == "done"
+            result["error"] = job.get("error", "")
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    def _report(self, results: list[dict], elapsed: float, peak_rss: int | None):
+        ok = [r for r in results if r["ok"]]
+        self.stdout.write(f"Áudios: {len(results)}  concluídos: {len(ok)}  falhas: {len(results) - len(ok)}")
+        self.stdout.write(f"Tempo total: {elapsed:.1f}s  vazão: {len(ok) / elapsed * 60:.1f} prontuários/min")
+        self._write_percentiles("Envio", [r["upload_seconds"] for r in results if r["upload_seconds"] is not None])
+        self._write_percentiles("Ponta a ponta", [r["total_seconds"] for r in ok])
+        for stage in STAGES:
+            self._write_percentiles(f"  {stage}", [r["stages"][stage] for r in ok if stage in r["stages"]])
+        if peak_rss is not None:
+            self.stdout.write(f"Pico de memória (RSS): {peak_rss / (1024 * 1024):.1f} MB")
+
+        errors = sorted({r["error"] for r in results if not r["ok"] and r["error"]})
+        for error in errors:
+            self.stdout.write(self.style.ERROR(f"Erro: {error}"))
+
+    def _write_percentiles(self, label: str, values: list[float]):
+        if not values:
+            self.stdout.write(f"{label}: sem dados")
+            return
+        p50, p95, p99 = (percentile(values, p) for p in (50, 95, 99))
+        self.stdout.write(f"{label}: p50={p50:.2f}s  p95={p95:.2f}s  p99={p99:.2f}s")
+
+
+class Session:
+    """Cliente HTTP com cookies e CSRF, como o navegador."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self) -> str:
+        for cookie in self.cookies:
+            if cookie.name == "csrftoken":
+                return cookie.value
+        return ""
+
+    def request(self, path: str, data: bytes | None = None, headers: dict | None = None):
+        url = self.base_url + path
+        headers = {"Referer": url, **(headers or {})}
+        if data is not None:
+            headers["X-CSRFToken"] = self.csrf_token()
+        return self.opener.open(Request(url, data=data, headers=headers), timeout=120)
+
+    def login(self, username: str, password: str) -> None:
+        self.request("/user/login/").read()
+        data = urlencode({
+            "username": username,
+            "password": password,
+            "csrfmiddlewaretoken": self.csrf_token(),
+        }).encode()
+        response = self.request("/user/login/", data, {"Content-Type": "application/x-www-form-urlencoded"})
+        if "/user/login/" in response.geturl():
+            raise RuntimeError("Falha no login")
+
+    def upload_audio(self, patient_id: int, audio_path: str) -> dict:
+        path = f"/records/patient/{patient_id}/new/"
+        self.request(path).read()
+        body, content_type = multipart(
+            {"content": "", "date": date.today().isoformat(), "has_audio": "true"},
+            "audio_file", audio_path,
+        )
+        try:
+            response = self.request(path, body, {
+                "Content-Type": content_type,
+                "X-Requested-With": "XMLHttpRequest",
+            })
+        except HTTPError as e:
+            response = e
+        try:
+            return json.loads(response.read())
+        except ValueError:
+            return {"message": f"HTTP {response.status} em {path}"}
+
+    def wait_for_record(self, patient_id: int, record_id: int, timeout: float, poll_interval: float) -> dict:
+        deadline = time.monotonic() + timeout
+        path = f"/records/patient/{patient_id}/status/?" + urlencode({"record": record_id})
+        while time.monotonic() < deadline:
+            status = json.loads(self.request(path, headers={"X-Requested-With": "XMLHttpRequest"}).read())
+            for job in status["jobs"]:
+                if job["record_id"] == record_id and job["status"] in ("done", "failed"):
+                    return job
+            time.sleep(poll_interval)
+        raise TimeoutError(f"Prontuário {record_id} não ficou pronto em {timeout:.0f}s")
+
+
+class RssSampler(threading.Thread):
+    """Soma o RSS dos processos informados (e dos filhos, como o ffmpeg) e guarda o pico."""
+
+    def __init__(self, pids: list[int], interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.peak = None if not pids else 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while self.pids and not self._stop_event.is_set():
+            self.peak = max(self.peak, sum(_rss(pid) for pid in _with_children(self.pids)))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _with_children(pids: list[int]) -> set[int]:
+    found, pending = set(), list(pids)
+    while pending:
+        pid = pending.pop()
+        if pid in found:
+            continue
+        found.add(pid)
+        try:
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as f:
+                    pending += [int(child) for child in f.read().split()]
+        except OSError:
+            pass
+    return found
+
+
+def _rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            match = re.search(r"^VmRSS:\s+(\d+) kB", f.read(), re.MULTILINE)
+    except OSError:
+        return 0
+    return int(match.group(1)) * 1024 if match else 0
+
+
+def multipart(fields: dict, file_field: str, file_path: str) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    with open(file_path, "rb") as f:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+            f'filename="{os.path.basename(file_path)}"\r\nContent-Type: audio/webm\r\n\r\n'.encode()
+            + f.read() + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def stage_durations(stage_times: dict) -> dict:
+    """Tempo em cada etapa, a partir dos horários em que o job entrou em cada uma."""
+    times = sorted((datetime.fromisoformat(value), stage) for stage, value in stage_times.items())
+    return {
+        stage: (next_time - start).total_seconds()
+        for (start, stage), (next_time, _) in zip(times, times[1:])
+    }
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Percentil pelo método do posto mais próximo."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from psy_records import scratch
+from psy_records.models import AudioJob, AudioUpload
+from psy_records.uploads import stale_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove de AUDIO_JOBS_DIR os áudios e diretórios de trabalho que nenhum job ou upload "
+        "em andamento usa (sobras de workers interrompidos e uploads em partes abandonados)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=None,
+            help="Só remove o que não é modificado há esse tempo, em segundos (padrão: AUDIO_SCRATCH_ORPHAN_AGE).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Só lista o que seria removido.")
+
+    def handle(self, *args, **options):
+        min_age = options["min_age"] if options["min_age"] is not None else settings.AUDIO_SCRATCH_ORPHAN_AGE
+
+        # Uploads abertos sem nenhuma parte nova há mais de min_age nunca seriam liberados
+        abandoned = stale_uploads(min_age)
+        for upload in abandoned:
+            self.stdout.write(
+                ("Seria descartado" if options["dry_run"] else "Descartando") + f" o upload abandonado {upload.pk}"
+            )
+        if not options["dry_run"]:
+            # Os jobs de segmento (nenhum em execução) são apagados junto; o arquivo sai com os órfãos abaixo
+            abandoned.delete()
+
+        jobs = AudioJob.objects.filter(status__in=[AudioJob.Status.QUEUED, AudioJob.Status.RUNNING])
+        uploads = AudioUpload.objects.filter(status=AudioUpload.Status.OPEN)
+        if options["dry_run"]:
+            jobs = jobs.exclude(upload__in=abandoned)
+            uploads = uploads.exclude(pk__in=abandoned)
+        in_use = set(jobs.exclude(audio_path='').values_list('audio_path', flat=True))
+        in_use |= set(uploads.values_list('path', flat=True))
+
+        orphans = scratch.orphaned_entries(in_use, min_age)
+        for path in orphans:
+            self.stdout.write(("Seria removido: " if options["dry_run"] else "Removendo: ") + path)
+            if not options["dry_run"]:
+                scratch.remove_entry(path)
+
+        usage = scratch.usage_bytes()
+        self.stdout.write(
+            f"{len(orphans)} entrada(s) órfã(s); espaço em uso: {usage / (1024 * 1024):.1f} MB"
+        )
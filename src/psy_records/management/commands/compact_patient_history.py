@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from patients.models import Patient
+from psy_records.gemini_clients import get_client
+from psy_records.pipeline import compact_patient_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Resume o histórico clínico dos pacientes cujo contexto passou de PATIENT_HISTORY_TOKEN_BUDGET "
+        "(normalmente feito após cada sessão; útil para pacientes com histórico anterior ao resumo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--patient", type=int, action="append", default=[], help="ID do paciente (pode repetir).")
+
+    def handle(self, *args, **options):
+        patients = Patient.objects.select_related("user").order_by("pk")
+        if options["patient"]:
+            patients = patients.filter(pk__in=options["patient"])
+
+        compacted = 0
+        for patient in patients:
+            if not patient.user.api_key:
+                self.stdout.write(f"Paciente {patient.pk}: usuário sem API key do Gemini, ignorado")
+                continue
+            try:
+                if compact_patient_history(get_client(patient.user.api_key), patient.pk):
+                    compacted += 1
+                    self.stdout.write(f"Paciente {patient.pk}: histórico resumido")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Paciente {patient.pk}: erro ao resumir o histórico: {e}"))
+
+        self.stdout.write(f"{compacted} histórico(s) resumido(s)")
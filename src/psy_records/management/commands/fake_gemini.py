@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from psy_records.fake_gemini import FakeGeminiConfig, FakeGeminiServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa um servidor local que imita a API do Gemini, para testes de carga. "
+        "Aponte a aplicação para ele com GEMINI_BASE_URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8090)
+        parser.add_argument("--latency", type=float, default=0.5, help="Latência fixa de cada resposta (segundos).")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Latência aleatória adicional máxima (segundos).")
+        parser.add_argument(
+            "--latency-per-mb", type=float, default=0.0,
+            help="Latência adicional por MB de áudio enviado (segundos).",
+        )
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fração das requisições que falham (0 a 1).")
+        parser.add_argument("--error-status", type=int, default=429, help="Status HTTP dos erros simulados.")
+        parser.add_argument(
+            "--retry-after", type=int, default=1,
+            help="Valor do cabeçalho Retry-After nos erros (negativo = sem cabeçalho).",
+        )
+        parser.add_argument("--stream-chunks", type=int, default=5, help="Pedaços de cada resposta em streaming.")
+
+    def handle(self, *args, **options):
+        config = FakeGeminiConfig(
+            latency=options["latency"],
+            jitter=options["jitter"],
+            latency_per_mb=options["latency_per_mb"],
+            error_rate=options["error_rate"],
+            error_status=options["error_status"],
+            retry_after=options["retry_after"] if options["retry_after"] >= 0 else None,
+            stream_chunks=options["stream_chunks"],
+        )
+        server = FakeGeminiServer((options["host"], options["port"]), config)
+        self.stdout.write(f"Gemini falso em {server.base_url} (defina GEMINI_BASE_URL={server.base_url})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
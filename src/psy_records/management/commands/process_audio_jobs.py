@@ -0,0 +1,51 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from psy_records.jobs import AudioJobWorker
+
+
+class Command(BaseCommand):
+    help = "Executa um worker da fila de processamento de áudio."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Processa os jobs pendentes e termina quando a fila esvaziar.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Intervalo (segundos) entre consultas quando a fila está vazia.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Número máximo de jobs simultâneos neste worker (padrão: AUDIO_JOBS_CONCURRENCY).",
+        )
+        parser.add_argument(
+            "--worker-id",
+            default=None,
+            help="Identificador do worker (padrão: host:pid:aleatório).",
+        )
+
+    def handle(self, *args, **options):
+        worker = AudioJobWorker(
+            worker_id=options["worker_id"],
+            poll_interval=options["poll_interval"],
+            concurrency=options["concurrency"],
+        )
+
+        # Termina o job atual antes de sair em caso de SIGTERM/SIGINT
+        def _stop(signum, frame):
+            self.stdout.write("Sinal recebido, finalizando após o job atual...")
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        self.stdout.write(f"Worker {worker.worker_id} aguardando jobs...")
+        worker.run(once=options["once"])
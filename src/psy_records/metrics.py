@@ -0,0 +1,168 @@
+"""
+Métricas do processamento de áudio no formato texto do Prometheus.
+
+Implementação mínima (contadores, gauges e histogramas com rótulos) para
+não depender do `prometheus_client`. Os valores ficam na memória do
+processo: cada processo (gunicorn ou `process_audio_jobs`) expõe os seus,
+então o Prometheus deve coletar cada um separadamente.
+
+Uso:
+    with observe_stage("ffprobe"):
+        ...
+    JOBS.inc(kind="record", outcome="done")
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Limites (segundos) dos histogramas: de gravações em disco a chamadas longas ao Gemini
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} espera os rótulos {self.labelnames}, recebeu {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, values: tuple, extra: dict | None = None) -> str:
+        pairs = list(zip(self.labelnames, values)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines += self._samples(labels, value)
+        return lines
+
+    def _samples(self, labels: tuple, value) -> list[str]:
+        return [f"{self.name}{self._format_labels(labels)} {_number(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Incrementa enquanto o bloco executa."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            counts, total, observations = self._values.get(key, ((0,) * len(self.buckets), 0.0, 0))
+            counts = tuple(count + (value <= bound) for count, bound in zip(counts, self.buckets))
+            self._values[key] = (counts, total + value, observations + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, labels: tuple, value) -> list[str]:
+        counts, total, observations = value
+        lines = [
+            f"{self.name}_bucket{self._format_labels(labels, {'le': _number(bound)})} {count}"
+            for bound, count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_bucket{self._format_labels(labels, {'le': '+Inf'})} {observations}")
+        lines.append(f"{self.name}_sum{self._format_labels(labels)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._format_labels(labels)} {observations}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "psy_audio_stage_seconds",
+    "Duração de cada etapa do processamento de áudio.",
+    ("stage",),
+))
+JOBS = REGISTRY.register(Counter(
+    "psy_audio_jobs_total",
+    "Jobs de áudio finalizados, por tipo e resultado.",
+    ("kind", "outcome"),
+))
+JOBS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "psy_audio_jobs_in_flight",
+    "Jobs de áudio em execução neste processo.",
+    ("kind",),
+))
+AUDIO_BYTES = REGISTRY.register(Counter(
+    "psy_audio_bytes_processed_total",
+    "Bytes de áudio enviados ao processamento.",
+))
+
+
+def observe_stage(stage: str):
+    """Mede a duração do bloco como a etapa `stage`."""
+    return STAGE_SECONDS.time(stage=stage)
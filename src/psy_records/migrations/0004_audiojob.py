@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('psy_records', '0003_alter_psyrecord_content_alter_psyrecord_date_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audio_path', models.CharField(max_length=500, verbose_name='Arquivo de áudio')),
+                ('status', models.CharField(choices=[('queued', 'Na fila'), ('running', 'Em processamento'), ('done', 'Concluído'), ('failed', 'Falhou')], default='queued', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('worker_id', models.CharField(blank=True, max_length=255, verbose_name='Worker')),
+                ('error', models.TextField(blank=True, verbose_name='Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Último sinal do worker')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finalizado em')),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audio_jobs', to='psy_records.psyrecord')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audio_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='psy_records_status_d85250_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_patient_clinical_analysis_and_more'),
+        ('psy_records', '0004_audiojob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('path', models.CharField(max_length=500, verbose_name='Arquivo')),
+                ('mime_type', models.CharField(blank=True, max_length=100, verbose_name='Tipo')),
+                ('status', models.CharField(choices=[('open', 'Recebendo'), ('finalized', 'Finalizado')], default='open', max_length=20, verbose_name='Status')),
+                ('next_index', models.PositiveIntegerField(default=0, verbose_name='Próxima parte esperada')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Bytes recebidos')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audio_uploads', to='patients.patient')),
+                ('record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audio_uploads', to='psy_records.psyrecord')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audio_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('psy_records', '0005_audioupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiojob',
+            name='kind',
+            field=models.CharField(choices=[('record', 'Prontuário'), ('segment', 'Segmento durante a gravação')], default='record', max_length=20, verbose_name='Tipo'),
+        ),
+        migrations.AddField(
+            model_name='audiojob',
+            name='segment_index',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Segmento'),
+        ),
+        migrations.AddField(
+            model_name='audiojob',
+            name='upload',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='psy_records.audioupload'),
+        ),
+        migrations.AddField(
+            model_name='audioupload',
+            name='duration',
+            field=models.FloatField(default=0, verbose_name='Segundos gravados'),
+        ),
+        migrations.AddField(
+            model_name='audioupload',
+            name='segments_scheduled',
+            field=models.PositiveIntegerField(default=0, verbose_name='Segmentos enviados para transcrição'),
+        ),
+        migrations.AlterField(
+            model_name='audiojob',
+            name='record',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='audio_jobs', to='psy_records.psyrecord'),
+        ),
+        migrations.CreateModel(
+            name='TranscriptSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(verbose_name='Segmento')),
+                ('text', models.TextField(verbose_name='Transcrição')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='psy_records.audioupload')),
+            ],
+            options={
+                'ordering': ['upload', 'index'],
+                'unique_together': {('upload', 'index')},
+            },
+        ),
+    ]
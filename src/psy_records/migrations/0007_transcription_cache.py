@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('psy_records', '0006_incremental_transcription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiojob',
+            name='audio_sha256',
+            field=models.CharField(blank=True, max_length=64, verbose_name='SHA-256 do áudio'),
+        ),
+        migrations.CreateModel(
+            name='TranscriptionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audio_sha256', models.CharField(max_length=64, verbose_name='SHA-256 do áudio')),
+                ('prompt_version', models.CharField(max_length=64, verbose_name='Versão do prompt')),
+                ('transcription', models.TextField(verbose_name='Transcrição')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Último uso')),
+            ],
+            options={
+                'ordering': ['-last_used_at'],
+                'unique_together': {('audio_sha256', 'prompt_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('psy_records', '0007_transcription_cache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audiojob',
+            name='audio_path',
+            field=models.CharField(blank=True, max_length=500, verbose_name='Arquivo de áudio'),
+        ),
+        migrations.AlterField(
+            model_name='audiojob',
+            name='kind',
+            field=models.CharField(choices=[('record', 'Prontuário'), ('segment', 'Segmento durante a gravação'), ('summary', 'Prontuário a partir da transcrição')], default='record', max_length=20, verbose_name='Tipo'),
+        ),
+        migrations.CreateModel(
+            name='Transcript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Transcrição')),
+                ('patient_data', models.JSONField(default=dict, verbose_name='Dados do paciente usados no resumo')),
+                ('audio_sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 do áudio')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='transcript', to='psy_records.psyrecord')),
+            ],
+        ),
+    ]
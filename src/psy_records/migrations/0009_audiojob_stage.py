@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('psy_records', '0008_transcript'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiojob',
+            name='stage',
+            field=models.CharField(choices=[('queued', 'Na fila'), ('transcoding', 'Preparando o áudio'), ('transcribing', 'Transcrevendo'), ('summarizing', 'Gerando o prontuário'), ('done', 'Concluído'), ('failed', 'Falhou')], default='queued', max_length=20, verbose_name='Etapa'),
+        ),
+        migrations.AddField(
+            model_name='audiojob',
+            name='stage_times',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Horário de cada etapa'),
+        ),
+    ]
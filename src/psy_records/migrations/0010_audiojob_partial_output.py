@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('psy_records', '0009_audiojob_stage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiojob',
+            name='partial_output',
+            field=models.TextField(blank=True, verbose_name='Prontuário parcial'),
+        ),
+    ]
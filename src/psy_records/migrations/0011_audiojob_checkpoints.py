@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('psy_records', '0010_audiojob_partial_output'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiojob',
+            name='checkpoints',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Etapas concluídas'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_patient_clinical_analysis_and_more'),
+        ('psy_records', '0012_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClinicalHistoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('session', 'Sessão'), ('baseline', 'Base')], default='session', max_length=20, verbose_name='Tipo')),
+                ('fields', models.JSONField(default=dict, verbose_name='Texto de cada campo')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clinical_history', to='patients.patient')),
+                ('record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clinical_history', to='psy_records.psyrecord')),
+            ],
+            options={
+                'ordering': ['patient', 'pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClinicalDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary', models.JSONField(blank=True, default=dict, verbose_name='Resumo de cada campo')),
+                ('fields_sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 dos campos')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='clinical_digest', to='patients.patient')),
+                ('compacted_through', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='psy_records.clinicalhistoryentry')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('psy_records', '0013_clinical_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioupload',
+            name='parts_sha256',
+            field=models.CharField(blank=True, max_length=64, verbose_name='SHA-256 das partes'),
+        ),
+    ]
@@ -1,6 +1,57 @@
-from django.db import models
+import uuid
+
+from django.conf import settings
+from django.db import connection, models, transaction
 from django.utils import timezone
 
+
+def allocate_record_numbers(patient_id: int, count: int = 1) -> int:
+    """
+    Reserva `count` números de prontuário consecutivos para o paciente e
+    retorna o primeiro.
+
+    Um único UPDATE ... RETURNING no contador `Patient.next_record_number`
+    (nos bancos sem RETURNING, UPDATE seguido de leitura): o lock da linha do
+    paciente serializa as inserções simultâneas até o fim da transação, que
+    deve ser a mesma que insere os prontuários.
+    """
+    from patients.models import Patient
+
+    # Postgres e SQLite 3.35+ aceitam RETURNING também no UPDATE; nos demais, UPDATE seguido de leitura
+    if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+        quote = connection.ops.quote_name
+        table = quote(Patient._meta.db_table)
+        column = quote(Patient._meta.get_field('next_record_number').column)
+        pk = quote(Patient._meta.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET {column} = {column} + %s WHERE {pk} = %s RETURNING {column}",
+                [count, patient_id],
+            )
+            next_number = cursor.fetchone()[0]
+    else:
+        Patient.objects.filter(pk=patient_id).update(next_record_number=models.F('next_record_number') + count)
+        next_number = Patient.objects.values_list('next_record_number', flat=True).get(pk=patient_id)
+    return next_number - count
+
+
+class PsyRecordManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Numera os prontuários novos com um UPDATE por paciente antes da inserção em lote."""
+        objs = list(objs)
+        by_patient = {}
+        for record in objs:
+            if not record.record_number:
+                by_patient.setdefault(record.patient_id, []).append(record)
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            for patient_id, records in by_patient.items():
+                first = allocate_record_numbers(patient_id, len(records))
+                for offset, record in enumerate(records):
+                    record.record_number = first + offset
+            return super().bulk_create(objs, *args, **kwargs)
+
+
 class PsyRecord(models.Model):
     patient = models.ForeignKey(
         'patients.Patient',
@@ -11,19 +62,320 @@ class PsyRecord(models.Model):
     record_number = models.PositiveIntegerField('Número do registro', editable=False)
     date = models.DateField('Data', default=timezone.now)
     content = models.TextField('Conteúdo', blank=True)
+
+    objects = PsyRecordManager()
     
     class Meta:
         unique_together = ('patient', 'record_number')
         ordering = ['patient', 'record_number']
     
     def save(self, *args, **kwargs):
-        if not self.record_number:
-            last_record = PsyRecord.objects.filter(patient=self.patient).order_by('-record_number').first()
-            if last_record:
-                self.record_number = last_record.record_number + 1
-            else:
-                self.record_number = 1
-        super().save(*args, **kwargs)
+        if self.record_number:
+            return super().save(*args, **kwargs)
+        with transaction.atomic(savepoint=False):
+            self.record_number = allocate_record_numbers(self.patient_id)
+            super().save(*args, **kwargs)
     
     def __str__(self):
-        return f"Prontuário #{self.record_number} - {self.patient.full_name}"
\ No newline at end of file
+        return f"Prontuário #{self.record_number} - {self.patient.full_name}"
+
+class Transcript(models.Model):
+    """
+    Transcrição da sessão que originou o prontuário.
+
+    Guarda também os dados do paciente enviados junto, para que o prontuário
+    possa ser gerado de novo (outro prompt, resumo ruim) sem reenviar o áudio.
+    """
+
+    record = models.OneToOneField(
+        PsyRecord,
+        on_delete=models.CASCADE,
+        related_name="transcript"
+    )
+    text = models.TextField('Transcrição')
+    patient_data = models.JSONField('Dados do paciente usados no resumo', default=dict)
+    audio_sha256 = models.CharField('SHA-256 do áudio', max_length=64, blank=True)
+
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+    updated_at = models.DateTimeField('Atualizado em', auto_now=True)
+
+    def __str__(self):
+        return f"Transcrição do {self.record}"
+
+class AudioJob(models.Model):
+    """
+    Job persistente de processamento de áudio.
+
+    Substitui as threads daemon: o job sobrevive a reinícios do gunicorn/máquina
+    e é reivindicado atomicamente por um worker (ver `psy_records.jobs`).
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Na fila'
+        RUNNING = 'running', 'Em processamento'
+        DONE = 'done', 'Concluído'
+        FAILED = 'failed', 'Falhou'
+
+    class Kind(models.TextChoices):
+        RECORD = 'record', 'Prontuário'
+        SEGMENT = 'segment', 'Segmento durante a gravação'
+        SUMMARY = 'summary', 'Prontuário a partir da transcrição'
+
+    class Stage(models.TextChoices):
+        QUEUED = 'queued', 'Na fila'
+        TRANSCODING = 'transcoding', 'Preparando o áudio'
+        TRANSCRIBING = 'transcribing', 'Transcrevendo'
+        SUMMARIZING = 'summarizing', 'Gerando o prontuário'
+        DONE = 'done', 'Concluído'
+        FAILED = 'failed', 'Falhou'
+
+    kind = models.CharField('Tipo', max_length=20, choices=Kind.choices, default=Kind.RECORD)
+    record = models.ForeignKey(
+        PsyRecord,
+        on_delete=models.CASCADE,
+        related_name="audio_jobs",
+        null=True,
+        blank=True,
+    )
+    upload = models.ForeignKey(
+        'AudioUpload',
+        on_delete=models.CASCADE,
+        related_name="jobs",
+        null=True,
+        blank=True,
+    )
+    segment_index = models.PositiveIntegerField('Segmento', null=True, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="audio_jobs"
+    )
+
+    audio_path = models.CharField('Arquivo de áudio', max_length=500, blank=True)
+    audio_sha256 = models.CharField('SHA-256 do áudio', max_length=64, blank=True)
+    status = models.CharField('Status', max_length=20, choices=Status.choices, default=Status.QUEUED)
+    stage = models.CharField('Etapa', max_length=20, choices=Stage.choices, default=Stage.QUEUED)
+    # Quando o job entrou em cada etapa ({"transcribing": "2025-01-01T10:00:00+00:00", ...})
+    stage_times = models.JSONField('Horário de cada etapa', default=dict, blank=True)
+    # Texto do prontuário enquanto o Gemini ainda está gerando (limpo ao terminar)
+    partial_output = models.TextField('Prontuário parcial', blank=True)
+    # Resultado das etapas já concluídas ({"normalize": {...}, "transcribe": true, ...});
+    # uma nova tentativa recomeça da primeira etapa que falta (ver `pipeline.AUDIO_STAGES`)
+    checkpoints = models.JSONField('Etapas concluídas', default=dict, blank=True)
+    attempts = models.PositiveSmallIntegerField('Tentativas', default=0)
+    worker_id = models.CharField('Worker', max_length=255, blank=True)
+    error = models.TextField('Erro', blank=True)
+
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+    started_at = models.DateTimeField('Iniciado em', null=True, blank=True)
+    heartbeat_at = models.DateTimeField('Último sinal do worker', null=True, blank=True)
+    finished_at = models.DateTimeField('Finalizado em', null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        if self.kind == self.Kind.SEGMENT:
+            return f"Job #{self.pk} ({self.get_status_display()}) - segmento {self.segment_index} do upload {self.upload_id}"
+        return f"Job #{self.pk} ({self.get_status_display()}) - {self.record}"
+
+
+
+class AudioUpload(models.Model):
+    """
+    Sessão de upload de áudio em partes numeradas.
+
+    O navegador envia as partes enquanto a sessão é gravada; ao final só é
+    necessário "finalizar" o upload para criar o prontuário e enfileirar o job.
+    `next_index` e `size` definem o conteúdo válido do arquivo, o que permite
+    retomar o envio depois de uma queda de conexão.
+    """
+
+    class Status(models.TextChoices):
+        OPEN = 'open', 'Recebendo'
+        FINALIZED = 'finalized', 'Finalizado'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="audio_uploads"
+    )
+    patient = models.ForeignKey(
+        'patients.Patient',
+        on_delete=models.CASCADE,
+        related_name="audio_uploads"
+    )
+    record = models.ForeignKey(
+        PsyRecord,
+        on_delete=models.SET_NULL,
+        related_name="audio_uploads",
+        null=True,
+        blank=True,
+    )
+
+    path = models.CharField('Arquivo', max_length=500)
+    mime_type = models.CharField('Tipo', max_length=100, blank=True)
+    status = models.CharField('Status', max_length=20, choices=Status.choices, default=Status.OPEN)
+    next_index = models.PositiveIntegerField('Próxima parte esperada', default=0)
+    size = models.PositiveBigIntegerField('Bytes recebidos', default=0)
+    duration = models.FloatField('Segundos gravados', default=0)
+    segments_scheduled = models.PositiveIntegerField('Segmentos enviados para transcrição', default=0)
+    # Hash encadeado das partes recebidas (ver `transcription_cache.chain_sha256`)
+    parts_sha256 = models.CharField('SHA-256 das partes', max_length=64, blank=True)
+
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+    updated_at = models.DateTimeField('Atualizado em', auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Upload {self.pk} ({self.get_status_display()})"
+
+
+
+class TranscriptSegment(models.Model):
+    """Transcrição de um segmento do áudio, feita enquanto a sessão é gravada."""
+
+    upload = models.ForeignKey(
+        AudioUpload,
+        on_delete=models.CASCADE,
+        related_name="segments"
+    )
+    index = models.PositiveIntegerField('Segmento')
+    text = models.TextField('Transcrição')
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+
+    class Meta:
+        unique_together = ('upload', 'index')
+        ordering = ['upload', 'index']
+
+    def __str__(self):
+        return f"Segmento {self.index} do upload {self.upload_id}"
+
+
+
+class TranscriptionCache(models.Model):
+    """
+    Transcrição já feita de um áudio, identificado pelo SHA-256 do arquivo.
+
+    Reenviar o mesmo áudio (reprocessamento) vai direto para o resumo. A
+    versão do prompt faz parte da chave: mudar o prompt invalida o cache.
+    """
+
+    audio_sha256 = models.CharField('SHA-256 do áudio', max_length=64)
+    prompt_version = models.CharField('Versão do prompt', max_length=64)
+    transcription = models.TextField('Transcrição')
+    size = models.PositiveIntegerField('Tamanho (bytes)', default=0)
+
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+    last_used_at = models.DateTimeField('Último uso', default=timezone.now)
+
+    class Meta:
+        unique_together = ('audio_sha256', 'prompt_version')
+        ordering = ['-last_used_at']
+
+    def __str__(self):
+        return f"Transcrição {self.audio_sha256[:12]} ({self.prompt_version[:8]})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Chave gerada pelo navegador para um envio de prontuário/áudio.
+
+    Reenviar a mesma requisição (ex.: depois de uma queda do Wi-Fi) devolve a
+    resposta original em vez de criar outro prontuário e outro job (ver
+    `psy_records.idempotency`). Sem `response_status`, a primeira requisição
+    ainda está em andamento.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys"
+    )
+    key = models.CharField('Chave', max_length=100)
+    # Endpoint e objeto da requisição original ("create:<paciente>", "reprocess:<prontuário>")
+    scope = models.CharField('Escopo', max_length=100)
+    record = models.ForeignKey(PsyRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    job = models.ForeignKey(AudioJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    response_status = models.PositiveSmallIntegerField('Status da resposta', null=True, blank=True)
+    response_body = models.TextField('Resposta', blank=True)
+
+    created_at = models.DateTimeField('Criado em', default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'key')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Chave {self.key} ({self.scope})"
+
+
+class ClinicalHistoryEntry(models.Model):
+    """
+    Histórico completo (só cresce) dos campos clínicos do paciente.
+
+    Cada sessão processada registra o texto que acrescentou a cada campo.
+    Uma "base" guarda o texto inteiro dos campos quando ele não veio de uma
+    sessão (dados anteriores ao histórico ou edição manual); o contexto
+    enviado ao modelo começa na base mais recente (ver `psy_records.history`).
+    """
+
+    class Kind(models.TextChoices):
+        SESSION = 'session', 'Sessão'
+        BASELINE = 'baseline', 'Base'
+
+    patient = models.ForeignKey(
+        'patients.Patient',
+        on_delete=models.CASCADE,
+        related_name="clinical_history"
+    )
+    record = models.ForeignKey(
+        PsyRecord,
+        on_delete=models.SET_NULL,
+        related_name="clinical_history",
+        null=True,
+        blank=True,
+    )
+    kind = models.CharField('Tipo', max_length=20, choices=Kind.choices, default=Kind.SESSION)
+    # {"objectives": "texto acrescentado", ...}
+    fields = models.JSONField('Texto de cada campo', default=dict)
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+
+    class Meta:
+        ordering = ['patient', 'pk']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} de {self.patient} ({self.created_at:%d/%m/%Y})"
+
+
+class ClinicalDigest(models.Model):
+    """
+    Resumo do histórico antigo do paciente, enviado ao modelo no lugar do texto
+    completo das sessões até `compacted_through` (inclusive).
+    """
+
+    patient = models.OneToOneField(
+        'patients.Patient',
+        on_delete=models.CASCADE,
+        related_name="clinical_digest"
+    )
+    summary = models.JSONField('Resumo de cada campo', default=dict, blank=True)
+    compacted_through = models.ForeignKey(
+        ClinicalHistoryEntry,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+    )
+    # Hash dos campos do paciente na última atualização pelo histórico; diferente = edição manual
+    fields_sha256 = models.CharField('SHA-256 dos campos', max_length=64, blank=True)
+    updated_at = models.DateTimeField('Atualizado em', auto_now=True)
+
+    def __str__(self):
+        return f"Resumo do histórico de {self.patient}"
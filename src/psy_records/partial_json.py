@@ -0,0 +1,49 @@
+"""
+Leitura de um campo de texto de um JSON que ainda está sendo gerado.
+
+Durante a geração em streaming o modelo entrega o JSON em pedaços; aqui o
+valor parcial de uma chave string é extraído sem esperar o objeto fechar.
+"""
+import re
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def partial_string_field(text: str, key: str) -> str | None:
+    """
+    Valor (possivelmente incompleto) da chave string `key` em `text`.
+
+    Retorna None enquanto a chave ainda não apareceu. Um escape cortado no
+    fim do texto (ex.: `\\u00e`) fica de fora até chegar inteiro.
+    """
+    match = re.search(r'"' + re.escape(key) + r'"\s*:\s*"', text)
+    if not match:
+        return None
+
+    rest = text[match.end():]
+    chars = []
+    i = 0
+    while i < len(rest):
+        char = rest[i]
+        if char == '"':
+            break
+        if char != '\\':
+            chars.append(char)
+            i += 1
+            continue
+        if i + 1 >= len(rest):
+            break
+        escape = rest[i + 1]
+        if escape == 'u':
+            code = rest[i + 2:i + 6]
+            if len(code) < 4 or not all(c in '0123456789abcdefABCDEF' for c in code):
+                break
+            chars.append(chr(int(code, 16)))
+            i += 6
+        else:
+            chars.append(_ESCAPES.get(escape, escape))
+            i += 2
+
+    value = ''.join(chars)
+    # Pares substitutos (ex.: \ud83d\ude00) viram um único caractere
+    return value.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
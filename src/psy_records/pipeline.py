@@ -0,0 +1,742 @@
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import logging
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+
+from django.conf import settings
+from django.db import transaction
+from google import genai
+from google.genai import errors, types
+from pydantic import BaseModel, Field
+
+from patients.models import Patient
+from . import history, scratch
+from .gemini_clients import get_client
+from .metrics import STAGE_SECONDS, observe_stage
+from .models import AudioJob, PsyRecord, Transcript
+from .partial_json import partial_string_field
+from .rate_limit import call_with_limits
+from .silence import plan_silence_trim
+from .transcription_cache import get_cached_transcription, store_transcription
+from .transcode import AudioInfo, TranscodePlan, plan_transcode, probe_audio, speech_plan
+from .transcripts import merge_transcripts
+
+logger = logging.getLogger(__name__)
+
+# Etapas do processamento de um áudio, na ordem. O resultado de cada uma fica
+# em `AudioJob.checkpoints`, e uma nova tentativa pula as que já terminaram.
+AUDIO_STAGES = ("normalize", "transcribe", "summarize", "apply")
+
+
+class PermanentError(Exception):
+    """Falha que uma nova tentativa não resolve (ex.: API key ausente)."""
+
+
+def is_permanent_error(error: Exception | None) -> bool:
+    """Se a falha se repetiria em qualquer nova tentativa, como a de uma API key inválida."""
+    if isinstance(error, PermanentError):
+        return True
+    if isinstance(error, errors.APIError):
+        return error.code in (401, 403) or (error.code == 400 and "API key" in str(error.message))
+    return False
+
+
+class PsySummaryData(BaseModel):
+    objectives: str
+    clinical_demand: str
+    clinical_procedures: str
+    clinical_analysis: str
+    clinical_conclusion: str
+
+
+class PsyRecordData(BaseModel):
+    psy_record: str
+
+
+_SESSION_ADDITION = "Somente o texto novo desta sessão, a acrescentar ao fim do campo; vazio se não houver."
+
+
+class PsySummaryAdditions(BaseModel):
+    """O que a sessão acrescenta a cada campo clínico (o histórico não é repetido)."""
+
+    objectives: str = Field(description=_SESSION_ADDITION)
+    clinical_demand: str = Field(description=_SESSION_ADDITION)
+    clinical_procedures: str = Field(description=_SESSION_ADDITION)
+    clinical_analysis: str = Field(description=_SESSION_ADDITION)
+    clinical_conclusion: str = Field(description=_SESSION_ADDITION)
+
+
+class ResultPsySummaryData(PsySummaryAdditions, PsyRecordData):
+    """
+    Resposta do resumo. `psy_record` vem primeiro no schema para que, na
+    geração em streaming, o texto do prontuário comece a chegar logo.
+
+    Os campos clínicos trazem só o acréscimo da sessão: reescrever o histórico
+    inteiro a cada sessão deixava a resposta (e a geração) maior a cada vez.
+    """
+
+
+def get_patient_data(patient: Patient) -> dict:
+    """
+    Retorna os campos clínicos do paciente no formato enviado ao modelo: o
+    resumo do histórico antigo mais as sessões recentes (ver `history`).
+    """
+    return history.patient_context(patient)
+
+
+def _process_audio_background(
+    record_id: int,
+    patient_id: int,
+    audio_path: str,
+    api_key: str,
+    system_prompt_transcription: str,
+    system_prompt_summary: str,
+    patient_data: PsySummaryData,
+    transcribed_segments: list[str] | None = None,
+    audio_sha256: str = '',
+    on_stage: Callable[[str], None] | None = None,
+    on_partial: Callable[[str], None] | None = None,
+    checkpoints: dict | None = None,
+    on_checkpoint: Callable[[str, object], None] | None = None,
+    on_error: Callable[[Exception], None] | None = None,
+) -> bool:
+    """
+    Executa o processamento com Gemini e grava o resultado no prontuário.
+
+    O trabalho segue as etapas de AUDIO_STAGES, e `on_checkpoint(etapa,
+    resultado)` é chamado ao fim de cada uma. Com os `checkpoints` de uma
+    tentativa anterior, as etapas concluídas são puladas: se o resumo falhou,
+    a nova tentativa não transcreve o áudio de novo.
+
+    Com `on_error`, uma falha é repassada a quem chamou em vez de ir para o
+    prontuário: a fila de jobs só grava o erro quando desiste de tentar.
+
+    Retorna True quando o prontuário foi atualizado com o conteúdo gerado.
+    O arquivo de áudio não é removido aqui: quem decide é a fila de jobs,
+    que pode precisar dele para uma nova tentativa.
+    """
+    done = dict(checkpoints or {})
+
+    def checkpoint(stage: str, result) -> None:
+        done[stage] = result
+        if on_checkpoint:
+            on_checkpoint(stage, result)
+
+    if done:
+        logger.info(f"Retomando o record_id {record_id} após as etapas {', '.join(done)}")
+    else:
+        logger.info(f"Iniciando processamento de áudio para record_id: {record_id} - {patient_id}")
+    try:
+        if not api_key:
+            raise PermanentError("API key do Gemini não configurada para este usuário")
+        client = get_client(api_key)
+
+        if "transcribe" in done:
+            # Usa os dados do paciente de quando a transcrição foi guardada
+            transcript = Transcript.objects.get(record_id=record_id)
+            transcription, patient_data = transcript.text, transcript.patient_data
+        else:
+            transcription = get_cached_transcription(audio_sha256, system_prompt_transcription)
+            if transcription is None:
+                if "normalize" not in done:
+                    _report_stage(on_stage, AudioJob.Stage.TRANSCODING)
+                    info = normalize_audio(audio_path)
+                    checkpoint("normalize", asdict(info) if info else None)
+                info = AudioInfo(**done["normalize"]) if done["normalize"] else None
+                transcription = transcribe_audio(
+                    client, audio_path, system_prompt_transcription, transcribed_segments, on_stage, info
+                )
+                store_transcription(audio_sha256, system_prompt_transcription, transcription)
+            # Gravada antes do resumo: se ele falhar, dá para gerar de novo sem o áudio
+            save_transcript(record_id, transcription, patient_data, audio_sha256)
+            checkpoint("transcribe", True)
+
+        if "summarize" not in done:
+            _report_stage(on_stage, AudioJob.Stage.SUMMARIZING)
+            checkpoint("summarize", summarize_transcription(
+                client, system_prompt_summary, patient_data, transcription, on_partial
+            ))
+
+        # Aplicar de novo acrescentaria a mesma sessão duas vezes ao paciente
+        if "apply" not in done:
+            checkpoint("apply", apply_processed_content(record_id, patient_id, done["summarize"], patient_data))
+        logger.info("Processamento concluído")
+        _compact_history(client, patient_id)
+        return done["apply"]
+    except Exception as e:
+        logger.error(f"Erro ao processar áudio do record_id {record_id}: {e}", exc_info=True)
+        if on_error:
+            on_error(e)
+        else:
+            PsyRecord.objects.filter(id=record_id).update(
+                content=f"⚠ Erro ao processar áudio: {e}"
+            )
+        return False
+
+
+def _regenerate_from_transcript(
+    record_id: int,
+    patient_id: int,
+    api_key: str,
+    system_prompt_summary: str,
+    on_stage: Callable[[str], None] | None = None,
+    on_partial: Callable[[str], None] | None = None,
+) -> bool:
+    """
+    Gera o prontuário de novo a partir da transcrição guardada, sem áudio.
+
+    Usa os dados do paciente de quando a sessão foi processada, e não os
+    atuais (que já incluem o resultado dessa mesma sessão).
+    """
+    logger.info(f"Gerando novamente o prontuário do record_id {record_id} a partir da transcrição")
+    try:
+        transcript = Transcript.objects.get(record_id=record_id)
+        if not api_key:
+            raise PermanentError("API key do Gemini não configurada para este usuário")
+
+        client = get_client(api_key)
+        _report_stage(on_stage, AudioJob.Stage.SUMMARIZING)
+        try:
+            processed_content = summarize_transcription(
+                client, system_prompt_summary, transcript.patient_data, transcript.text, on_partial
+            )
+        except Exception as e:
+            logger.error(f"Erro ao gerar o prontuário com Gemini: {e}", exc_info=True)
+            processed_content = None
+        success = apply_processed_content(record_id, patient_id, processed_content, transcript.patient_data)
+        _compact_history(client, patient_id)
+        return success
+    except Exception as e:
+        logger.error(f"Erro ao gerar novamente o record_id {record_id}: {e}", exc_info=True)
+        PsyRecord.objects.filter(id=record_id).update(
+            content=f"⚠ Erro ao gerar o prontuário: {e}"
+        )
+        return False
+
+
+def _report_stage(on_stage: Callable[[str], None] | None, stage: str) -> None:
+    if on_stage:
+        on_stage(stage)
+
+
+def apply_processed_content(
+    record_id: int, patient_id: int, processed_content: dict | None, patient_data: dict
+) -> bool:
+    """
+    Grava o resultado do modelo no paciente e no prontuário.
+
+    Os campos clínicos da resposta são o texto novo da sessão, acrescentado
+    aos do paciente na mesma transação que grava o prontuário.
+    `patient_data` é o contexto enviado ao modelo, para descartar o texto
+    que ele tenha repetido.
+    """
+    # Paciente e prontuário juntos: uma nova tentativa nunca encontra só um dos dois atualizado
+    with observe_stage("db_save"), transaction.atomic():
+        return _apply_processed_content(record_id, patient_id, processed_content, patient_data)
+
+
+def _apply_processed_content(
+    record_id: int, patient_id: int, processed_content: dict | None, patient_data: dict
+) -> bool:
+    record = PsyRecord.objects.get(id=record_id)
+    if processed_content:
+        patient = Patient.objects.get(id=patient_id)
+        history.record_session(patient, record, history.extract_additions(patient_data, processed_content))
+        record.content = processed_content.get("psy_record")
+    else:
+        record.content = "⚠ Não foi possível processar o áudio."
+    record.save(update_fields=["content"])
+    return bool(processed_content)
+
+
+def _compact_history(client: genai.Client, patient_id: int) -> None:
+    """Resume o histórico antigo do paciente, se preciso; uma falha aqui não afeta o prontuário."""
+    try:
+        compact_patient_history(client, patient_id)
+    except Exception as e:
+        logger.warning(f"Erro ao resumir o histórico do paciente {patient_id}: {e}", exc_info=True)
+
+
+def compact_patient_history(client: genai.Client, patient_id: int) -> bool:
+    """
+    Incorpora as sessões mais antigas ao resumo do histórico quando o contexto
+    do paciente passa de PATIENT_HISTORY_TOKEN_BUDGET. Retorna True se resumiu.
+    """
+    plan = history.plan_compaction(Patient.objects.get(id=patient_id))
+    if plan is None:
+        return False
+
+    logger.info(f"Resumindo {len(plan.payload['entries'])} registro(s) do histórico do paciente {patient_id}")
+    request = dict(
+        model="gemini-2.5-flash",
+        contents=[PROMPT_HISTORY_COMPACTION, json.dumps(plan.payload, ensure_ascii=False)],
+        config={
+            "response_mime_type": "application/json",
+            "response_schema": PsySummaryData,
+        },
+    )
+    with observe_stage("history_compaction"):
+        text = call_with_limits(client, lambda: client.models.generate_content(**request).text)
+    json_match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if not json_match:
+        raise ValueError("Resposta sem JSON ao resumir o histórico")
+    return history.apply_compaction(plan, json.loads(json_match.group()))
+
+
+def save_transcript(record_id: int, transcription: str, patient_data: dict, audio_sha256: str = '') -> None:
+    with observe_stage("db_save"):
+        Transcript.objects.update_or_create(
+            record_id=record_id,
+            defaults={
+                'text': transcription,
+                'patient_data': patient_data,
+                'audio_sha256': audio_sha256,
+            },
+        )
+
+
+def summarize_transcription(
+    client: genai.Client,
+    system_prompt_summary: str,
+    patient_data: PsySummaryData,
+    transcription: str,
+    on_partial: Callable[[str], None] | None = None,
+) -> dict:
+    """
+    Gera o prontuário e o que a sessão acrescenta aos dados do paciente a
+    partir da transcrição.
+
+    Com `on_partial` (e AUDIO_SUMMARY_STREAMING), a resposta é gerada em
+    streaming e o texto parcial de `psy_record` é repassado a cada pedaço.
+    """
+    patient_data_json = json.dumps(patient_data, ensure_ascii=False)
+    logger.info("Iniciando a produção do prontuário")
+    request = dict(
+        model="gemini-2.5-flash",
+        contents=[
+            system_prompt_summary,
+            patient_data_json,
+            transcription,
+        ],
+        config={
+            # Vale também para prompts personalizados escritos para a resposta antiga (campos inteiros)
+            "system_instruction": PROMPT_SUMMARY_ADDITIONS,
+            "response_mime_type": "application/json",
+            "response_schema": ResultPsySummaryData,
+        }
+    )
+
+    def generate_streaming() -> str:
+        text = ""
+        last_partial = None
+        for chunk in client.models.generate_content_stream(**request):
+            text += chunk.text or ""
+            partial = partial_string_field(text, "psy_record")
+            if partial and partial != last_partial:
+                last_partial = partial
+                on_partial(partial)
+        return text
+
+    with observe_stage("summary"):
+        if on_partial and settings.AUDIO_SUMMARY_STREAMING:
+            update_text = call_with_limits(client, generate_streaming)
+        else:
+            update_text = call_with_limits(client, lambda: client.models.generate_content(**request).text)
+    logger.info("Prontuário escrito")
+
+    json_match = re.search(r"\{.*\}", update_text, re.DOTALL)
+    if json_match:
+        return json.loads(json_match.group())
+    return {"psy_record": update_text}
+
+
+def transcribe_audio(
+    client: genai.Client,
+    audio_path: str,
+    system_prompt_transcription: str,
+    transcribed_segments: list[str] | None = None,
+    on_stage: Callable[[str], None] | None = None,
+    audio_info: AudioInfo | None = None,
+) -> str:
+    """
+    Transcreve o que falta do áudio e junta com os segmentos já transcritos.
+
+    `audio_info` é o resultado de `normalize_audio`, quando já calculado.
+    """
+    transcription_parts = list(transcribed_segments or [])
+    if transcription_parts:
+        logger.info(f"Usando {len(transcription_parts)} segmento(s) transcrito(s) durante a gravação")
+
+    logger.info("Enviando requisições de transcrição para o gemini")
+    transcription_parts += transcribe_segments(
+        client, audio_path, system_prompt_transcription, first_index=len(transcription_parts), on_stage=on_stage,
+        audio_info=audio_info,
+    )
+    if not transcription_parts:
+        raise ValueError("Não foi possível preparar o áudio para transcrição")
+    logger.info("Transcrição concluida")
+
+    return merge_transcripts(transcription_parts)
+
+
+def transcribe_audio_chunks(
+    client: genai.Client,
+    audio_chunks: Iterable["AudioSegment"],
+    system_prompt_transcription: str,
+) -> str:
+    """
+    Transcreve os segmentos à medida que são gerados, um por chamada, e
+    retorna a transcrição completa.
+
+    Cada segmento é fechado (e o arquivo removido) assim que a requisição é
+    montada, então só um segmento fica em memória de cada vez.
+    """
+    transcriptions = [
+        _transcribe_segment(client, segment, system_prompt_transcription) for segment in audio_chunks
+    ]
+    if not transcriptions:
+        raise ValueError("O ffmpeg não gerou nenhum segmento de áudio")
+    return merge_transcripts(transcriptions)
+
+
+def _transcribe_segment(client: genai.Client, segment: "AudioSegment", system_prompt_transcription: str) -> str:
+    with segment:
+        # O `Blob` do SDK valida `data` como `bytes` e recusa a memoryview: esta é
+        # a única cópia do segmento, liberada ao sair da função (antes do próximo)
+        audio_part = types.Part.from_bytes(data=bytes(segment.data), mime_type=segment.mime_type)
+    with observe_stage("transcription"):
+        transcription_response = call_with_limits(client, lambda: client.models.generate_content(
+            model="gemini-2.5-flash", contents=[system_prompt_transcription, audio_part]
+        ))
+    return parse_transcription(transcription_response.text)
+
+
+def parse_transcription(text: str) -> str:
+    """Extrai a chave "transcription" da resposta; sem JSON válido, usa o texto puro."""
+    json_match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(json_match.group()).get("transcription", text)
+        except (ValueError, AttributeError):
+            pass
+    return text or ""
+
+
+def segment_window(index: int) -> tuple[float, float]:
+    """
+    Início e duração do segmento `index`.
+
+    Os segmentos seguem as fronteiras de SEGMENT_SECONDS, mas cada um começa
+    AUDIO_SEGMENT_OVERLAP_SECONDS antes, para que uma frase cortada no fim de
+    um segmento apareça inteira no seguinte (ver `merge_transcripts`).
+    """
+    start = max(0, index * SEGMENT_SECONDS - settings.AUDIO_SEGMENT_OVERLAP_SECONDS)
+    return start, (index + 1) * SEGMENT_SECONDS - start
+
+
+def transcribe_segments(
+    client: genai.Client,
+    audio_path: str,
+    system_prompt_transcription: str,
+    first_index: int = 0,
+    on_stage: Callable[[str], None] | None = None,
+    audio_info: AudioInfo | None = None,
+) -> list[str]:
+    """
+    Transcreve em paralelo os segmentos a partir de `first_index`.
+
+    Cada segmento é cortado e enviado numa chamada própria, com até
+    AUDIO_TRANSCRIPTION_FANOUT chamadas simultâneas; o tempo total passa a
+    depender do tamanho do segmento e não da duração da sessão.
+    """
+    if audio_info is None:
+        _report_stage(on_stage, AudioJob.Stage.TRANSCODING)
+        audio_info = normalize_audio(audio_path)
+    duration = audio_info.duration if audio_info else None
+    plan = plan_transcode(audio_info, MAX_CHUNK_SIZE_MB, duration)
+    logger.info(f"Plano de conversão para {audio_path}: {plan.mode} ({plan.bit_rate} bps)")
+    # Os segmentos são convertidos à medida que são transcritos (ver `split_audio_with_ffmpeg_into_chunks`)
+    _report_stage(on_stage, AudioJob.Stage.TRANSCRIBING)
+    if duration is None:
+        # Sem duração conhecida não dá para planejar as janelas: os segmentos saem em sequência
+        logger.warning(f"Duração de {audio_path} desconhecida; transcrevendo os segmentos em sequência")
+        start, _ = segment_window(first_index)
+        segments = split_audio_with_ffmpeg_into_chunks(audio_path, start_seconds=start, plan=plan)
+        return [transcribe_audio_chunks(client, segments, system_prompt_transcription)]
+
+    indices = list(range(first_index, math.ceil(duration / SEGMENT_SECONDS)))
+    if not indices:
+        return []
+
+    def transcribe(index: int) -> str:
+        start, length = segment_window(index)
+        segments = split_audio_with_ffmpeg_into_chunks(
+            audio_path, start_seconds=start, duration_seconds=length, plan=plan
+        )
+        logger.info(f"Transcrevendo o segmento {index} de {audio_path}")
+        return transcribe_audio_chunks(client, segments, system_prompt_transcription)
+
+    fanout = max(1, min(settings.AUDIO_TRANSCRIPTION_FANOUT, len(indices)))
+    with ThreadPoolExecutor(max_workers=fanout, thread_name_prefix="transcription") as pool:
+        return list(pool.map(transcribe, indices))
+
+
+def transcribe_audio_segment(audio_path: str, index: int, api_key: str, system_prompt_transcription: str) -> str | None:
+    """
+    Transcreve o segmento `index` (mesmas fronteiras de `segment_window`) de um
+    áudio que ainda pode estar sendo gravado. Retorna None em caso de falha.
+    """
+    try:
+        if not api_key:
+            raise PermanentError("API key do Gemini não configurada para este usuário")
+
+        start, length = segment_window(index)
+        segments = split_audio_with_ffmpeg_into_chunks(
+            audio_path,
+            start_seconds=start,
+            duration_seconds=length,
+        )
+
+        client = get_client(api_key)
+        logger.info(f"Transcrevendo o segmento {index} de {audio_path}")
+        return transcribe_audio_chunks(client, segments, system_prompt_transcription)
+    except Exception as e:
+        logger.error(f"Erro ao transcrever o segmento {index}: {e}", exc_info=True)
+        return None
+
+
+def normalize_audio(audio_path: str) -> AudioInfo | None:
+    """
+    Etapa "normalize": formato e duração do áudio, com que se planeja a
+    conversão e os segmentos. None se o ffprobe não reconhecer o arquivo.
+    """
+    info = probe_audio(audio_path)
+    if info is None:
+        return None
+    return replace(info, duration=probe_duration(audio_path, info))
+
+
+def probe_duration(audio_path: str, info: AudioInfo | None = None) -> float | None:
+    """
+    Duração do áudio em segundos.
+
+    Gravações do MediaRecorder não trazem a duração no cabeçalho; nesse caso o
+    arquivo é lido pelo ffmpeg sem decodificar (`-c copy`) até o fim.
+    """
+    info = info or probe_audio(audio_path)
+    if info is None:
+        return None
+    if info.duration:
+        return info.duration
+
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-nostdin', '-i', audio_path, '-map', '0:a', '-c', 'copy', '-f', 'null', '-'],
+            check=True, capture_output=True, text=True,
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.error(f"Erro no ffmpeg ao obter a duração de {audio_path}: {e}")
+        return None
+    times = re.findall(r"time=(\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not times:
+        return None
+    hours, minutes, seconds = times[-1]
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+PROMPT_TRANSCRIPTION = """
+Você é um transcritor clínico. Sua tarefa é transcrever a gravação da sessão verbalizando trocas entre participantes.
+
+Regras obrigatórias:
+1) Responda EXCLUSIVAMENTE com um único OBJETO JSON válido (UTF-8) e nada mais.
+2) O objeto JSON deve conter a chave "transcription" (string). Não inclua outras chaves.
+3) A transcrição deve diferenciar falantes usando rótulos padronizados em português: "Psicólogo:", "Paciente:", "Familiar:", "Outro:" (use apenas os rótulos relevantes).
+4) Separe cada fala em nova linha com o rótulo do falante no início da linha. Exemplo: "Paciente: ...\nPsicólogo: ...".
+5) Preserve o conteúdo verbal (transcreva literalmente quando possível). Para trechos inaudíveis, insira o marcador "[inaudível]".
+6) NÃO inclua timestamps, metadados ou comentários. NÃO generalize nomes automaticamente — se houver identificação direta, substitua por "[parente]" ou "[local]" e anote nada mais além da transcrição.
+7) Não tente resumir, interpretar ou corrigir o texto; faça transcrição fiel.
+8) Se não der para identificar o falante em um trecho, use "Outro:".
+Fim.
+"""
+
+PROMPT_SUMMARY_ADDITIONS = """
+Nos campos "objectives", "clinical_demand", "clinical_procedures", "clinical_analysis" e "clinical_conclusion", retorne SOMENTE o texto novo desta sessão, que será acrescentado ao fim do campo correspondente dos dados do paciente. Não repita o texto que já está nos dados do paciente. Se a sessão não acrescentar nada a um campo, retorne uma string vazia nele.
+"""
+
+PROMPT_HISTORY_COMPACTION = """
+Você resume o histórico clínico de um paciente de psicoterapia. Responda EXCLUSIVAMENTE com um único objeto JSON válido com as chaves "objectives", "clinical_demand", "clinical_procedures", "clinical_analysis" e "clinical_conclusion".
+
+Você receberá um JSON com:
+- "previous_summary": o resumo atual de cada campo (pode estar vazio);
+- "entries": registros mais antigos do histórico, em ordem cronológica, com o texto de cada campo;
+- "max_chars_per_field": o tamanho máximo de cada campo do novo resumo.
+
+Para cada campo, escreva um novo resumo que integre o resumo atual e os registros, em linguagem clínica concisa (AC e TCC quando apropriado):
+- preserve objetivos em aberto, objetivos cumpridos (indicando que foram cumpridos), demandas, procedimentos já empregados, hipóteses e recomendações ainda válidas (ex.: encaminhamentos);
+- mantenha a ordem cronológica quando ela for relevante para a evolução do caso;
+- não invente fatos e não inclua identificação do paciente;
+- respeite "max_chars_per_field".
+"""
+
+# Duração (segundos) de cada segmento gerado pelo ffmpeg. Os segmentos
+# transcritos durante a gravação usam as mesmas fronteiras.
+SEGMENT_SECONDS = 600
+# Limite de tamanho de cada segmento enviado inline ao Gemini
+MAX_CHUNK_SIZE_MB = 19
+
+
+class AudioSegment:
+    """
+    Segmento de áudio gerado pelo ffmpeg, lido do disco via mmap.
+
+    `data` é uma memoryview sobre o arquivo mapeado, sem cópia para a memória
+    do processo. `close()` (ou o fim do bloco `with`) libera o mapeamento e
+    remove o arquivo, então cada segmento ocupa espaço só enquanto é usado.
+    """
+
+    mime_type = "audio/webm"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap não aceita arquivos vazios
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.data = memoryview(self._mmap) if self._mmap else memoryview(b"")
+
+    def __len__(self) -> int:
+        return self.data.nbytes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.data.release()
+        if self._mmap:
+            self._mmap.close()
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def split_audio_with_ffmpeg_into_chunks(
+    input_filepath: str,
+    max_chunk_size_mb: int = MAX_CHUNK_SIZE_MB,
+    start_seconds: float = 0,
+    duration_seconds: float | None = None,
+    plan: TranscodePlan | None = None,
+    trim_silence: bool | None = None,
+) -> Iterator[AudioSegment]:
+    """
+    Divide um arquivo de áudio em segmentos usando FFmpeg, entregando cada
+    segmento assim que o ffmpeg termina de gravá-lo.
+
+    O ffmpeg informa cada segmento concluído pela lista de segmentos
+    (`-segment_list pipe:1`), então o primeiro pode ser transcrito enquanto
+    os seguintes ainda estão sendo gerados. Quem consome deve fechar cada
+    segmento (ver `AudioSegment`) antes de pedir o próximo.
+
+    O áudio é copiado ou convertido conforme o `plan` (ver `plan_transcode`),
+    e cada segmento dura no máximo o que cabe em `max_chunk_size_mb`. Com
+    `trim_silence`, os silêncios longos são removidos antes (o que exige
+    converter o áudio).
+
+    Args:
+        input_filepath: Caminho completo para o arquivo de áudio de entrada.
+        max_chunk_size_mb: Tamanho máximo desejado para cada chunk em megabytes.
+        start_seconds: Posição a partir da qual o áudio é processado.
+        duration_seconds: Limita a duração processada (None = até o fim).
+        plan: Plano de conversão já calculado (None = analisa o arquivo).
+        trim_silence: Remove silêncios longos (None = AUDIO_TRIM_SILENCE).
+
+    Yields:
+        Um `AudioSegment` por segmento, em ordem.
+
+    Raises:
+        subprocess.CalledProcessError: se o ffmpeg falhar.
+    """
+    if not os.path.getsize(input_filepath):
+        logger.error(f"Arquivo de entrada {input_filepath} tem tamanho 0.")
+        return
+    if plan is None:
+        plan = plan_transcode(probe_audio(input_filepath), max_chunk_size_mb)
+    if trim_silence is None:
+        trim_silence = settings.AUDIO_TRIM_SILENCE
+
+    audio_filter = plan_silence_trim(input_filepath, start_seconds, duration_seconds) if trim_silence else None
+    if audio_filter:
+        if plan.mode == 'copy':
+            # O filtro de recorte precisa do áudio decodificado
+            plan = speech_plan(max_chunk_size_mb)
+    segment_time = min(max(SEGMENT_SECONDS, duration_seconds or 0), plan.max_segment_seconds)
+
+    # O ffmpeg pode criar vários arquivos de saída, então um diretório é melhor
+    temp_dir = scratch.work_dir(input_filepath)
+    output_filename_pattern = os.path.join(temp_dir, "chunk_%03d.webm")  # Saída sempre em webm para consistência
+
+    ffmpeg_split_command = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+    if start_seconds:
+        ffmpeg_split_command += ['-ss', str(start_seconds)]  # Pula segmentos já transcritos
+    ffmpeg_split_command += ['-i', input_filepath]           # Arquivo de entrada
+    if duration_seconds:
+        ffmpeg_split_command += ['-t', str(duration_seconds)]
+    ffmpeg_split_command += [
+        '-map', '0:a:0',            # Só o primeiro stream de áudio
+        *(['-af', audio_filter] if audio_filter else []),  # Recorte dos silêncios
+        *plan.codec_args,           # Cópia do Opus ou conversão rápida para fala
+        '-f', 'segment',            # Usa o muxer de segmento
+        '-segment_time', str(segment_time), # Divide por tempo
+        '-segment_format', 'webm',
+        '-segment_list', 'pipe:1',  # Informa cada segmento concluído na saída padrão
+        '-segment_list_type', 'flat',
+        output_filename_pattern     # Padrão de nome de arquivo de saída
+    ]
+
+    logger.info(f"Executando FFmpeg split: {' '.join(ffmpeg_split_command)}")
+    # Tempo esperando o ffmpeg (sem contar o consumo de cada segmento)
+    waited = 0.0
+    with tempfile.TemporaryFile() as stderr:
+        resumed_at = time.perf_counter()
+        process = subprocess.Popen(ffmpeg_split_command, stdout=subprocess.PIPE, stderr=stderr, text=True)
+        try:
+            for line in process.stdout:
+                filename = os.path.basename(line.strip())
+                if not filename:
+                    continue
+                logger.debug(f"Segmento {filename} pronto em {temp_dir}")
+                waited += time.perf_counter() - resumed_at
+                yield AudioSegment(os.path.join(temp_dir, filename))
+                resumed_at = time.perf_counter()
+
+            returncode = process.wait()
+            waited += time.perf_counter() - resumed_at
+            STAGE_SECONDS.observe(waited, stage="ffmpeg")
+            if returncode != 0:
+                stderr.seek(0)
+                error = stderr.read().decode(errors='replace')
+                logger.error(f"Erro FFmpeg ao dividir áudio: {error}")
+                raise subprocess.CalledProcessError(process.returncode, ffmpeg_split_command, stderr=error)
+        finally:
+            # Consumidor desistiu no meio (ou erro): não deixa o ffmpeg rodando
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            logger.info(f"Diretório temporário {temp_dir} e seus conteúdos removidos.")
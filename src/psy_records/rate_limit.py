@@ -0,0 +1,165 @@
+"""
+Limite de requisições ao Gemini por API key, com retentativas.
+
+Várias sessões da mesma conta processadas ao mesmo tempo estouram a cota
+(429) e, sem controle, o job inteiro falhava. Cada API key tem um
+`RateLimiter`, indexado pelo hash da key como no pool de `gemini_clients`:
+
+- balde de fichas com GEMINI_REQUESTS_PER_MINUTE e rajada de até
+  GEMINI_MAX_IN_FLIGHT requisições;
+- no máximo GEMINI_MAX_IN_FLIGHT chamadas em andamento;
+- em 429/5xx, espera o Retry-After (ou backoff exponencial com jitter) e
+  tenta de novo, até GEMINI_MAX_RETRIES vezes. A pausa vale para todas as
+  threads da mesma key, e um 429 reduz o ritmo pela metade; cada sucesso o
+  recupera aos poucos.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections.abc import Callable
+from typing import TypeVar
+
+import httpx
+from django.conf import settings
+from google.genai import errors
+
+from .gemini_clients import key_hash
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Ritmo mínimo após reduções sucessivas (fração do configurado)
+MIN_RATE_FRACTION = 0.1
+
+_limiters: "dict[str, RateLimiter]" = {}
+_lock = threading.Lock()
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: float, max_in_flight: int):
+        self.max_rate = requests_per_minute / 60
+        self.rate = self.max_rate
+        self.capacity = max(1, max_in_flight)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.in_flight = threading.BoundedSemaphore(self.capacity)
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Espera uma ficha (e o fim de uma pausa por 429) antes de chamar a API."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self, delay: float) -> None:
+        """A API pediu para esperar: pausa a key inteira e reduz o ritmo."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+
+    def succeeded(self) -> None:
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+def limiter_for(client) -> RateLimiter:
+    """
+    Limitador da API key do cliente.
+
+    Indexado pela key, e não pelo cliente: o pool pode descartar e recriar o
+    cliente de uma key enquanto o antigo ainda tem chamadas em andamento, e a
+    cota do Gemini é da key.
+    """
+    key = key_hash(client)
+    if key is None:
+        # Cliente criado fora do pool: limitador só para esta chamada
+        return _new_limiter()
+    with _lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = _new_limiter()
+        return limiter
+
+
+def _new_limiter() -> RateLimiter:
+    return RateLimiter(settings.GEMINI_REQUESTS_PER_MINUTE, settings.GEMINI_MAX_IN_FLIGHT)
+
+
+def call_with_limits(client, call: Callable[[], T]) -> T:
+    """
+    Executa `call` (uma requisição completa ao modelo, inclusive o consumo do
+    streaming) respeitando o limite da key e repetindo em falhas transitórias.
+    """
+    limiter = limiter_for(client)
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            with limiter.in_flight:
+                result = call()
+        except Exception as e:
+            if not is_retryable(e) or attempt >= settings.GEMINI_MAX_RETRIES:
+                raise
+            delay = retry_after(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            if getattr(e, "code", None) == 429:
+                limiter.throttled(delay)
+            attempt += 1
+            logger.warning(
+                f"Gemini indisponível ({e.__class__.__name__}: {getattr(e, 'code', '')}); "
+                f"tentativa {attempt} de {settings.GEMINI_MAX_RETRIES} em {delay:.1f}s"
+            )
+            time.sleep(delay)
+            continue
+        limiter.succeeded()
+        return result
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter completo."""
+    ceiling = min(settings.GEMINI_BACKOFF_MAX_SECONDS, settings.GEMINI_BACKOFF_SECONDS * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+def retry_after(error: Exception) -> float | None:
+    """
+    Espera pedida pela API: cabeçalho Retry-After ou `RetryInfo.retryDelay`
+    (ex.: "30s") nos detalhes do erro.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return min(float(value), settings.GEMINI_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            match = re.fullmatch(r"([\d.]+)s", str(detail.get("retryDelay", "")))
+            if match:
+                return min(float(match.group(1)), settings.GEMINI_BACKOFF_MAX_SECONDS)
+    return None
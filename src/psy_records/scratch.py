@@ -0,0 +1,170 @@
+"""
+Espaço de trabalho em disco para os áudios e as saídas do ffmpeg.
+
+Cada upload recebe um diretório próprio em AUDIO_JOBS_DIR (`<hex>/`), com o
+áudio e os diretórios temporários do ffmpeg dos jobs que o processam.
+Apagar o áudio apaga o diretório inteiro, então nada fica para trás mesmo
+quando um segmento não foi removido.
+
+O uso total é limitado por AUDIO_SCRATCH_MAX_BYTES: acima disso
+`check_quota` recusa novos uploads (ver `jobs.check_admission`), e o
+`AudioUploadHandler` interrompe o recebimento de um áudio que não cabe. O que
+escapar da limpeza (worker morto, disco cheio no meio da gravação) é
+removido pelo comando `clean_audio_scratch`.
+"""
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+AUDIO_FILENAME = "audio"
+_SCRATCH_DIR_NAME = re.compile(r"[0-9a-f]{32}")
+
+QUOTA_FULL_MESSAGE = "O espaço para processamento de áudio está cheio. Tente novamente em alguns minutos."
+
+
+class ScratchFull(Exception):
+    """O espaço de trabalho em disco passou da cota."""
+
+
+def create_dir() -> str:
+    """Cria o diretório de trabalho de um novo upload."""
+    path = os.path.join(settings.AUDIO_JOBS_DIR, uuid.uuid4().hex)
+    os.makedirs(path)
+    return path
+
+
+def audio_path(directory: str, extension: str = "webm") -> str:
+    return os.path.join(directory, f"{AUDIO_FILENAME}.{extension}")
+
+
+def work_dir(audio_file: str) -> str:
+    """
+    Diretório temporário (ex.: segmentos do ffmpeg) ao lado do áudio, para
+    contar na cota e sair junto com ele; fora do espaço de trabalho, usa o
+    temporário do sistema.
+    """
+    parent = owning_dir(audio_file)
+    return tempfile.mkdtemp(prefix="work_", dir=parent) if parent else tempfile.mkdtemp()
+
+
+def owning_dir(path: str) -> str | None:
+    """Diretório de trabalho que contém `path` (None se estiver fora de um)."""
+    root = os.path.abspath(settings.AUDIO_JOBS_DIR)
+    parent = os.path.dirname(os.path.abspath(path))
+    if os.path.dirname(parent) == root and _SCRATCH_DIR_NAME.fullmatch(os.path.basename(parent)):
+        return parent
+    return None
+
+
+def remove(path: str) -> None:
+    """Remove o áudio e, se ele estiver num diretório de trabalho, o diretório todo."""
+    if not path:
+        return
+    directory = owning_dir(path)
+    try:
+        if directory:
+            shutil.rmtree(directory)
+        elif os.path.exists(path):
+            os.unlink(path)
+        else:
+            return
+        logger.info(f"Arquivo de áudio {path} removido.")
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.warning(f"Falha ao apagar arquivo de áudio {path}.", exc_info=True)
+
+
+def usage_bytes() -> int:
+    """Espaço ocupado em AUDIO_JOBS_DIR."""
+    return _directory_size(settings.AUDIO_JOBS_DIR)
+
+
+def check_quota() -> None:
+    """Levanta `ScratchFull` quando o espaço de trabalho passou de AUDIO_SCRATCH_MAX_BYTES."""
+    free = free_bytes()
+    if free is not None and free <= 0:
+        raise ScratchFull(QUOTA_FULL_MESSAGE)
+
+
+def free_bytes() -> int | None:
+    """Quanto ainda cabe na cota de AUDIO_SCRATCH_MAX_BYTES (None = sem limite)."""
+    limit = settings.AUDIO_SCRATCH_MAX_BYTES
+    if not limit:
+        return None
+    return limit - usage_bytes()
+
+
+def orphaned_entries(in_use: set[str], min_age_seconds: float) -> list[str]:
+    """
+    Entradas de AUDIO_JOBS_DIR que nenhum job ou upload em andamento usa e
+    que não são modificadas há pelo menos `min_age_seconds`.
+
+    `in_use` são os caminhos de áudio ainda necessários.
+    """
+    root = settings.AUDIO_JOBS_DIR
+    keep = {os.path.abspath(path) for path in in_use}
+    keep |= {owning_dir(path) for path in in_use} - {None}
+    cutoff = time.time() - min_age_seconds
+
+    orphans = []
+    for entry in _entries(root):
+        path = os.path.abspath(entry.path)
+        if path in keep or _last_modified(entry) > cutoff:
+            continue
+        orphans.append(path)
+    return orphans
+
+
+def remove_entry(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _entries(root: str):
+    """Diretórios de trabalho e arquivos soltos (inclusive os de `uploads/`, do formato antigo)."""
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False) and entry.name == "uploads":
+            yield from (child for child in os.scandir(entry.path) if child.is_file(follow_symlinks=False))
+        else:
+            yield entry
+
+
+def _last_modified(entry: os.DirEntry) -> float:
+    latest = entry.stat(follow_symlinks=False).st_mtime
+    if entry.is_dir(follow_symlinks=False):
+        for dirpath, dirnames, filenames in os.walk(entry.path):
+            for name in dirnames + filenames:
+                try:
+                    latest = max(latest, os.lstat(os.path.join(dirpath, name)).st_mtime)
+                except FileNotFoundError:
+                    pass
+    return latest
+
+
+def _directory_size(root: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
@@ -0,0 +1,131 @@
+"""
+Remoção de silêncios longos antes da transcrição.
+
+As gravações de sessão têm pausas longas e trechos antes do início e depois
+do fim do atendimento. O `silencedetect` do ffmpeg localiza esses trechos e
+só a fala é enviada ao Gemini.
+"""
+import logging
+import re
+import subprocess
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Fala mantida antes e depois de cada silêncio, para não cortar palavras
+SILENCE_PADDING = 0.3
+
+_SILENCE_START = re.compile(r"silence_start:\s*(-?\d+(?:\.\d+)?)")
+_SILENCE_END = re.compile(r"silence_end:\s*(-?\d+(?:\.\d+)?)")
+
+
+def detect_silences(
+    audio_path: str,
+    start_seconds: float = 0,
+    duration_seconds: float | None = None,
+) -> list[tuple[float, float | None]] | None:
+    """
+    Silêncios de pelo menos AUDIO_SILENCE_MIN_SECONDS, relativos a `start_seconds`.
+
+    Um silêncio que vai até o fim do áudio vem com fim None. Retorna None se o
+    ffmpeg falhar.
+    """
+    command = ['ffmpeg', '-nostdin', '-hide_banner', '-nostats']
+    if start_seconds:
+        command += ['-ss', str(start_seconds)]
+    command += ['-i', audio_path]
+    if duration_seconds:
+        command += ['-t', str(duration_seconds)]
+    command += [
+        '-map', '0:a:0',
+        '-af', (
+            f"silencedetect=noise={settings.AUDIO_SILENCE_THRESHOLD_DB}dB"
+            f":d={settings.AUDIO_SILENCE_MIN_SECONDS}"
+        ),
+        '-f', 'null', '-',
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.error(f"Erro no ffmpeg ao detectar silêncios em {audio_path}: {e}")
+        return None
+    return parse_silences(result.stderr)
+
+
+def parse_silences(output: str) -> list[tuple[float, float | None]]:
+    """Lê os pares silence_start/silence_end da saída do `silencedetect`."""
+    silences = []
+    current = None
+    for line in output.splitlines():
+        if match := _SILENCE_START.search(line):
+            current = max(0.0, float(match.group(1)))
+        elif (match := _SILENCE_END.search(line)) and current is not None:
+            silences.append((current, float(match.group(1))))
+            current = None
+    if current is not None:
+        silences.append((current, None))
+    return silences
+
+
+def speech_intervals(
+    silences: list[tuple[float, float | None]],
+    total_seconds: float | None = None,
+    padding: float = SILENCE_PADDING,
+) -> list[tuple[float, float]]:
+    """
+    Trechos de fala `(início, fim)` entre os silêncios, em ordem, com
+    `padding` de folga em cada lado.
+
+    Sem `total_seconds`, o último trecho vai até o fim do áudio (fim None
+    vira infinito e é tratado pelo filtro como "até o fim").
+    """
+    intervals = []
+    position = 0.0
+    for start, end in silences:
+        if start > position:
+            intervals.append((position, start + padding))
+        if end is None:
+            return intervals
+        position = max(position, end - padding)
+    end_of_audio = total_seconds if total_seconds is not None else float('inf')
+    if end_of_audio > position:
+        intervals.append((position, end_of_audio))
+    return intervals
+
+
+def trim_filter(intervals: list[tuple[float, float]]) -> str:
+    """Filtro do ffmpeg que mantém só os trechos de `intervals`, emendados."""
+    conditions = []
+    for start, end in intervals:
+        if end == float('inf'):
+            conditions.append(f"gte(t,{start:.3f})")
+        else:
+            conditions.append(f"between(t,{start:.3f},{end:.3f})")
+    return f"aselect='{'+'.join(conditions)}',asetpts=N/SR/TB"
+
+
+def plan_silence_trim(
+    audio_path: str,
+    start_seconds: float = 0,
+    duration_seconds: float | None = None,
+) -> str | None:
+    """
+    Filtro de recorte dos silêncios para o trecho pedido do áudio.
+
+    Retorna None quando não há o que recortar, quando a detecção falha ou
+    quando não há fala nenhuma (o trecho vai inteiro, para o modelo decidir).
+    """
+    silences = detect_silences(audio_path, start_seconds, duration_seconds)
+    if not silences:
+        return None
+    intervals = speech_intervals(silences, duration_seconds)
+    if not intervals:
+        logger.info(f"Nenhuma fala detectada em {audio_path} a partir de {start_seconds}s; áudio mantido inteiro")
+        return None
+
+    logger.info(
+        f"Removendo {len(silences)} silêncio(s) de {audio_path} a partir de {start_seconds}s; "
+        f"{len(intervals)} trecho(s) de fala mantido(s)"
+    )
+    return trim_filter(intervals)
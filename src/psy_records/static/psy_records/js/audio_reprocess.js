@@ -4,6 +4,8 @@ class AudioReprocessSubmitter {
     constructor() {
         this.form = null;
         this.input = null;
+        // Repetida nas novas tentativas de envio do mesmo arquivo (ver psy_records/idempotency.py)
+        this.idempotencyKey = null;
     }
 
     init() {
@@ -12,6 +14,12 @@ class AudioReprocessSubmitter {
 
         if (!this.form) return;
 
+        if (this.input) {
+            this.input.addEventListener("change", () => {
+                this.idempotencyKey = null;
+            });
+        }
+
         this.form.addEventListener("submit", (e) => {
             if (this.input && this.input.files.length > 0) {
                 e.preventDefault();
@@ -26,6 +34,7 @@ class AudioReprocessSubmitter {
         if (!file) return;
 
         this.showStatus("📤 Enviando áudio para reprocessamento...", "loading");
+        this.idempotencyKey = this.idempotencyKey || newReprocessKey();
 
         try {
             const formData = new FormData(this.form);
@@ -35,7 +44,10 @@ class AudioReprocessSubmitter {
             const response = await fetch(this.form.action, {
                 method: "POST",
                 body: formData,
-                headers: { "X-Requested-With": "XMLHttpRequest" }
+                headers: {
+                    "X-Requested-With": "XMLHttpRequest",
+                    "Idempotency-Key": this.idempotencyKey
+                }
             });
 
             if (response.ok) {
@@ -53,6 +65,10 @@ class AudioReprocessSubmitter {
                     document.write(html);
                     document.close();
                 }
+            } else if (response.status === 503 || response.status === 409) {
+                // Fila cheia ou envio anterior ainda em andamento: o servidor explica o motivo
+                const data = await response.json();
+                this.handleResponse(data);
             } else {
                 throw new Error("HTTP erro " + response.status);
             }
@@ -64,7 +80,7 @@ class AudioReprocessSubmitter {
 
     handleResponse(data) {
         if (data.success) {
-            this.showStatus("✅ Prontuário reprocessado com sucesso!", "success");
+            this.showStatus(data.queued ? "⏳ " + data.message : "✅ Prontuário reprocessado com sucesso!", "success");
             setTimeout(() => {
                 if (data.redirect_url) {
                     window.location.href = data.redirect_url;
@@ -86,6 +102,12 @@ class AudioReprocessSubmitter {
     }
 }
 
+// Chave única por envio; crypto.randomUUID só existe em contexto seguro (HTTPS/localhost)
+function newReprocessKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+}
+
 document.addEventListener("DOMContentLoaded", () => {
     const re = new AudioReprocessSubmitter();
     re.init();
@@ -0,0 +1,174 @@
+// static/psy_records/js/chunked_upload.js
+
+// Envia o áudio em partes numeradas enquanto a sessão é gravada.
+// Ao finalizar a gravação só falta enviar o restante e chamar "finalize".
+class ChunkedAudioUploader {
+    constructor(createUrl, csrfToken) {
+        this.createUrl = createUrl;
+        this.csrfToken = csrfToken;
+        this.uploadUrl = null;
+        this.pending = [];        // blobs do MediaRecorder ainda não agrupados
+        this.pendingSize = 0;
+        this.chunks = [];         // partes numeradas, na ordem de envio
+        this.chunkEnds = [];      // segundos de gravação ao fim de cada parte
+        this.startedAt = Date.now();
+        this.acked = 0;           // partes confirmadas pelo servidor
+        this.sending = null;
+        this.failed = false;
+        this.cancelled = false;
+        this.flushBytes = 256 * 1024;
+        this.maxRetries = 5;
+    }
+
+    // Cria a sessão de upload no servidor
+    async start(mimeType) {
+        try {
+            const formData = new FormData();
+            formData.append('mime_type', mimeType || '');
+            const response = await fetch(this.createUrl, {
+                method: 'POST',
+                body: formData,
+                headers: this.headers()
+            });
+            const data = await response.json();
+            if (!response.ok || !data.success) {
+                throw new Error(data.message || `Erro HTTP: ${response.status}`);
+            }
+            this.uploadUrl = data.upload_url;
+            if (this.cancelled) {
+                // Cancelado enquanto a sessão era criada
+                this.cancel();
+                return false;
+            }
+            this.pump();
+            return true;
+        } catch (error) {
+            console.warn('Upload em partes indisponível, o áudio será enviado ao final:', error);
+            this.failed = true;
+            return false;
+        }
+    }
+
+    // Recebe um pedaço do MediaRecorder
+    push(blob) {
+        if (this.failed) return;
+        this.pending.push(blob);
+        this.pendingSize += blob.size;
+        if (this.pendingSize >= this.flushBytes) {
+            this.seal();
+            this.pump();
+        }
+    }
+
+    // Agrupa os pedaços pendentes numa nova parte numerada
+    seal() {
+        if (this.pending.length === 0) return;
+        this.chunks.push(new Blob(this.pending));
+        this.chunkEnds.push((Date.now() - this.startedAt) / 1000);
+        this.pending = [];
+        this.pendingSize = 0;
+    }
+
+    pump() {
+        if (!this.uploadUrl || this.sending || this.failed) return this.sending;
+        this.sending = this.sendPending().finally(() => {
+            this.sending = null;
+        });
+        return this.sending;
+    }
+
+    // Envia as partes ainda não confirmadas, em ordem, com novas tentativas
+    async sendPending() {
+        let retries = 0;
+        while (this.acked < this.chunks.length && !this.failed) {
+            const index = this.acked;
+            try {
+                const response = await fetch(`${this.uploadUrl}chunks/${index}/`, {
+                    method: 'PUT',
+                    body: this.chunks[index],
+                    headers: {
+                        ...this.headers(),
+                        'Content-Type': 'application/octet-stream',
+                        // Permite ao servidor transcrever os segmentos já completos
+                        'X-Audio-End-Seconds': String(this.chunkEnds[index])
+                    }
+                });
+                const data = await response.json();
+                if (data.status && data.status !== 'open') {
+                    this.failed = true;
+                    return;
+                }
+                if (!response.ok && response.status !== 409) {
+                    throw new Error(`Erro HTTP: ${response.status}`);
+                }
+                // Em 409 o servidor informa qual parte espera; seguimos a partir dela
+                this.acked = data.next_index;
+                retries = 0;
+            } catch (error) {
+                retries += 1;
+                if (retries > this.maxRetries) {
+                    console.warn('Falha ao enviar parte do áudio, nova tentativa depois:', error);
+                    return;
+                }
+                await this.sleep(Math.min(1000 * 2 ** retries, 30000));
+                await this.resync();
+            }
+        }
+    }
+
+    // Consulta o servidor para retomar a partir da última parte recebida
+    async resync() {
+        if (!this.uploadUrl) return;
+        try {
+            const response = await fetch(this.uploadUrl, { headers: this.headers() });
+            if (response.ok) {
+                const data = await response.json();
+                this.acked = data.next_index;
+            }
+        } catch (error) {
+            // Sem conexão: mantém o estado local e tenta de novo depois
+        }
+    }
+
+    // Envia o restante; retorna true quando todas as partes foram confirmadas
+    async finish() {
+        if (this.failed || !this.uploadUrl) return false;
+        this.seal();
+        for (let round = 0; round < 3 && this.acked < this.chunks.length && !this.failed; round++) {
+            await this.pump();
+        }
+        return !this.failed && this.acked === this.chunks.length;
+    }
+
+    // Cria o prontuário com o áudio já enviado
+    finalize(formData) {
+        formData.append('total_chunks', this.chunks.length);
+        return fetch(`${this.uploadUrl}finalize/`, {
+            method: 'POST',
+            body: formData,
+            headers: this.headers()
+        });
+    }
+
+    // Descarta o upload e o áudio já recebido pelo servidor
+    cancel() {
+        this.cancelled = true;
+        this.failed = true;
+        if (!this.uploadUrl) return Promise.resolve();
+        const url = this.uploadUrl;
+        this.uploadUrl = null;
+        return fetch(url, { method: 'DELETE', headers: this.headers(), keepalive: true })
+            .catch(error => console.warn('Não foi possível descartar o upload em partes:', error));
+    }
+
+    headers() {
+        return {
+            'X-CSRFToken': this.csrfToken,
+            'X-Requested-With': 'XMLHttpRequest'
+        };
+    }
+
+    sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+}
@@ -0,0 +1,91 @@
+// static/psy_records/js/processing_status.js
+
+// Acompanha o processamento dos prontuários sem recarregar a página.
+// Usa Server-Sent Events quando disponível; senão, long-poll com `?since=`.
+class ProcessingStatusWatcher {
+    constructor(element) {
+        this.url = element.dataset.url;
+        this.reloadOnFinish = element.dataset.reloadOnFinish === "true";
+        this.source = null;
+        // Jobs vistos em andamento nesta página (só eles disparam o recarregamento)
+        this.seenActive = new Set();
+    }
+
+    start() {
+        if (!this.url) return;
+        if (window.EventSource) {
+            this.listen();
+        } else {
+            this.poll(null);
+        }
+    }
+
+    listen() {
+        this.source = new EventSource(this.url);
+        this.source.addEventListener("status", (e) => this.render(JSON.parse(e.data)));
+        this.source.addEventListener("idle", () => this.source.close());
+        // Em caso de erro o EventSource reconecta sozinho
+    }
+
+    async poll(since) {
+        try {
+            const url = new URL(this.url, window.location.origin);
+            if (since) url.searchParams.set("since", since);
+            const response = await fetch(url, { headers: { "X-Requested-With": "XMLHttpRequest" } });
+            if (!response.ok) throw new Error("HTTP erro " + response.status);
+            const status = await response.json();
+            this.render(status);
+            if (status.active) this.poll(status.version);
+        } catch (err) {
+            console.error(err);
+            setTimeout(() => this.poll(since), 5000);
+        }
+    }
+
+    render(status) {
+        let finished = false;
+        for (const job of status.jobs) {
+            const active = job.status === "queued" || job.status === "running";
+            if (active) {
+                this.seenActive.add(job.job_id);
+            } else if (this.seenActive.delete(job.job_id)) {
+                finished = true;
+            }
+
+            document.querySelectorAll(`[data-record-status="${job.record_id}"]`).forEach((badge) => {
+                badge.textContent = this.label(job);
+                badge.className = "record-status text-sm " + (
+                    job.status === "failed" ? "text-red-600" : active ? "text-blue-600" : "text-green-600"
+                );
+                badge.classList.remove("hidden");
+            });
+
+            // Texto parcial enquanto o prontuário é gerado; o final quando termina
+            const text = job.content !== undefined ? job.content : job.partial_content;
+            if (text !== undefined) {
+                const content = document.getElementById("record-content");
+                if (content) content.textContent = text;
+            }
+        }
+
+        if (finished && this.reloadOnFinish) {
+            // Os dados clínicos do paciente também mudaram
+            if (this.source) this.source.close();
+            window.location.reload();
+        }
+    }
+
+    label(job) {
+        if (job.status === "queued" && job.queue_position > 1) {
+            return `⏳ ${job.stage_label} (posição ${job.queue_position})`;
+        }
+        const icons = { done: "✅", failed: "❌" };
+        return `${icons[job.stage] || "⏳"} ${job.stage_label}`;
+    }
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+    document.querySelectorAll("[data-processing-status]").forEach((element) => {
+        new ProcessingStatusWatcher(element).start();
+    });
+});
@@ -5,6 +5,7 @@ class AudioRecorder {
         this.stream = null;
         this.isRecording = false;
         this.audioBlob = null;
+        this.onChunk = null; // callback opcional para envio em partes durante a gravação
     }
 
     // Lista os dispositivos de áudio disponíveis
@@ -61,6 +62,9 @@ class AudioRecorder {
             this.mediaRecorder.ondataavailable = (event) => {
                 if (event.data.size > 0) {
                     this.audioChunks.push(event.data);
+                    if (this.onChunk) {
+                        this.onChunk(event.data);
+                    }
                 }
             };
 
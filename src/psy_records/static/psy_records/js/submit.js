@@ -3,6 +3,9 @@ class AudioSubmitter {
         this.originalForm = null;
         this.audioFile = null;
         this.hasAudio = false;
+        this.uploader = null;
+        // Repetida em todas as tentativas de envio da mesma gravação (ver psy_records/idempotency.py)
+        this.idempotencyKey = null;
     }
 
     // Inicializa o submitter
@@ -27,6 +30,24 @@ class AudioSubmitter {
         });
     }
 
+    // Inicia o envio do áudio em partes junto com a gravação (quando disponível)
+    startChunkedUpload() {
+        const urlElement = document.getElementById('upload-create-url');
+        const csrfInput = this.originalForm && this.originalForm.querySelector('input[name="csrfmiddlewaretoken"]');
+        if (!urlElement || !csrfInput || typeof ChunkedAudioUploader === 'undefined') return;
+
+        this.uploader = new ChunkedAudioUploader(urlElement.dataset.url, csrfInput.value);
+        window.audioRecorder.onChunk = (blob) => this.uploader.push(blob);
+        this.uploader.start(window.audioRecorder.mediaRecorder.mimeType);
+    }
+
+    // Descarta o envio em partes (gravação cancelada ou refeita, ou áudio enviado inteiro)
+    cancelChunkedUpload() {
+        if (this.uploader) this.uploader.cancel();
+        this.uploader = null;
+        window.audioRecorder.onChunk = null;
+    }
+
     // Chamado quando a gravação é finalizada
     handleRecordingComplete() {
         const audioBlob = window.audioRecorder.getAudioBlob();
@@ -45,6 +66,7 @@ class AudioSubmitter {
         // Cria o arquivo para download
         this.audioFile = window.audioRecorder.createDownloadFile(fileName);
         this.hasAudio = true;
+        this.idempotencyKey = newIdempotencyKey();
 
         // Inicia o download automático
         this.downloadAudio();
@@ -96,6 +118,19 @@ class AudioSubmitter {
             // Mostra loading
             this.showSubmitStatus('Enviando dados para processamento com IA...', 'loading');
 
+            // Se o áudio já foi enviado durante a gravação, basta finalizar o upload
+            if (this.uploader && await this.uploader.finish()) {
+                const finalizeResponse = await this.uploader.finalize(new FormData(this.originalForm));
+                if (finalizeResponse.status !== 409) {
+                    const result = await finalizeResponse.json();
+                    this.handleSubmitResponse(result);
+                    return;
+                }
+                // Upload incompleto no servidor: envia o arquivo inteiro
+            }
+            // O upload em partes não será usado: libera o que o servidor já recebeu
+            this.cancelChunkedUpload();
+
             // Cria FormData com todos os dados do formulário
             const formData = new FormData(this.originalForm);
 
@@ -110,7 +145,8 @@ class AudioSubmitter {
                 method: 'POST',
                 body: formData,
                 headers: {
-                    'X-Requested-With': 'XMLHttpRequest'
+                    'X-Requested-With': 'XMLHttpRequest',
+                    'Idempotency-Key': this.idempotencyKey || newIdempotencyKey()
                 }
             });
 
@@ -133,6 +169,10 @@ class AudioSubmitter {
                     document.write(html);
                     document.close();
                 }
+            } else if (response.status === 503 || response.status === 409) {
+                // Fila cheia ou envio anterior ainda em andamento: o servidor explica o motivo
+                const result = await response.json();
+                this.handleSubmitResponse(result);
             } else {
                 throw new Error(`Erro HTTP: ${response.status}`);
             }
@@ -146,7 +186,10 @@ class AudioSubmitter {
     // Processa a resposta do submit
     handleSubmitResponse(response) {
         if (response.success) {
-            this.showSubmitStatus('Prontuário processado e salvo com sucesso!', 'success');
+            this.showSubmitStatus(
+                response.queued ? response.message : 'Prontuário processado e salvo com sucesso!',
+                'success'
+            );
 
             // Redireciona após um tempo
             setTimeout(() => {
@@ -167,6 +210,7 @@ class AudioSubmitter {
         // Remove o áudio e submete normalmente
         this.audioFile = null;
         this.hasAudio = false;
+        this.cancelChunkedUpload();
 
         // Reseta a interface de gravação
         window.audioRecorderUI.resetUI();
@@ -186,6 +230,12 @@ class AudioSubmitter {
     }
 }
 
+// Chave única por envio; crypto.randomUUID só existe em contexto seguro (HTTPS/localhost)
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
+
 // Inicializa quando o DOM estiver carregado
 document.addEventListener('DOMContentLoaded', () => {
     window.audioSubmitter = new AudioSubmitter();
@@ -78,6 +78,9 @@ class AudioRecorderUI {
 
             await window.audioRecorder.startRecording(this.selectedDeviceId, this.captureSystemAudio);
 
+            // Começa a enviar o áudio ao servidor enquanto a sessão é gravada
+            window.audioSubmitter.startChunkedUpload();
+
             this.recordingStartTime = Date.now();
             this.updateUIForRecording();
             this.startTimer();
@@ -109,6 +112,7 @@ class AudioRecorderUI {
     // Cancela a gravação
     cancelRecording() {
         window.audioRecorder.cancelRecording();
+        window.audioSubmitter.cancelChunkedUpload();
         this.stopTimer();
         this.resetUI();
         this.showStatus('Gravação cancelada.', 'info');
@@ -0,0 +1,112 @@
+"""
+Andamento do processamento dos prontuários, para as páginas acompanharem
+sem recarregar.
+
+As páginas do prontuário e do paciente assinam `ProcessingStatusView` via
+Server-Sent Events (ou long-poll, sem suporte a SSE). O servidor consulta os
+jobs a cada AUDIO_STATUS_POLL_INTERVAL e só envia algo quando muda; a
+conexão é encerrada quando nada mais está em andamento ou após
+AUDIO_STATUS_STREAM_SECONDS (o navegador reconecta sozinho).
+"""
+import hashlib
+import json
+import time
+from collections.abc import Iterator
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .jobs import queue_position
+from .models import AudioJob
+
+# Comentário enviado periodicamente para que proxies não encerrem a conexão ociosa
+KEEPALIVE_SECONDS = 15
+
+ACTIVE_STATUSES = [AudioJob.Status.QUEUED, AudioJob.Status.RUNNING]
+
+
+def processing_status(patient, record_id: int | None = None) -> dict:
+    """
+    Último job de cada prontuário do paciente que está em andamento ou
+    terminou há pouco (AUDIO_STATUS_RECENT_SECONDS).
+
+    Com `record_id`, inclui o texto parcial enquanto o prontuário é gerado e
+    o conteúdo final quando o job termina, para a página atualizá-lo sem
+    recarregar.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.AUDIO_STATUS_RECENT_SECONDS)
+    jobs = AudioJob.objects.filter(
+        record__patient=patient,
+        kind__in=[AudioJob.Kind.RECORD, AudioJob.Kind.SUMMARY],
+    ).filter(Q(status__in=ACTIVE_STATUSES) | Q(finished_at__gte=cutoff))
+    if record_id is not None:
+        jobs = jobs.filter(record_id=record_id)
+
+    latest = {}
+    for job in jobs.select_related('record').order_by('-created_at'):
+        latest.setdefault(job.record_id, job)
+
+    entries = [
+        _job_entry(job, include_content=record_id is not None)
+        for job in sorted(latest.values(), key=lambda job: job.record_id)
+    ]
+    status = {
+        "jobs": entries,
+        "active": any(entry["status"] in ACTIVE_STATUSES for entry in entries),
+    }
+    status["version"] = hashlib.sha1(json.dumps(status, sort_keys=True).encode()).hexdigest()[:16]
+    return status
+
+
+def _job_entry(job: AudioJob, include_content: bool) -> dict:
+    entry = {
+        "record_id": job.record_id,
+        "record_number": job.record.record_number,
+        "job_id": job.pk,
+        "status": job.status,
+        "stage": job.stage,
+        "stage_label": job.get_stage_display(),
+        "stage_times": job.stage_times,
+        "queue_position": queue_position(job),
+        "error": job.error,
+    }
+    if include_content and job.status not in ACTIVE_STATUSES:
+        entry["content"] = job.record.content
+    elif include_content and job.partial_output:
+        entry["partial_content"] = job.partial_output
+    return entry
+
+
+def status_events(patient, record_id: int | None = None) -> Iterator[str]:
+    """Eventos SSE: `status` a cada mudança e `idle` quando nada mais está em andamento."""
+    deadline = time.monotonic() + settings.AUDIO_STATUS_STREAM_SECONDS
+    last_version = None
+    last_sent = time.monotonic()
+    yield "retry: 3000\n\n"
+    while True:
+        status = processing_status(patient, record_id)
+        if status["version"] != last_version:
+            last_version = status["version"]
+            last_sent = time.monotonic()
+            yield f"event: status\ndata: {json.dumps(status)}\n\n"
+        if not status["active"]:
+            yield "event: idle\ndata: {}\n\n"
+            return
+        if time.monotonic() >= deadline:
+            return
+        if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+            last_sent = time.monotonic()
+            yield ": keepalive\n\n"
+        time.sleep(settings.AUDIO_STATUS_POLL_INTERVAL)
+
+
+def wait_for_status(patient, record_id: int | None = None, since: str | None = None) -> dict:
+    """Long-poll: espera até o estado diferir de `since` (ou o tempo acabar)."""
+    deadline = time.monotonic() + settings.AUDIO_STATUS_STREAM_SECONDS
+    while True:
+        status = processing_status(patient, record_id)
+        if not since or status["version"] != since or not status["active"] or time.monotonic() >= deadline:
+            return status
+        time.sleep(settings.AUDIO_STATUS_POLL_INTERVAL)
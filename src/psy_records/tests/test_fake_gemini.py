@@ -0,0 +1,71 @@
+import threading
+
+from django.test import SimpleTestCase, override_settings
+from google.genai import errors, types
+
+from psy_records import gemini_clients, pipeline
+from psy_records.fake_gemini import SUMMARY, TRANSCRIPTION_TEXT, FakeGeminiConfig, FakeGeminiServer
+from psy_records.management.commands.benchmark_audio import percentile, stage_durations
+
+API_KEY = 'AIza' + 'f' * 35
+
+
+class TestFakeGemini(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeGeminiServer(('127.0.0.1', 0), FakeGeminiConfig(latency=0))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        settings = override_settings(GEMINI_BASE_URL=self.server.base_url, GEMINI_MAX_RETRIES=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        gemini_clients.clear_clients()
+        self.addCleanup(gemini_clients.clear_clients)
+        self.client = gemini_clients.get_client(API_KEY)
+
+    def test_audio_gets_a_transcription(self):
+        audio = types.Part.from_bytes(data=b'audio' * 100, mime_type='audio/webm')
+
+        response = self.client.models.generate_content(model='gemini-2.5-flash', contents=['prompt', audio])
+
+        self.assertEqual(pipeline.parse_transcription(response.text), TRANSCRIPTION_TEXT)
+
+    def test_summary_with_and_without_streaming(self):
+        partials = []
+
+        streamed = pipeline.summarize_transcription(self.client, 'resumo', {}, 'transcrição', partials.append)
+        plain = pipeline.summarize_transcription(self.client, 'resumo', {}, 'transcrição')
+
+        self.assertEqual(streamed, SUMMARY)
+        self.assertEqual(plain, SUMMARY)
+        self.assertEqual(partials[-1], SUMMARY['psy_record'])
+        self.assertEqual(self.server.requests, 2)
+
+    def test_injected_errors(self):
+        self.server.config.error_rate = 1
+
+        with self.assertRaises(errors.ClientError) as ctx:
+            pipeline.summarize_transcription(self.client, 'resumo', {}, 'transcrição')
+
+        self.assertEqual(ctx.exception.code, 429)
+        self.assertEqual(ctx.exception.response.headers.get('retry-after'), '1')
+
+
+class TestBenchmarkHelpers(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3.0], 95), 3.0)
+
+    def test_stage_durations(self):
+        durations = stage_durations({
+            'queued': '2025-01-01T10:00:00+00:00',
+            'transcribing': '2025-01-01T10:00:05+00:00',
+            'summarizing': '2025-01-01T10:01:05+00:00',
+            'done': '2025-01-01T10:01:15+00:00',
+        })
+
+        self.assertEqual(durations, {'queued': 5, 'transcribing': 60, 'summarizing': 10})
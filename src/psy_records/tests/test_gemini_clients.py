@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from psy_records import gemini_clients
+from psy_records.gemini_clients import clear_clients, get_client, invalidate_client
+from user.models import User
+
+OLD_KEY = 'AIza' + 'a' * 35
+NEW_KEY = 'AIza' + 'b' * 35
+
+
+class GeminiClientTestCase(SimpleTestCase):
+    def setUp(self):
+        clear_clients()
+        self.addCleanup(clear_clients)
+
+
+class TestClientPool(GeminiClientTestCase):
+    def test_same_key_reuses_client(self):
+        self.assertIs(get_client('chave-1'), get_client('chave-1'))
+        self.assertIsNot(get_client('chave-1'), get_client('chave-2'))
+
+    def test_key_is_not_stored_in_clear(self):
+        get_client('chave-secreta')
+
+        self.assertNotIn('chave-secreta', gemini_clients._clients)
+
+    @override_settings(GEMINI_CLIENT_POOL_SIZE=2)
+    def test_least_recently_used_client_is_evicted(self):
+        first = get_client('chave-1')
+        get_client('chave-2')
+        get_client('chave-1')
+        get_client('chave-3')
+
+        self.assertIs(get_client('chave-1'), first)
+        self.assertEqual(len(gemini_clients._clients), 2)
+
+    @override_settings(GEMINI_CLIENT_IDLE_TTL=60)
+    def test_idle_client_is_recreated(self):
+        with mock.patch.object(gemini_clients.time, 'monotonic', return_value=1000):
+            first = get_client('chave-1')
+        with mock.patch.object(gemini_clients.time, 'monotonic', return_value=1061):
+            self.assertIsNot(get_client('chave-1'), first)
+
+    def test_invalidate(self):
+        first = get_client('chave-1')
+
+        invalidate_client('chave-1')
+
+        self.assertIsNot(get_client('chave-1'), first)
+
+
+class TestInvalidateOnKeyChange(TestCase):
+    def setUp(self):
+        clear_clients()
+        self.addCleanup(clear_clients)
+
+    def test_user_update_drops_old_key_client(self):
+        user = User.objects.create_user(username='teste', password='senha123', api_key=OLD_KEY)
+        old_client = get_client(OLD_KEY)
+        self.client.force_login(user)
+
+        self.client.post(reverse('user:update'), {
+            'first_name': '', 'last_name': '', 'email': '', 'system_prompt': 'prompt', 'api_key': NEW_KEY,
+        })
+
+        user.refresh_from_db()
+        self.assertEqual(user.api_key, NEW_KEY)
+        self.assertIsNot(get_client(OLD_KEY), old_client)
@@ -0,0 +1,147 @@
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from patients.models import Patient
+from psy_records import history, pipeline
+from psy_records.models import ClinicalDigest, ClinicalHistoryEntry, PsyRecord
+from user.models import User
+
+
+class HistoryTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='teste', password='senha123')
+        self.patient = Patient.objects.create(
+            user=user, first_name='Paciente', birth_date=date(1990, 1, 1), objectives='Reduzir ansiedade.'
+        )
+
+    def add_session(self, text):
+        record = PsyRecord.objects.create(patient=self.patient)
+        history.record_session(self.patient, record, {'objectives': text})
+        return record
+
+
+class TestRecordSession(HistoryTestCase):
+    def test_session_text_is_appended_to_patient_fields(self):
+        self.add_session('[Atualização da sessão]: dormiu melhor.')
+
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.objectives, 'Reduzir ansiedade.\n\n[Atualização da sessão]: dormiu melhor.')
+        kinds = list(ClinicalHistoryEntry.objects.values_list('kind', flat=True))
+        self.assertEqual(kinds, [ClinicalHistoryEntry.Kind.BASELINE, ClinicalHistoryEntry.Kind.SESSION])
+
+    def test_regenerating_a_session_replaces_its_text(self):
+        record = self.add_session('[Atualização da sessão]: versão ruim.')
+
+        history.record_session(self.patient, record, {'objectives': '[Atualização da sessão]: versão boa.'})
+
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.objectives, 'Reduzir ansiedade.\n\n[Atualização da sessão]: versão boa.')
+        self.assertEqual(ClinicalHistoryEntry.objects.filter(record=record).count(), 1)
+
+    def test_concurrent_update_is_merged_instead_of_overwritten(self):
+        stale = Patient.objects.get(pk=self.patient.pk)
+        self.add_session('[Atualização da sessão]: primeira sessão.')
+
+        history.record_session(stale, PsyRecord.objects.create(patient=stale), {
+            'objectives': '[Atualização da sessão]: segunda sessão.',
+        })
+
+        self.patient.refresh_from_db()
+        self.assertEqual(
+            self.patient.objectives,
+            'Reduzir ansiedade.\n\n[Atualização da sessão]: primeira sessão.'
+            '\n\n[Atualização da sessão]: segunda sessão.',
+        )
+        self.assertEqual(self.patient.version, 2)
+
+    def test_manual_edit_starts_new_baseline(self):
+        self.add_session('[Atualização da sessão]: dormiu melhor.')
+        Patient.objects.filter(pk=self.patient.pk).update(objectives='Texto revisado pelo psicólogo.')
+        self.patient.refresh_from_db()
+
+        context = history.patient_context(self.patient)
+
+        self.assertEqual(context['objectives'], 'Texto revisado pelo psicólogo.')
+
+    def test_extract_additions_drops_repeated_context(self):
+        sent = {'objectives': 'Reduzir ansiedade.', 'clinical_demand': 'Insônia.'}
+        returned = {
+            'objectives': 'Reduzir ansiedade.\n\n[Atualização da sessão]: novo objetivo.',
+            'clinical_demand': '[Atualização da sessão]: melhora do sono.',
+        }
+
+        additions = history.extract_additions(sent, returned)
+
+        self.assertEqual(additions['objectives'], '[Atualização da sessão]: novo objetivo.')
+        self.assertEqual(additions['clinical_demand'], '[Atualização da sessão]: melhora do sono.')
+        self.assertEqual(additions['clinical_conclusion'], '')
+
+    def test_apply_appends_session_additions(self):
+        record = PsyRecord.objects.create(patient=self.patient)
+        sent = history.patient_context(self.patient)
+
+        pipeline.apply_processed_content(record.pk, self.patient.pk, {
+            'psy_record': 'Prontuário.',
+            'objectives': '[Atualização da sessão]: dormiu melhor.',
+            'clinical_demand': '',
+        }, sent)
+
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.objectives, 'Reduzir ansiedade.\n\n[Atualização da sessão]: dormiu melhor.')
+        self.assertEqual(self.patient.clinical_demand, '')
+        record.refresh_from_db()
+        self.assertEqual(record.content, 'Prontuário.')
+
+
+@override_settings(PATIENT_HISTORY_TOKEN_BUDGET=50, PATIENT_HISTORY_RECENT_SESSIONS=2)
+class TestCompaction(HistoryTestCase):
+    def test_context_within_budget_is_not_compacted(self):
+        self.add_session('Curto.')
+
+        self.assertIsNone(history.plan_compaction(self.patient))
+
+    def test_old_sessions_are_folded_into_summary(self):
+        for i in range(5):
+            self.add_session(f'[Atualização da sessão {i}]: ' + 'x' * 40)
+
+        client = mock.Mock()
+        client.models.generate_content.return_value.text = '{"objectives": "Resumo das sessões antigas."}'
+        self.assertTrue(pipeline.compact_patient_history(client, self.patient.pk))
+
+        payload = client.models.generate_content.call_args.kwargs['contents'][1]
+        self.assertIn('Reduzir ansiedade.', payload)
+        self.assertNotIn('sessão 3', payload)
+        context = history.patient_context(self.patient)
+        self.assertTrue(context['objectives'].startswith('Resumo das sessões antigas.'))
+        self.assertNotIn('sessão 2', context['objectives'])
+        self.assertIn('sessão 3', context['objectives'])
+        self.assertIn('sessão 4', context['objectives'])
+
+    def test_next_compaction_only_sends_new_entries(self):
+        for i in range(4):
+            self.add_session(f'[Atualização da sessão {i}]: ' + 'x' * 40)
+        client = mock.Mock()
+        client.models.generate_content.return_value.text = '{"objectives": "Resumo 1."}'
+        pipeline.compact_patient_history(client, self.patient.pk)
+
+        self.add_session('[Atualização da sessão 4]: ' + 'x' * 40)
+        client.models.generate_content.return_value.text = '{"objectives": "Resumo 2."}'
+        pipeline.compact_patient_history(client, self.patient.pk)
+
+        payload = client.models.generate_content.call_args.kwargs['contents'][1]
+        self.assertIn('Resumo 1.', payload)
+        self.assertIn('sessão 2', payload)
+        self.assertNotIn('sessão 1', payload)
+        self.assertEqual(ClinicalDigest.objects.get().summary['objectives'], 'Resumo 2.')
+
+    def test_summary_from_before_manual_edit_is_discarded(self):
+        for i in range(4):
+            self.add_session(f'[Atualização da sessão {i}]: ' + 'x' * 40)
+        plan = history.plan_compaction(self.patient)
+        Patient.objects.filter(pk=self.patient.pk).update(objectives='Editado.')
+        self.patient.refresh_from_db()
+        history.patient_context(self.patient)
+
+        self.assertFalse(history.apply_compaction(plan, {'objectives': 'Resumo antigo.'}))
@@ -0,0 +1,114 @@
+from datetime import date, timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from patients.models import Patient
+from psy_records.models import AudioJob, IdempotencyKey, PsyRecord
+from psy_records.tests.test_jobs import use_temp_jobs_dir
+from user.models import User
+
+
+class IdempotencyTestCase(TestCase):
+    def setUp(self):
+        self.jobs_dir = use_temp_jobs_dir(self)
+
+        self.user = User.objects.create_user(username='teste', password='senha123')
+        self.patient = Patient.objects.create(
+            user=self.user, first_name='Paciente', birth_date=date(1990, 1, 1)
+        )
+        self.client.force_login(self.user)
+
+    def create_record(self, key, **data):
+        return self.client.post(
+            reverse('psy_records:create', args=[self.patient.id]),
+            {
+                'date': '2025-01-01',
+                'content': '',
+                'has_audio': 'true',
+                'audio_file': SimpleUploadedFile('sessao.webm', b'audio', content_type='audio/webm'),
+                **data,
+            },
+            headers={'X-Requested-With': 'XMLHttpRequest', 'Idempotency-Key': key},
+        )
+
+
+class TestCreateIdempotency(IdempotencyTestCase):
+    def test_repeated_submit_returns_original_response(self):
+        first = self.create_record('envio-1')
+        second = self.create_record('envio-1')
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(second.json()['record_id'], first.json()['record_id'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(PsyRecord.objects.count(), 1)
+        self.assertEqual(AudioJob.objects.count(), 1)
+        entry = IdempotencyKey.objects.get()
+        self.assertEqual(entry.job, AudioJob.objects.get())
+
+    def test_different_keys_create_separate_records(self):
+        self.create_record('envio-1')
+        self.create_record('envio-2')
+
+        self.assertEqual(PsyRecord.objects.count(), 2)
+        self.assertEqual(AudioJob.objects.count(), 2)
+
+    def test_request_in_progress_returns_conflict(self):
+        IdempotencyKey.objects.create(user=self.user, key='envio-1', scope=f'create:{self.patient.id}')
+
+        response = self.create_record('envio-1')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(PsyRecord.objects.exists())
+
+    def test_abandoned_reservation_is_taken_over(self):
+        IdempotencyKey.objects.create(
+            user=self.user, key='envio-1', scope=f'create:{self.patient.id}',
+            created_at=timezone.now() - timedelta(hours=1),
+        )
+
+        response = self.create_record('envio-1')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(PsyRecord.objects.count(), 1)
+
+    def test_failed_request_releases_key(self):
+        response = self.create_record('envio-1', date='')
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.create_record('envio-1')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(PsyRecord.objects.count(), 1)
+
+    def test_key_reused_for_other_endpoint_is_rejected(self):
+        record = PsyRecord.objects.create(patient=self.patient)
+        self.create_record('envio-1')
+
+        response = self.client.post(
+            reverse('psy_records:update', args=[self.patient.id, record.pk]),
+            {'reprocess_audio': SimpleUploadedFile('sessao.webm', b'audio', content_type='audio/webm')},
+            headers={'X-Requested-With': 'XMLHttpRequest', 'Idempotency-Key': 'envio-1'},
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(AudioJob.objects.filter(record=record).exists())
+
+
+class TestReprocessIdempotency(IdempotencyTestCase):
+    def test_repeated_reprocess_attaches_to_first_job(self):
+        record = PsyRecord.objects.create(patient=self.patient)
+
+        for _ in range(2):
+            response = self.client.post(
+                reverse('psy_records:update', args=[self.patient.id, record.pk]),
+                {'reprocess_audio': SimpleUploadedFile('sessao.webm', b'audio', content_type='audio/webm')},
+                headers={'X-Requested-With': 'XMLHttpRequest', 'Idempotency-Key': 'reenvio-1'},
+            )
+            self.assertEqual(response.status_code, 202)
+
+        self.assertEqual(AudioJob.objects.filter(record=record).count(), 1)
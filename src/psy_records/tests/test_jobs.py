@@ -0,0 +1,424 @@
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from patients.models import Patient
+from psy_records.jobs import QueueFull, check_admission, claim_next_job, queue_position, recover_stale_jobs, run_job
+from psy_records import pipeline
+from psy_records.models import AudioJob, PsyRecord, Transcript
+from psy_records.transcode import AudioInfo
+from user.models import User
+
+
+def use_temp_jobs_dir(test_case) -> str:
+    """
+    Aponta AUDIO_JOBS_DIR para um diretório temporário durante o teste, para
+    nenhum teste escrever em media/ do projeto, e desliga o worker embutido.
+    """
+    jobs_dir = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, jobs_dir, ignore_errors=True)
+    settings_override = override_settings(AUDIO_JOBS_DIR=jobs_dir, AUDIO_JOBS_EMBEDDED_WORKER=False)
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+    return jobs_dir
+
+
+class JobTestCase(TestCase):
+    def setUp(self):
+        self.jobs_dir = use_temp_jobs_dir(self)
+
+        self.user = User.objects.create_user(username='teste', password='senha123')
+        self.patient = Patient.objects.create(
+            user=self.user, first_name='Paciente', birth_date=date(1990, 1, 1)
+        )
+        self.record = PsyRecord.objects.create(patient=self.patient)
+
+    def create_job(self, **kwargs):
+        return AudioJob.objects.create(
+            record=self.record, user=self.user, audio_path=f'{self.jobs_dir}/audio.webm', **kwargs
+        )
+
+
+class TestClaimNextJob(JobTestCase):
+    def test_claim_marks_job_running(self):
+        job = self.create_job()
+
+        claimed = claim_next_job('worker-1')
+
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, AudioJob.Status.RUNNING)
+        self.assertEqual(claimed.worker_id, 'worker-1')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNotNone(claimed.heartbeat_at)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        self.create_job()
+
+        self.assertIsNotNone(claim_next_job('worker-1'))
+        self.assertIsNone(claim_next_job('worker-2'))
+
+    def test_claims_oldest_job_first(self):
+        first = self.create_job()
+        self.create_job()
+
+        self.assertEqual(claim_next_job('worker-1').pk, first.pk)
+
+
+class TestPatientLanes(JobTestCase):
+    def test_second_job_of_patient_waits_for_the_first(self):
+        first = self.create_job()
+        self.create_job(kind=AudioJob.Kind.SUMMARY)
+
+        self.assertEqual(claim_next_job('worker-1').pk, first.pk)
+        self.assertIsNone(claim_next_job('worker-2'))
+
+    def test_other_patients_run_in_parallel(self):
+        self.create_job()
+        self.create_job()
+        other_patient = Patient.objects.create(user=self.user, first_name='Outro', birth_date=date(1990, 1, 1))
+        other_job = AudioJob.objects.create(
+            record=PsyRecord.objects.create(patient=other_patient), user=self.user, audio_path='outro.webm'
+        )
+
+        claim_next_job('worker-1')
+
+        self.assertEqual(claim_next_job('worker-2').pk, other_job.pk)
+
+    def test_lane_moves_on_after_job_finishes(self):
+        first = self.create_job()
+        second = self.create_job()
+        claim_next_job('worker-1')
+        AudioJob.objects.filter(pk=first.pk).update(status=AudioJob.Status.DONE)
+
+        self.assertEqual(claim_next_job('worker-2').pk, second.pk)
+
+    def test_record_job_waits_for_running_segment_of_its_audio(self):
+        segment = AudioJob.objects.create(
+            kind=AudioJob.Kind.SEGMENT, segment_index=0, user=self.user,
+            audio_path=f'{self.jobs_dir}/audio.webm', status=AudioJob.Status.RUNNING,
+        )
+        job = self.create_job()
+
+        self.assertIsNone(claim_next_job('worker-1'))
+
+        AudioJob.objects.filter(pk=segment.pk).update(status=AudioJob.Status.DONE)
+        self.assertEqual(claim_next_job('worker-1').pk, job.pk)
+
+
+class TestFairShare(JobTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_user = User.objects.create_user(username='outro', password='senha123')
+        other_patient = Patient.objects.create(
+            user=self.other_user, first_name='Outro', birth_date=date(1990, 1, 1)
+        )
+        self.other_record = PsyRecord.objects.create(patient=other_patient)
+
+    def test_bulk_jobs_of_one_user_do_not_starve_others(self):
+        for _ in range(3):
+            self.create_job()
+        other_job = AudioJob.objects.create(
+            record=self.other_record, user=self.other_user, audio_path='outro.webm'
+        )
+
+        first = claim_next_job('worker-1')
+        second = claim_next_job('worker-1')
+
+        self.assertEqual(first.user, self.user)
+        self.assertEqual(second.pk, other_job.pk)
+
+    def test_queue_position_follows_fair_order(self):
+        bulk = [self.create_job() for _ in range(3)]
+        AudioJob.objects.create(kind=AudioJob.Kind.SEGMENT, segment_index=0, user=self.user, audio_path='a.webm')
+        other_job = AudioJob.objects.create(
+            record=self.other_record, user=self.other_user, audio_path='outro.webm'
+        )
+
+        self.assertEqual(queue_position(other_job), 2)
+        self.assertEqual([queue_position(job) for job in bulk], [1, 3, 4])
+
+    @override_settings(AUDIO_JOBS_MAX_QUEUED_PER_USER=2)
+    def test_admission_rejects_when_user_quota_is_full(self):
+        self.create_job()
+        self.create_job()
+
+        with self.assertRaises(QueueFull):
+            check_admission(self.user)
+        check_admission(self.other_user)
+
+    @override_settings(AUDIO_JOBS_MAX_QUEUED=1)
+    def test_create_view_returns_503_when_queue_is_full(self):
+        self.create_job()
+        self.client.force_login(self.other_user)
+        audio = SimpleUploadedFile('sessao.webm', b'audio', content_type='audio/webm')
+
+        response = self.client.post(
+            reverse('psy_records:create', args=[self.other_record.patient.id]),
+            {'date': '2025-01-01', 'content': '', 'has_audio': 'true', 'audio_file': audio},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(PsyRecord.objects.filter(patient=self.other_record.patient).count(), 1)
+
+
+class TestRecoverStaleJobs(JobTestCase):
+    def test_stale_job_returns_to_queue(self):
+        job = self.create_job(
+            status=AudioJob.Status.RUNNING,
+            attempts=1,
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+
+        self.assertEqual(recover_stale_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AudioJob.Status.QUEUED)
+
+    def test_job_with_recent_heartbeat_is_kept(self):
+        job = self.create_job(
+            status=AudioJob.Status.RUNNING, attempts=1, heartbeat_at=timezone.now()
+        )
+
+        self.assertEqual(recover_stale_jobs(), 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AudioJob.Status.RUNNING)
+
+    @override_settings(AUDIO_JOBS_MAX_ATTEMPTS=2)
+    def test_stale_job_without_attempts_left_fails(self):
+        job = self.create_job(
+            status=AudioJob.Status.RUNNING,
+            attempts=2,
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+
+        recover_stale_jobs()
+
+        job.refresh_from_db()
+        self.record.refresh_from_db()
+        self.assertEqual(job.status, AudioJob.Status.FAILED)
+        self.assertIn('⚠', self.record.content)
+
+
+class TestRunJob(JobTestCase):
+    def test_missing_audio_fails_job(self):
+        job = self.create_job()
+        job = claim_next_job('worker-1')
+
+        self.assertFalse(run_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AudioJob.Status.FAILED)
+
+
+class TestResumeFromCheckpoints(JobTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.api_key = 'chave'
+        self.user.save()
+        self.audio_path = f'{self.jobs_dir}/sessao.webm'
+        with open(self.audio_path, 'wb') as f:
+            f.write(b'audio')
+        AudioJob.objects.create(record=self.record, user=self.user, audio_path=self.audio_path, audio_sha256='abc')
+
+    def run_next_job(self, transcription='Paciente: Olá.', summary_error=None):
+        job = claim_next_job('worker-1')
+        with mock.patch.object(pipeline, 'normalize_audio', return_value=AudioInfo(codec='opus', duration=60)), \
+                mock.patch.object(pipeline, 'transcribe_audio', return_value=transcription) as transcribe, \
+                mock.patch.object(pipeline, 'get_client') as get_client:
+            stream = get_client.return_value.models.generate_content_stream
+            stream.side_effect = summary_error
+            stream.return_value = [mock.Mock(text='{"psy_record": "Prontuário gerado"}')]
+            success = run_job(job)
+        job.refresh_from_db()
+        return job, success, transcribe
+
+    def test_failed_summary_is_retried_without_transcribing_again(self):
+        job, success, _ = self.run_next_job(summary_error=RuntimeError("falha no resumo"))
+
+        self.assertFalse(success)
+        self.assertEqual(job.status, AudioJob.Status.QUEUED)
+        self.assertEqual(set(job.checkpoints), {'normalize', 'transcribe'})
+        self.assertTrue(os.path.exists(self.audio_path))
+
+        job, success, transcribe = self.run_next_job()
+
+        self.assertTrue(success)
+        transcribe.assert_not_called()
+        self.assertEqual(job.status, AudioJob.Status.DONE)
+        self.assertEqual(set(job.checkpoints), {'normalize', 'transcribe', 'summarize', 'apply'})
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.content, 'Prontuário gerado')
+        self.assertFalse(os.path.exists(self.audio_path))
+
+    def test_saved_summary_is_applied_without_calling_gemini(self):
+        Transcript.objects.create(record=self.record, text='Paciente: Olá.', patient_data={})
+        AudioJob.objects.update(checkpoints={
+            'normalize': None, 'transcribe': True, 'summarize': {'psy_record': 'Prontuário salvo'},
+        })
+        os.unlink(self.audio_path)
+
+        job, success, _ = self.run_next_job(summary_error=AssertionError("não deveria gerar o resumo"))
+
+        self.assertTrue(success)
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.content, 'Prontuário salvo')
+
+    def test_applied_session_is_not_applied_again(self):
+        Transcript.objects.create(record=self.record, text='Paciente: Olá.', patient_data={})
+        AudioJob.objects.update(checkpoints={
+            'normalize': None, 'transcribe': True, 'summarize': {'psy_record': 'Prontuário salvo'}, 'apply': True,
+        })
+
+        with mock.patch.object(pipeline, 'apply_processed_content') as apply:
+            job, success, _ = self.run_next_job(summary_error=AssertionError("não deveria gerar o resumo"))
+
+        self.assertTrue(success)
+        apply.assert_not_called()
+        self.assertEqual(job.status, AudioJob.Status.DONE)
+
+    def test_requeued_job_keeps_record_content(self):
+        PsyRecord.objects.filter(pk=self.record.pk).update(content='[Processando áudio em background...]')
+
+        job, success, _ = self.run_next_job(summary_error=RuntimeError("falha no resumo"))
+
+        self.assertEqual(job.status, AudioJob.Status.QUEUED)
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.content, '[Processando áudio em background...]')
+
+    @override_settings(AUDIO_JOBS_MAX_ATTEMPTS=1)
+    def test_failed_job_writes_error_to_record(self):
+        job, success, _ = self.run_next_job(summary_error=RuntimeError("falha no resumo"))
+
+        self.assertEqual(job.status, AudioJob.Status.FAILED)
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.content, '⚠ Erro ao processar áudio: falha no resumo')
+
+    def test_missing_api_key_fails_without_retrying(self):
+        self.user.api_key = ''
+        self.user.save()
+
+        job, success, transcribe = self.run_next_job()
+
+        self.assertFalse(success)
+        transcribe.assert_not_called()
+        self.assertEqual(job.status, AudioJob.Status.FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.record.refresh_from_db()
+        self.assertIn('API key', self.record.content)
+
+    @override_settings(AUDIO_JOBS_MAX_ATTEMPTS=1)
+    def test_retry_view_resumes_failed_job(self):
+        job, success, _ = self.run_next_job(summary_error=RuntimeError("falha no resumo"))
+        self.assertEqual(job.status, AudioJob.Status.FAILED)
+        self.client.force_login(self.user)
+        detail = self.client.get(reverse('psy_records:detail', args=[self.patient.id, self.record.pk]))
+        self.assertTrue(detail.context['can_retry'])
+
+        response = self.client.post(
+            reverse('psy_records:retry', args=[self.patient.id, self.record.pk]),
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+        self.assertEqual(response.status_code, 202)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AudioJob.Status.QUEUED)
+        self.assertEqual(job.attempts, 0)
+        job, success, transcribe = self.run_next_job()
+        self.assertTrue(success)
+        transcribe.assert_not_called()
+
+    def test_retry_view_rejects_job_that_did_not_fail(self):
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse('psy_records:retry', args=[self.patient.id, self.record.pk]),
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TestEnqueueFromViews(JobTestCase):
+    def test_create_with_audio_enqueues_job(self):
+        self.client.force_login(self.user)
+        audio = SimpleUploadedFile('sessao.webm', b'audio', content_type='audio/webm')
+
+        response = self.client.post(
+            reverse('psy_records:create', args=[self.patient.id]),
+            {'date': '2025-01-01', 'content': '', 'has_audio': 'true', 'audio_file': audio},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()['success'])
+        job = AudioJob.objects.exclude(record=self.record).get()
+        self.assertEqual(job.status, AudioJob.Status.QUEUED)
+        with open(job.audio_path, 'rb') as f:
+            self.assertEqual(f.read(), b'audio')
+
+
+class TestRegenerateFromTranscript(JobTestCase):
+    def summary_response(self):
+        return [mock.Mock(text='{"psy_record": "Prontuário novo", "objectives": "Objetivos novos"}')]
+
+    def test_transcript_is_saved_before_summary(self):
+        with mock.patch.object(pipeline, 'transcribe_audio', return_value='Paciente: Olá.'), \
+                mock.patch.object(pipeline, 'get_client') as get_client:
+            get_client.return_value.models.generate_content_stream.side_effect = RuntimeError("falha no resumo")
+            success = pipeline._process_audio_background(
+                self.record.pk, self.patient.pk, 'sessao.webm', 'chave', 'prompt', 'resumo',
+                {'objectives': 'Objetivos antigos'},
+            )
+
+        self.assertFalse(success)
+        transcript = Transcript.objects.get(record=self.record)
+        self.assertEqual(transcript.text, 'Paciente: Olá.')
+        self.assertEqual(transcript.patient_data, {'objectives': 'Objetivos antigos'})
+
+    def test_view_without_transcript_is_rejected(self):
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse('psy_records:regenerate', args=[self.patient.id, self.record.pk]),
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AudioJob.objects.exists())
+
+    def test_regenerate_uses_stored_transcript_and_patient_data(self):
+        Transcript.objects.create(
+            record=self.record, text='Paciente: Olá.', patient_data={'objectives': 'Objetivos antigos'}
+        )
+        self.user.api_key = 'chave'
+        self.user.save()
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse('psy_records:regenerate', args=[self.patient.id, self.record.pk]),
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        self.assertEqual(response.status_code, 202)
+
+        job = claim_next_job('worker-1')
+        self.assertEqual(job.kind, AudioJob.Kind.SUMMARY)
+        with mock.patch.object(pipeline, 'get_client') as get_client:
+            get_client.return_value.models.generate_content_stream.return_value = self.summary_response()
+            self.assertTrue(run_job(job))
+
+        contents = get_client.return_value.models.generate_content_stream.call_args.kwargs['contents']
+        self.assertEqual(contents[1:], ['{"objectives": "Objetivos antigos"}', 'Paciente: Olá.'])
+        self.record.refresh_from_db()
+        self.patient.refresh_from_db()
+        self.assertEqual(self.record.content, 'Prontuário novo')
+        self.assertEqual(self.patient.objectives, 'Objetivos novos')
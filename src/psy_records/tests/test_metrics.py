@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from psy_records.jobs import claim_next_job, run_job
+from psy_records.metrics import Counter, Histogram, JOBS, Registry
+from psy_records.tests.test_jobs import JobTestCase
+
+
+class TestExposition(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.register(Histogram('etapa_seconds', 'Etapas.', ('stage',), buckets=(1, 5)))
+        histogram.observe(0.5, stage='ffprobe')
+        histogram.observe(3, stage='ffprobe')
+
+        lines = registry.render().splitlines()
+
+        self.assertIn('# TYPE etapa_seconds histogram', lines)
+        self.assertIn('etapa_seconds_bucket{stage="ffprobe",le="1"} 1', lines)
+        self.assertIn('etapa_seconds_bucket{stage="ffprobe",le="5"} 2', lines)
+        self.assertIn('etapa_seconds_bucket{stage="ffprobe",le="+Inf"} 2', lines)
+        self.assertIn('etapa_seconds_sum{stage="ffprobe"} 3.5', lines)
+
+    def test_label_values_are_escaped(self):
+        registry = Registry()
+        counter = registry.register(Counter('erros_total', 'Erros.', ('motivo',)))
+        counter.inc(motivo='aspas "e"\nquebra')
+
+        self.assertIn('erros_total{motivo="aspas \\"e\\"\\nquebra"} 1', registry.render())
+
+    def test_wrong_labels_are_rejected(self):
+        with self.assertRaises(ValueError):
+            Counter('x_total', 'X.', ('kind',)).inc(outro='a')
+
+
+class TestMetricsView(JobTestCase):
+    def sample(self, body, prefix):
+        for line in body.splitlines():
+            if line.startswith(prefix):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    def test_requires_staff_without_token(self):
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_job_outcomes_are_counted(self):
+        before = JOBS._values.get(('record', 'failed'), 0)
+        self.create_job()
+        run_job(claim_next_job('worker-1'))
+
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer segredo'})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertEqual(self.sample(body, 'psy_audio_jobs_total{kind="record",outcome="failed"}'), before + 1)
+        self.assertIn('# TYPE psy_audio_stage_seconds histogram', body)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
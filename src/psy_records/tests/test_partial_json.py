@@ -0,0 +1,27 @@
+from django.test import SimpleTestCase
+
+from psy_records.partial_json import partial_string_field
+
+
+class TestPartialStringField(SimpleTestCase):
+    def test_key_not_yet_generated(self):
+        self.assertIsNone(partial_string_field('{"psy_rec', 'psy_record'))
+
+    def test_open_string_is_returned_so_far(self):
+        self.assertEqual(partial_string_field('{"psy_record": "Sessão de', 'psy_record'), 'Sessão de')
+
+    def test_closed_string_stops_at_quote(self):
+        text = '{"psy_record": "Texto", "outro": "x"}'
+        self.assertEqual(partial_string_field(text, 'psy_record'), 'Texto')
+
+    def test_escapes_are_decoded(self):
+        text = r'{"psy_record": "Linha 1\nDisse \"olá\" à tarde'
+        self.assertEqual(partial_string_field(text, 'psy_record'), 'Linha 1\nDisse "olá" à tarde')
+
+    def test_incomplete_escape_is_left_out(self):
+        self.assertEqual(partial_string_field(r'{"psy_record": "a\u00e', 'psy_record'), 'a')
+        self.assertEqual(partial_string_field('{"psy_record": "a\\', 'psy_record'), 'a')
+
+    def test_surrogate_pair_becomes_one_character(self):
+        text = r'{"psy_record": "ok \ud83d\ude00"}'
+        self.assertEqual(partial_string_field(text, 'psy_record'), 'ok \U0001F600')
@@ -0,0 +1,191 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase
+
+from psy_records import pipeline
+from psy_records.pipeline import AudioSegment, split_audio_with_ffmpeg_into_chunks, transcribe_audio_chunks
+from psy_records.tests.test_jobs import use_temp_jobs_dir
+from psy_records.transcode import SPEECH_BITRATE, AudioInfo, plan_transcode
+
+
+class FakeModels:
+    """Registra o tamanho de cada segmento enviado no lugar da API do Gemini."""
+
+    def __init__(self):
+        self.sizes = []
+
+    def generate_content(self, model, contents):
+        self.sizes.append(len(contents[1].inline_data.data))
+        return SimpleNamespace(text=f'{{"transcription": "Paciente: trecho {len(self.sizes)}"}}')
+
+
+class SegmentTestCase(SimpleTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        use_temp_jobs_dir(self)
+
+    def make_file(self, name, data):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+
+class TestAudioSegment(SegmentTestCase):
+    def test_data_is_mapped_from_disk_and_file_removed_on_close(self):
+        path = self.make_file("chunk_000.webm", b"audio" * 100)
+
+        with AudioSegment(path) as segment:
+            self.assertIsInstance(segment.data, memoryview)
+            self.assertEqual(bytes(segment.data[:5]), b"audio")
+            self.assertEqual(len(segment), 500)
+
+        self.assertFalse(os.path.exists(path))
+        segment.close()  # Fechar de novo não falha
+
+    def test_empty_file(self):
+        with AudioSegment(self.make_file("chunk_000.webm", b"")) as segment:
+            self.assertEqual(len(segment), 0)
+
+
+class TestTranscribeAudioChunks(SegmentTestCase):
+    def test_each_segment_is_released_before_the_next_is_produced(self):
+        paths = [self.make_file(f"chunk_{i:03d}.webm", b"x" * 10) for i in range(3)]
+
+        def segments():
+            for i, path in enumerate(paths):
+                # Os anteriores já foram consumidos e removidos do disco
+                self.assertFalse(any(os.path.exists(p) for p in paths[:i]))
+                yield AudioSegment(path)
+
+        client = SimpleNamespace(models=FakeModels())
+        transcription = transcribe_audio_chunks(client, segments(), "prompt")
+
+        self.assertEqual(client.models.sizes, [10, 10, 10])
+        self.assertEqual(transcription.splitlines()[0], "Paciente: trecho 1")
+
+    def test_no_segments_raises(self):
+        client = SimpleNamespace(models=FakeModels())
+        with self.assertRaises(ValueError):
+            transcribe_audio_chunks(client, iter([]), "prompt")
+
+
+class TestSummarizeStreaming(SimpleTestCase):
+    def test_partial_record_text_is_reported_while_generating(self):
+        chunks = ['{"psy_record": "Paciente ', 'relatou\\', 'nmelhora", ', '"objectives": "ok"}']
+        client = mock.Mock()
+        client.models.generate_content_stream.return_value = [SimpleNamespace(text=c) for c in chunks]
+        partials = []
+
+        result = pipeline.summarize_transcription(client, 'resumo', {}, 'transcrição', partials.append)
+
+        self.assertEqual(partials, ['Paciente ', 'Paciente relatou', 'Paciente relatou\nmelhora'])
+        self.assertEqual(result, {"psy_record": "Paciente relatou\nmelhora", "objectives": "ok"})
+        client.models.generate_content.assert_not_called()
+
+    def test_record_field_comes_first_in_schema(self):
+        self.assertEqual(next(iter(pipeline.ResultPsySummaryData.model_fields)), 'psy_record')
+
+    def test_model_is_asked_only_for_session_additions(self):
+        client = mock.Mock()
+        client.models.generate_content.return_value.text = '{"psy_record": "ok"}'
+
+        pipeline.summarize_transcription(client, 'prompt do usuário', {}, 'transcrição')
+
+        config = client.models.generate_content.call_args.kwargs['config']
+        self.assertEqual(config['system_instruction'], pipeline.PROMPT_SUMMARY_ADDITIONS)
+        schema = config['response_schema'].model_json_schema()
+        self.assertIn('Somente o texto novo', schema['properties']['objectives']['description'])
+
+
+class TestPlanTranscode(SimpleTestCase):
+    def test_opus_upload_is_copied(self):
+        plan = plan_transcode(AudioInfo(codec='opus', channels=1, bit_rate=48_000, duration=3600), 19)
+
+        self.assertEqual(plan.mode, 'copy')
+        self.assertEqual(plan.codec_args, ['-c:a', 'copy'])
+
+    def test_other_codecs_are_encoded_as_mono_speech(self):
+        plan = plan_transcode(AudioInfo(codec='aac', channels=2, bit_rate=192_000, duration=3600), 19)
+
+        self.assertEqual(plan.mode, 'encode')
+        self.assertIn('-ac', plan.codec_args)
+        self.assertEqual(plan.bit_rate, SPEECH_BITRATE)
+
+    def test_high_bitrate_opus_is_encoded(self):
+        plan = plan_transcode(AudioInfo(codec='opus', channels=2, bit_rate=320_000), 19)
+
+        self.assertEqual(plan.mode, 'encode')
+
+    def test_segment_length_follows_bitrate_and_size_limit(self):
+        # Sem bitrate no cabeçalho (MediaRecorder): estimado pelo tamanho e pela duração
+        info = AudioInfo(codec='opus', size=60 * 1024 * 1024, duration=None)
+        plan = plan_transcode(info, 10, duration=4000)
+
+        self.assertEqual(plan.mode, 'copy')
+        self.assertEqual(plan.bit_rate, 125_829)
+        self.assertLessEqual(plan.max_segment_seconds * plan.bit_rate / 8, 10 * 1024 * 1024)
+        self.assertGreater(plan.max_segment_seconds, 500)
+
+    def test_unknown_file_is_encoded(self):
+        self.assertEqual(plan_transcode(None, 19).mode, 'encode')
+
+
+@skipUnless(shutil.which('ffmpeg'), "ffmpeg não está instalado")
+class TestStreamingSplit(SegmentTestCase):
+    def make_audio(self, seconds):
+        path = os.path.join(self.temp_dir, f"session_{seconds}.webm")
+        subprocess.run(
+            ['ffmpeg', '-nostdin', '-loglevel', 'error', '-f', 'lavfi',
+             '-i', f'anoisesrc=duration={seconds}:sample_rate=48000', '-c:a', 'libopus', path],
+            check=True,
+        )
+        return path
+
+    def peak_memory(self, audio_path):
+        client = SimpleNamespace(models=FakeModels())
+        tracemalloc.start()
+        try:
+            transcribe_audio_chunks(client, split_audio_with_ffmpeg_into_chunks(audio_path), "prompt")
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, client.models.sizes
+
+    @mock.patch.object(pipeline, 'SEGMENT_SECONDS', 5)
+    def test_segments_are_yielded_and_cleaned_up(self):
+        audio_path = self.make_audio(12)
+
+        segments = list(split_audio_with_ffmpeg_into_chunks(audio_path))
+
+        self.assertEqual(len(segments), 3)
+        for segment in segments:
+            self.assertGreater(len(segment), 0)
+            segment.close()
+
+    @mock.patch.object(pipeline, 'SEGMENT_SECONDS', 5)
+    def test_peak_memory_does_not_grow_with_duration(self):
+        short_peak, short_sizes = self.peak_memory(self.make_audio(10))
+        long_peak, long_sizes = self.peak_memory(self.make_audio(60))
+
+        self.assertEqual(len(long_sizes), 12)
+        # Só um segmento em memória por vez, qualquer que seja a duração
+        self.assertLess(long_peak, sum(long_sizes))
+        self.assertLess(long_peak, 2 * short_peak + max(long_sizes))
+
+    def test_abandoned_iteration_stops_ffmpeg_and_removes_files(self):
+        segments = split_audio_with_ffmpeg_into_chunks(self.make_audio(3))
+        segment = next(segments)
+        temp_dir = os.path.dirname(segment.path)
+
+        segments.close()
+        segment.close()
+
+        self.assertFalse(os.path.exists(temp_dir))
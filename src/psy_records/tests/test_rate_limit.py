@@ -0,0 +1,112 @@
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase, override_settings
+from google.genai import errors
+
+from psy_records import rate_limit
+from psy_records.gemini_clients import clear_clients, get_client, invalidate_client
+from psy_records.rate_limit import RateLimiter, call_with_limits, retry_after
+
+
+class FakeClock:
+    """Relógio que só anda quando alguém "dorme"."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def api_error(code, headers=None, details=None):
+    body = {"error": {"code": code, "message": "erro", "status": "X", "details": details or []}}
+    cls = errors.ClientError if code < 500 else errors.ServerError
+    return cls(code, body, response=httpx.Response(code, headers=headers or {}))
+
+
+@override_settings(
+    GEMINI_REQUESTS_PER_MINUTE=60, GEMINI_MAX_IN_FLIGHT=2, GEMINI_MAX_RETRIES=3,
+    GEMINI_BACKOFF_SECONDS=1, GEMINI_BACKOFF_MAX_SECONDS=60,
+)
+class TestCallWithLimits(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(rate_limit, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        limiters = mock.patch.dict(rate_limit._limiters, clear=True)
+        limiters.start()
+        self.addCleanup(limiters.stop)
+        self.addCleanup(clear_clients)
+        self.client = get_client('chave')
+
+    def test_retry_after_is_honoured_and_call_succeeds(self):
+        call = mock.Mock(side_effect=[api_error(429, {'retry-after': '7'}), 'ok'])
+
+        self.assertEqual(call_with_limits(self.client, call), 'ok')
+
+        self.assertEqual(call.call_count, 2)
+        self.assertIn(7.0, self.clock.sleeps)
+        # O 429 reduz o ritmo da key pela metade
+        self.assertLess(rate_limit.limiter_for(self.client).rate, 1)
+
+    def test_limiter_belongs_to_the_key_not_the_client(self):
+        call_with_limits(self.client, mock.Mock(side_effect=[api_error(429, {'retry-after': '7'}), 'ok']))
+        invalidate_client('chave')
+
+        new_client = get_client('chave')
+
+        self.assertIsNot(new_client, self.client)
+        self.assertIs(rate_limit.limiter_for(new_client), rate_limit.limiter_for(self.client))
+        self.assertIsNot(rate_limit.limiter_for(get_client('outra')), rate_limit.limiter_for(self.client))
+
+    def test_server_errors_use_jittered_backoff(self):
+        call = mock.Mock(side_effect=[api_error(503), api_error(503), 'ok'])
+
+        with mock.patch.object(rate_limit.random, 'uniform', side_effect=lambda a, b: b) as uniform:
+            self.assertEqual(call_with_limits(self.client, call), 'ok')
+
+        self.assertEqual([c.args for c in uniform.call_args_list], [(0, 1), (0, 2)])
+
+    def test_gives_up_after_max_retries(self):
+        call = mock.Mock(side_effect=api_error(500))
+
+        with self.assertRaises(errors.ServerError):
+            call_with_limits(self.client, call)
+
+        self.assertEqual(call.call_count, 4)
+
+    def test_other_errors_are_not_retried(self):
+        call = mock.Mock(side_effect=api_error(400))
+
+        with self.assertRaises(errors.ClientError):
+            call_with_limits(self.client, call)
+
+        self.assertEqual(call.call_count, 1)
+
+    def test_bucket_spaces_requests_beyond_burst(self):
+        limiter = RateLimiter(requests_per_minute=60, max_in_flight=2)
+
+        for _ in range(3):
+            limiter.acquire()
+
+        self.assertEqual(self.clock.sleeps, [1.0])
+
+
+class TestRetryAfter(SimpleTestCase):
+    def test_retry_delay_from_error_details(self):
+        error = api_error(429, details=[
+            {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "12s"},
+        ])
+
+        self.assertEqual(retry_after(error), 12.0)
+
+    def test_without_hint(self):
+        self.assertIsNone(retry_after(api_error(503)))
+        self.assertIsNone(retry_after(ValueError()))
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.test import TestCase
+
+from patients.models import Patient
+from psy_records.models import PsyRecord
+from user.models import User
+
+
+class TestRecordNumbers(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='teste', password='senha123')
+        self.patient = Patient.objects.create(user=user, first_name='Paciente', birth_date=date(1990, 1, 1))
+
+    def test_records_are_numbered_per_patient(self):
+        first = PsyRecord.objects.create(patient=self.patient)
+        second = PsyRecord.objects.create(patient=self.patient)
+
+        self.assertEqual((first.record_number, second.record_number), (1, 2))
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.next_record_number, 3)
+
+    def test_number_is_allocated_in_a_single_query(self):
+        PsyRecord.objects.create(patient=self.patient)
+
+        # UPDATE ... RETURNING no contador e o INSERT do prontuário
+        with self.assertNumQueries(2):
+            PsyRecord.objects.create(patient=self.patient)
+
+    def test_bulk_create_numbers_records_in_one_pass(self):
+        PsyRecord.objects.create(patient=self.patient)
+
+        records = PsyRecord.objects.bulk_create([PsyRecord(patient=self.patient) for _ in range(3)])
+
+        self.assertEqual([record.record_number for record in records], [2, 3, 4])
+        self.assertEqual(PsyRecord.objects.create(patient=self.patient).record_number, 5)
@@ -0,0 +1,118 @@
+import os
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from psy_records import scratch
+from psy_records.jobs import QueueFull, check_admission, discard_audio
+from psy_records.models import AudioJob, AudioUpload
+from psy_records.tests.test_jobs import JobTestCase
+from psy_records.uploads import start_upload
+
+
+class TestScratch(JobTestCase):
+    def make_audio(self, data=b'audio'):
+        path = scratch.audio_path(scratch.create_dir())
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def age(self, path, seconds):
+        old = time.time() - seconds
+        for dirpath, dirnames, filenames in os.walk(path):
+            for name in dirnames + filenames:
+                os.utime(os.path.join(dirpath, name), (old, old))
+        os.utime(path, (old, old))
+
+    def test_discard_removes_the_whole_job_directory(self):
+        path = self.make_audio()
+        work = scratch.work_dir(path)
+        open(os.path.join(work, 'chunk_000.webm'), 'wb').close()
+
+        discard_audio(path)
+
+        self.assertEqual(os.listdir(self.jobs_dir), [])
+
+    def test_work_dir_outside_scratch_uses_system_temp(self):
+        work = scratch.work_dir('/outro/lugar/audio.webm')
+        self.addCleanup(os.rmdir, work)
+
+        self.assertFalse(work.startswith(self.jobs_dir))
+
+    @override_settings(AUDIO_SCRATCH_MAX_BYTES=100)
+    def test_quota_applies_back_pressure(self):
+        check_admission(self.user)
+        self.make_audio(b'x' * 100)
+
+        with self.assertRaises(QueueFull):
+            check_admission(self.user)
+
+    def test_janitor_removes_only_old_orphans(self):
+        in_use = self.make_audio()
+        AudioJob.objects.create(record=self.record, user=self.user, audio_path=in_use)
+        orphan = os.path.dirname(self.make_audio())
+        recent = os.path.dirname(self.make_audio())
+        legacy = os.path.join(self.jobs_dir, 'uploads', 'antigo.webm')
+        os.makedirs(os.path.dirname(legacy))
+        open(legacy, 'wb').close()
+        for path in (os.path.dirname(in_use), orphan, legacy):
+            self.age(path, 3600)
+
+        call_command('clean_audio_scratch', min_age=600, stdout=StringIO())
+
+        self.assertTrue(os.path.exists(in_use))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(recent))
+        self.assertFalse(os.path.exists(legacy))
+
+    def test_janitor_dry_run_keeps_files(self):
+        orphan = os.path.dirname(self.make_audio())
+        self.age(orphan, 3600)
+        out = StringIO()
+
+        call_command('clean_audio_scratch', min_age=600, dry_run=True, stdout=out)
+
+        self.assertTrue(os.path.exists(orphan))
+        self.assertIn(orphan, out.getvalue())
+
+    def test_finished_job_audio_is_not_protected(self):
+        path = self.make_audio()
+        AudioJob.objects.create(
+            record=self.record, user=self.user, audio_path=path, status=AudioJob.Status.DONE
+        )
+        self.age(os.path.dirname(path), 3600)
+
+        call_command('clean_audio_scratch', min_age=600, stdout=StringIO())
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_janitor_discards_abandoned_open_uploads(self):
+        abandoned = start_upload(self.user, self.patient)
+        AudioUpload.objects.filter(pk=abandoned.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.age(os.path.dirname(abandoned.path), 3600)
+        recording = start_upload(self.user, self.patient)
+        self.age(os.path.dirname(recording.path), 3600)
+
+        call_command('clean_audio_scratch', min_age=600, stdout=StringIO())
+
+        self.assertFalse(AudioUpload.objects.filter(pk=abandoned.pk).exists())
+        self.assertFalse(os.path.exists(abandoned.path))
+        self.assertTrue(os.path.exists(recording.path))
+
+    def test_janitor_keeps_abandoned_upload_with_running_segment(self):
+        upload = start_upload(self.user, self.patient)
+        AudioUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.age(os.path.dirname(upload.path), 3600)
+        AudioJob.objects.create(
+            kind=AudioJob.Kind.SEGMENT, upload=upload, segment_index=0, user=self.user,
+            audio_path=upload.path, status=AudioJob.Status.RUNNING, heartbeat_at=timezone.now(),
+        )
+
+        call_command('clean_audio_scratch', min_age=600, stdout=StringIO())
+
+        self.assertTrue(AudioUpload.objects.filter(pk=upload.pk).exists())
+        self.assertTrue(os.path.exists(upload.path))
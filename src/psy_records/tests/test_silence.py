@@ -0,0 +1,36 @@
+from django.test import SimpleTestCase
+
+from psy_records.silence import parse_silences, speech_intervals, trim_filter
+
+SILENCEDETECT_OUTPUT = """
+[silencedetect @ 0x5581] silence_start: 0
+[silencedetect @ 0x5581] silence_end: 42.5 | silence_duration: 42.5
+size=N/A time=00:01:00.00 bitrate=N/A speed= 900x
+[silencedetect @ 0x5581] silence_start: 80.25
+[silencedetect @ 0x5581] silence_end: 95 | silence_duration: 14.75
+[silencedetect @ 0x5581] silence_start: 170
+"""
+
+
+class TestSilenceTrim(SimpleTestCase):
+    def test_parse_silences(self):
+        self.assertEqual(
+            parse_silences(SILENCEDETECT_OUTPUT),
+            [(0.0, 42.5), (80.25, 95.0), (170.0, None)],
+        )
+
+    def test_speech_intervals_drop_leading_and_trailing_silence(self):
+        intervals = speech_intervals(parse_silences(SILENCEDETECT_OUTPUT), padding=0.5)
+
+        self.assertEqual(intervals, [(42.0, 80.75), (94.5, 170.5)])
+
+    def test_speech_runs_to_the_end_without_trailing_silence(self):
+        intervals = speech_intervals([(10.0, 20.0)], total_seconds=30, padding=0)
+
+        self.assertEqual(intervals, [(0.0, 10.0), (20.0, 30)])
+
+    def test_trim_filter(self):
+        self.assertEqual(
+            trim_filter([(1.0, 2.5), (4.0, float('inf'))]),
+            "aselect='between(t,1.000,2.500)+gte(t,4.000)',asetpts=N/SR/TB",
+        )
@@ -0,0 +1,100 @@
+import json
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from psy_records import pipeline
+from psy_records.jobs import claim_next_job, run_job
+from psy_records.models import AudioJob, Transcript
+from psy_records.tests.test_jobs import JobTestCase
+
+
+class TestJobStages(JobTestCase):
+    def test_summary_job_records_each_stage(self):
+        Transcript.objects.create(record=self.record, text='Paciente: Olá.')
+        AudioJob.objects.create(kind=AudioJob.Kind.SUMMARY, record=self.record, user=self.user)
+        job = claim_next_job('worker-1')
+
+        with mock.patch.object(pipeline, 'get_client') as get_client:
+            get_client.return_value.models.generate_content_stream.return_value = [
+                mock.Mock(text='{"psy_record": "Prontuário"}')
+            ]
+            run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.stage, AudioJob.Stage.DONE)
+        self.assertEqual(set(job.stage_times), {'summarizing', 'done'})
+
+    def test_missing_audio_marks_stage_failed(self):
+        self.create_job()
+
+        run_job(claim_next_job('worker-1'))
+
+        self.assertEqual(AudioJob.objects.get().stage, AudioJob.Stage.FAILED)
+
+
+class TestProcessingStatusView(JobTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse('psy_records:status', args=[self.patient.id])
+
+    def test_json_snapshot(self):
+        job = self.create_job()
+        job.stage = AudioJob.Stage.TRANSCRIBING
+        job.save()
+
+        data = self.client.get(self.url).json()
+
+        self.assertTrue(data['active'])
+        self.assertEqual(data['jobs'][0]['record_id'], self.record.pk)
+        self.assertEqual(data['jobs'][0]['stage_label'], 'Transcrevendo')
+        self.assertNotIn('content', data['jobs'][0])
+
+    def test_finished_job_includes_content_for_record(self):
+        self.create_job()
+        run_job(claim_next_job('worker-1'))
+
+        data = self.client.get(self.url, {'record': self.record.pk}).json()
+
+        self.assertFalse(data['active'])
+        self.assertEqual(data['jobs'][0]['status'], AudioJob.Status.FAILED)
+        self.assertIn('arquivo de áudio não encontrado', data['jobs'][0]['content'])
+
+    def test_running_job_includes_partial_content_for_record(self):
+        job = self.create_job()
+        AudioJob.objects.filter(pk=job.pk).update(
+            status=AudioJob.Status.RUNNING, stage=AudioJob.Stage.SUMMARIZING, partial_output='Paciente rel'
+        )
+
+        entry = self.client.get(self.url, {'record': self.record.pk}).json()['jobs'][0]
+
+        self.assertEqual(entry['partial_content'], 'Paciente rel')
+        self.assertNotIn('content', entry)
+        self.assertNotIn('partial_content', self.client.get(self.url).json()['jobs'][0])
+
+    def test_other_users_patient_is_not_found(self):
+        other = self.user.__class__.objects.create_user(username='outro', password='senha123')
+        self.client.force_login(other)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @override_settings(AUDIO_STATUS_STREAM_SECONDS=0, AUDIO_STATUS_POLL_INTERVAL=0)
+    def test_event_stream(self):
+        self.create_job()
+
+        response = self.client.get(self.url, headers={'Accept': 'text/event-stream'})
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = [block for block in body.split('\n\n') if block.startswith('event: status')]
+        status = json.loads(events[0].split('data: ', 1)[1])
+        self.assertEqual(status['jobs'][0]['stage'], AudioJob.Stage.QUEUED)
+
+    @override_settings(AUDIO_STATUS_STREAM_SECONDS=0)
+    def test_event_stream_ends_with_idle_when_nothing_is_running(self):
+        response = self.client.get(self.url, headers={'Accept': 'text/event-stream'})
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertIn('event: idle', body)
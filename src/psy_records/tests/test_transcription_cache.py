@@ -0,0 +1,83 @@
+import hashlib
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from psy_records import pipeline
+from psy_records.jobs import store_audio_upload
+from psy_records.models import TranscriptionCache
+from psy_records.transcription_cache import (
+    evict_transcriptions,
+    get_cached_transcription,
+    hash_file,
+    store_transcription,
+)
+from psy_records.tests.test_jobs import JobTestCase, use_temp_jobs_dir
+
+
+class TestTranscriptionCache(TestCase):
+    def setUp(self):
+        use_temp_jobs_dir(self)
+
+    def test_hit_requires_same_audio_and_prompt(self):
+        store_transcription('a' * 64, 'prompt v1', 'Paciente: Olá.')
+
+        self.assertEqual(get_cached_transcription('a' * 64, 'prompt v1'), 'Paciente: Olá.')
+        self.assertIsNone(get_cached_transcription('a' * 64, 'prompt v2'))
+        self.assertIsNone(get_cached_transcription('b' * 64, 'prompt v1'))
+        self.assertIsNone(get_cached_transcription('', 'prompt v1'))
+
+    @override_settings(AUDIO_TRANSCRIPTION_CACHE_MAX_AGE_DAYS=30)
+    def test_expired_entries_are_evicted(self):
+        store_transcription('a' * 64, 'prompt', 'antiga')
+        TranscriptionCache.objects.update(last_used_at=timezone.now() - timedelta(days=31))
+
+        evict_transcriptions()
+
+        self.assertFalse(TranscriptionCache.objects.exists())
+
+    @override_settings(AUDIO_TRANSCRIPTION_CACHE_MAX_BYTES=25)
+    def test_least_recently_used_entries_are_evicted_above_size_limit(self):
+        store_transcription('a' * 64, 'prompt', 'x' * 10)
+        store_transcription('b' * 64, 'prompt', 'x' * 10)
+        get_cached_transcription('a' * 64, 'prompt')
+
+        store_transcription('c' * 64, 'prompt', 'x' * 10)
+
+        self.assertEqual(
+            set(TranscriptionCache.objects.values_list('audio_sha256', flat=True)),
+            {'a' * 64, 'c' * 64},
+        )
+
+
+class TestAudioHashing(JobTestCase):
+    def test_upload_is_hashed_while_stored(self):
+        content = b'audio' * 1000
+        path, sha256 = store_audio_upload(SimpleUploadedFile('audio.webm', content))
+
+        self.assertEqual(sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(hash_file(path), sha256)
+
+    def test_cached_audio_skips_transcription(self):
+        store_transcription('a' * 64, pipeline.PROMPT_TRANSCRIPTION, 'Paciente: Olá.')
+        summary = mock.Mock(text='{"psy_record": "Sessão"}')
+
+        with mock.patch.object(pipeline, 'normalize_audio') as normalize, \
+                mock.patch.object(pipeline, 'transcribe_audio') as transcribe, \
+                mock.patch.object(pipeline, 'get_client') as get_client:
+            get_client.return_value.models.generate_content.return_value = summary
+            success = pipeline._process_audio_background(
+                self.record.pk, self.patient.pk, 'inexistente.webm', 'chave',
+                pipeline.PROMPT_TRANSCRIPTION, 'resumo', {}, audio_sha256='a' * 64,
+            )
+
+        self.assertTrue(success)
+        normalize.assert_not_called()
+        transcribe.assert_not_called()
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.content, 'Sessão')
+        contents = get_client.return_value.models.generate_content.call_args.kwargs['contents']
+        self.assertEqual(contents[-1], 'Paciente: Olá.')
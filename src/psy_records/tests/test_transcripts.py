@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase, override_settings
+
+from psy_records.pipeline import SEGMENT_SECONDS, segment_window
+from psy_records.transcripts import merge_transcripts
+
+
+class TestMergeTranscripts(SimpleTestCase):
+    def test_repeated_lines_in_overlap_are_dropped(self):
+        first = "Psicólogo: Como foi a sua semana?\nPaciente: Foi difícil, dormi pouco por causa do trabalho."
+        second = "Paciente: Foi difícil, dormi pouco por causa do trabalho.\nPsicólogo: Vamos falar sobre isso."
+
+        merged = merge_transcripts([first, second])
+
+        self.assertEqual(
+            merged.splitlines(),
+            [
+                "Psicólogo: Como foi a sua semana?",
+                "Paciente: Foi difícil, dormi pouco por causa do trabalho.",
+                "Psicólogo: Vamos falar sobre isso.",
+            ],
+        )
+
+    def test_fragment_at_start_of_next_segment_is_dropped(self):
+        first = "Paciente: Eu fiquei muito ansioso antes da entrevista de emprego."
+        second = "Outro: antes da entrevista de emprego.\nPsicólogo: E o que você fez?"
+
+        merged = merge_transcripts([first, second])
+
+        self.assertEqual(merged.splitlines()[-1], "Psicólogo: E o que você fez?")
+        self.assertEqual(len(merged.splitlines()), 2)
+
+    def test_cut_line_at_end_is_replaced_by_complete_line(self):
+        first = "Psicólogo: Bom dia.\nPaciente: Eu queria falar sobre"
+        second = "Paciente: Eu queria falar sobre a minha mãe.\nPsicólogo: Claro."
+
+        merged = merge_transcripts([first, second])
+
+        self.assertEqual(
+            merged.splitlines(),
+            ["Psicólogo: Bom dia.", "Paciente: Eu queria falar sobre a minha mãe.", "Psicólogo: Claro."],
+        )
+
+    def test_short_answers_are_kept_when_not_repeated(self):
+        first = "Psicólogo: Você dormiu bem?\nPaciente: Não."
+        second = "Psicólogo: E ontem?\nPaciente: Sim."
+
+        merged = merge_transcripts([first, second])
+
+        self.assertEqual(len(merged.splitlines()), 4)
+
+
+class TestSegmentWindow(SimpleTestCase):
+    @override_settings(AUDIO_SEGMENT_OVERLAP_SECONDS=10)
+    def test_segments_start_before_the_previous_boundary(self):
+        self.assertEqual(segment_window(0), (0, SEGMENT_SECONDS))
+        self.assertEqual(segment_window(1), (SEGMENT_SECONDS - 10, SEGMENT_SECONDS + 10))
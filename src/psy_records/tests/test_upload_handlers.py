@@ -0,0 +1,93 @@
+import hashlib
+import os
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers, StopUpload
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from psy_records.models import AudioJob, PsyRecord
+from psy_records.tests.test_jobs import JobTestCase
+from psy_records.upload_handlers import AudioUploadHandler, rejected_upload, sniff_format
+
+WEBM_HEADER = b'\x1a\x45\xdf\xa3' + b'\x00' * 12
+
+
+class TestSniffFormat(SimpleTestCase):
+    def test_known_signatures(self):
+        self.assertEqual(sniff_format(WEBM_HEADER), 'webm')
+        self.assertEqual(sniff_format(b'OggS\x00\x02'), 'ogg')
+        self.assertEqual(sniff_format(b'\x00\x00\x00\x20ftypM4A '), 'm4a')
+        self.assertEqual(sniff_format(b'\xff\xfb\x90\x00'), 'mp3')
+
+    def test_unknown(self):
+        self.assertEqual(sniff_format(b'texto'), '')
+        self.assertEqual(sniff_format(b''), '')
+
+
+class TestAudioUploadHandler(JobTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def post_audio(self, content, name='sessao.webm'):
+        return self.client.post(
+            reverse('psy_records:create', args=[self.patient.id]),
+            {
+                'date': '2025-01-01', 'content': '', 'has_audio': 'true',
+                'audio_file': SimpleUploadedFile(name, content, content_type='audio/webm'),
+            },
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+    def test_upload_is_written_once_in_the_jobs_dir(self):
+        content = WEBM_HEADER + b'audio' * 200_000
+
+        response = self.post_audio(content)
+
+        self.assertEqual(response.status_code, 202)
+        job = AudioJob.objects.get(record_id=response.json()['record_id'])
+        job_dir = os.path.dirname(job.audio_path)
+        self.assertEqual(os.path.dirname(job_dir), self.jobs_dir)
+        self.assertTrue(job.audio_path.endswith('.webm'))
+        self.assertEqual(job.audio_sha256, hashlib.sha256(content).hexdigest())
+        # Nenhuma cópia intermediária ficou no diretório
+        self.assertEqual(os.listdir(self.jobs_dir), [os.path.basename(job_dir)])
+        self.assertEqual(os.listdir(job_dir), [os.path.basename(job.audio_path)])
+
+    def test_format_is_taken_from_content(self):
+        response = self.post_audio(b'OggS' + b'\x00' * 100, name='sessao.webm')
+
+        job = AudioJob.objects.get(record_id=response.json()['record_id'])
+        self.assertTrue(job.audio_path.endswith('.ogg'))
+
+    @override_settings(AUDIO_JOBS_MAX_QUEUED=0)
+    def test_rejected_upload_is_removed(self):
+        response = self.post_audio(WEBM_HEADER)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(os.listdir(self.jobs_dir), [])
+
+    @override_settings(AUDIO_SCRATCH_MAX_BYTES=10_000)
+    def test_upload_over_quota_is_stopped_before_writing(self):
+        response = self.post_audio(WEBM_HEADER + b'audio' * 10_000)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(PsyRecord.objects.exclude(pk=self.record.pk).exists())
+        self.assertEqual(os.listdir(self.jobs_dir), [])
+
+    @override_settings(AUDIO_SCRATCH_MAX_BYTES=10_000)
+    def test_upload_without_length_is_stopped_when_quota_is_reached(self):
+        request = RequestFactory().post('/')
+        handler = AudioUploadHandler(request)
+        handler.handle_raw_input(None, {}, None, b'', None)
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file('audio_file', 'sessao.webm', 'audio/webm', None)
+        handler.receive_data_chunk(WEBM_HEADER, 0)
+
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b'x' * 10_000, len(WEBM_HEADER))
+        handler.file.close()
+
+        self.assertTrue(rejected_upload(request))
+        self.assertEqual(os.listdir(self.jobs_dir), [])
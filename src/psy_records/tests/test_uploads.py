@@ -0,0 +1,222 @@
+import os
+from datetime import date
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from patients.models import Patient
+from psy_records.models import AudioJob, AudioUpload, PsyRecord
+from psy_records.tests.test_jobs import use_temp_jobs_dir
+from psy_records.transcription_cache import chain_sha256
+from psy_records.uploads import append_chunk
+from user.models import User
+
+
+class ChunkedUploadTestCase(TestCase):
+    def setUp(self):
+        self.jobs_dir = use_temp_jobs_dir(self)
+
+        self.user = User.objects.create_user(username='teste', password='senha123')
+        self.patient = Patient.objects.create(
+            user=self.user, first_name='Paciente', birth_date=date(1990, 1, 1)
+        )
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            reverse('psy_records:upload_create', args=[self.patient.id]),
+            {'mime_type': 'audio/webm;codecs=opus'},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.upload = AudioUpload.objects.get(pk=response.json()['upload_id'])
+
+    def send_chunk(self, index, data):
+        return self.client.put(
+            reverse('psy_records:upload_chunk', args=[self.patient.id, self.upload.pk, index]),
+            data,
+            content_type='application/octet-stream',
+        )
+
+    def finalize(self, total_chunks):
+        return self.client.post(
+            reverse('psy_records:upload_finalize', args=[self.patient.id, self.upload.pk]),
+            {'date': '2025-01-01', 'content': '', 'total_chunks': total_chunks},
+        )
+
+
+class TestChunkedUpload(ChunkedUploadTestCase):
+    def test_chunks_are_appended_in_order(self):
+        self.send_chunk(0, b'abc')
+        response = self.send_chunk(1, b'def')
+
+        self.assertEqual(response.json()['next_index'], 2)
+        with open(self.upload.path, 'rb') as f:
+            self.assertEqual(f.read(), b'abcdef')
+
+    @override_settings(AUDIO_SCRATCH_MAX_BYTES=5)
+    def test_chunk_over_scratch_quota_is_refused(self):
+        self.send_chunk(0, b'abc')
+
+        response = self.send_chunk(1, b'def')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['next_index'], 1)
+        with open(self.upload.path, 'rb') as f:
+            self.assertEqual(f.read(), b'abc')
+
+    def test_resent_chunk_is_ignored(self):
+        self.send_chunk(0, b'abc')
+        response = self.send_chunk(0, b'abc')
+
+        self.assertTrue(response.json()['duplicate'])
+        with open(self.upload.path, 'rb') as f:
+            self.assertEqual(f.read(), b'abc')
+
+    def test_out_of_order_chunk_reports_expected_index(self):
+        self.send_chunk(0, b'abc')
+        response = self.send_chunk(2, b'ghi')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['next_index'], 1)
+
+    def test_status_allows_resume(self):
+        self.send_chunk(0, b'abc')
+
+        response = self.client.get(
+            reverse('psy_records:upload_detail', args=[self.patient.id, self.upload.pk])
+        )
+
+        self.assertEqual(response.json()['next_index'], 1)
+        self.assertEqual(response.json()['size'], 3)
+
+    def test_finalize_creates_record_and_job(self):
+        self.send_chunk(0, b'abc')
+
+        response = self.finalize(1)
+
+        self.assertEqual(response.status_code, 202)
+        record = PsyRecord.objects.get(patient=self.patient)
+        job = AudioJob.objects.get(record=record)
+        self.assertEqual(job.audio_path, self.upload.path)
+
+    def test_finalized_job_gets_hash_of_received_chunks(self):
+        self.send_chunk(0, b'abc')
+        self.send_chunk(1, b'def')
+        other = AudioUpload.objects.create(user=self.user, patient=self.patient, path=f'{self.jobs_dir}/outro.webm')
+        AudioUpload.objects.filter(pk=other.pk).update(next_index=1, size=3)
+        other.refresh_from_db()
+        append_chunk(other, 1, b'def')
+
+        self.finalize(2)
+
+        job = AudioJob.objects.get(record__patient=self.patient)
+        self.assertEqual(job.audio_sha256, chain_sha256(chain_sha256('', b'abc'), b'def'))
+        # Upload anterior ao hash por partes: o job calcula o hash do arquivo
+        other.refresh_from_db()
+        self.assertEqual(other.parts_sha256, '')
+
+    def test_finalize_twice_returns_same_record(self):
+        self.send_chunk(0, b'abc')
+
+        self.finalize(1)
+        response = self.finalize(1)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(PsyRecord.objects.filter(patient=self.patient).count(), 1)
+        self.assertEqual(AudioJob.objects.count(), 1)
+
+    def test_finalize_with_missing_chunks_is_rejected(self):
+        self.send_chunk(0, b'abc')
+
+        response = self.finalize(2)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(PsyRecord.objects.filter(patient=self.patient).exists())
+
+    def test_cancel_discards_upload_and_audio(self):
+        self.send_chunk(0, b'abc')
+
+        response = self.client.delete(
+            reverse('psy_records:upload_detail', args=[self.patient.id, self.upload.pk])
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(AudioUpload.objects.filter(pk=self.upload.pk).exists())
+        self.assertFalse(os.path.exists(self.upload.path))
+
+    def test_cancel_keeps_audio_of_segment_being_transcribed(self):
+        self.send_chunk(0, b'abc')
+        running = AudioJob.objects.create(
+            kind=AudioJob.Kind.SEGMENT, upload=self.upload, segment_index=0, user=self.user,
+            audio_path=self.upload.path, status=AudioJob.Status.RUNNING,
+        )
+        AudioJob.objects.create(
+            kind=AudioJob.Kind.SEGMENT, upload=self.upload, segment_index=1, user=self.user,
+            audio_path=self.upload.path,
+        )
+
+        response = self.client.delete(
+            reverse('psy_records:upload_detail', args=[self.patient.id, self.upload.pk])
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(AudioJob.objects.values_list('pk', flat=True)), [running.pk])
+        self.assertTrue(os.path.exists(self.upload.path))
+
+    def test_finalized_upload_cannot_be_cancelled(self):
+        self.send_chunk(0, b'abc')
+        self.finalize(1)
+
+        response = self.client.delete(
+            reverse('psy_records:upload_detail', args=[self.patient.id, self.upload.pk])
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(os.path.exists(self.upload.path))
+
+    def test_other_user_cannot_send_chunks(self):
+        other = User.objects.create_user(username='outro', password='senha123')
+        self.client.force_login(other)
+
+        response = self.send_chunk(0, b'abc')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class TestIncrementalTranscription(ChunkedUploadTestCase):
+    def send_timed_chunk(self, index, data, end_seconds):
+        return self.client.put(
+            reverse('psy_records:upload_chunk', args=[self.patient.id, self.upload.pk, index]),
+            data,
+            content_type='application/octet-stream',
+            headers={'X-Audio-End-Seconds': str(end_seconds)},
+        )
+
+    def test_completed_segments_are_scheduled_once(self):
+        self.send_timed_chunk(0, b'abc', 300)
+        self.assertFalse(AudioJob.objects.filter(kind=AudioJob.Kind.SEGMENT).exists())
+
+        self.send_timed_chunk(1, b'def', 1300)
+        self.send_timed_chunk(2, b'ghi', 1310)
+
+        segments = AudioJob.objects.filter(kind=AudioJob.Kind.SEGMENT).order_by('segment_index')
+        self.assertEqual([job.segment_index for job in segments], [0, 1])
+
+    @override_settings(AUDIO_INCREMENTAL_TRANSCRIPTION=False)
+    def test_disabled_mode_does_not_schedule_segments(self):
+        self.send_timed_chunk(0, b'abc', 1300)
+
+        self.assertFalse(AudioJob.objects.filter(kind=AudioJob.Kind.SEGMENT).exists())
+
+    def test_record_job_uses_contiguous_transcribed_segments(self):
+        from psy_records.jobs import transcribed_segments
+        from psy_records.models import TranscriptSegment
+
+        self.send_chunk(0, b'abc')
+        self.finalize(1)
+        self.upload.refresh_from_db()
+        TranscriptSegment.objects.create(upload=self.upload, index=0, text='Paciente: oi')
+        TranscriptSegment.objects.create(upload=self.upload, index=2, text='Paciente: tchau')
+
+        self.assertEqual(
+            transcribed_segments(self.upload.record, self.upload.path), ['Paciente: oi']
+        )
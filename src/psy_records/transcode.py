@@ -0,0 +1,140 @@
+"""
+Planejamento da conversão do áudio antes do envio ao Gemini.
+
+A maioria das gravações já chega em Opus/WebM (MediaRecorder do navegador) e
+pode ser apenas copiada para os segmentos, sem re-encodificar. Os demais
+formatos são convertidos para uma versão mono e de baixo bitrate, suficiente
+para fala. O tamanho dos segmentos é calculado a partir do bitrate real para
+respeitar o limite de tamanho de cada requisição.
+"""
+import json
+import logging
+import os
+import subprocess
+from dataclasses import dataclass
+
+from .metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# Codecs que podem ir para um contêiner WebM sem re-encodificar
+COPY_CODECS = {'opus'}
+# Conversão rápida para fala: mono, Opus de baixo bitrate, compressão leve
+SPEECH_BITRATE = 32_000
+SPEECH_ENCODE_ARGS = [
+    '-ac', '1',
+    '-c:a', 'libopus',
+    '-b:a', str(SPEECH_BITRATE),
+    '-application', 'voip',
+    '-compression_level', '3',
+]
+# Acima deste bitrate compensa converter mesmo um Opus (menos bytes a enviar)
+MAX_COPY_BITRATE = 128_000
+# Bitrate presumido quando o ffprobe não informa e não há duração para estimar
+FALLBACK_BITRATE = MAX_COPY_BITRATE
+# Folga para o overhead do contêiner e a variação do VBR
+SIZE_MARGIN = 0.9
+
+
+@dataclass(frozen=True)
+class AudioInfo:
+    """O que o ffprobe informa sobre o primeiro stream de áudio do arquivo."""
+
+    codec: str = ''
+    channels: int = 0
+    bit_rate: int | None = None
+    duration: float | None = None
+    size: int = 0
+
+
+@dataclass(frozen=True)
+class TranscodePlan:
+    """Como gerar os segmentos: argumentos de codec e duração máxima de cada um."""
+
+    mode: str
+    codec_args: list[str]
+    bit_rate: int
+    max_segment_seconds: int
+
+
+def probe_audio(audio_path: str) -> AudioInfo | None:
+    """Lê codec, canais, bitrate e duração com uma única chamada ao ffprobe."""
+    try:
+        with observe_stage("ffprobe"):
+            result = subprocess.run(
+                ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+                 '-show_entries', 'format=duration,bit_rate,size:stream=codec_name,channels,bit_rate',
+                 '-of', 'json', audio_path],
+                check=True, capture_output=True, text=True,
+            )
+        data = json.loads(result.stdout or '{}')
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        logger.error(f"Erro no ffprobe ao analisar {audio_path}: {e}")
+        return None
+
+    streams = data.get('streams') or [{}]
+    stream, fmt = streams[0], data.get('format', {})
+    return AudioInfo(
+        codec=stream.get('codec_name', ''),
+        channels=_to_number(stream.get('channels'), int) or 0,
+        bit_rate=_to_number(stream.get('bit_rate'), int) or _to_number(fmt.get('bit_rate'), int),
+        duration=_to_number(fmt.get('duration'), float),
+        size=_to_number(fmt.get('size'), int) or _file_size(audio_path),
+    )
+
+
+def plan_transcode(info: AudioInfo | None, max_chunk_size_mb: float, duration: float | None = None) -> TranscodePlan:
+    """
+    Escolhe entre copiar o stream e converter para fala, e calcula a duração
+    máxima de cada segmento para que nenhum passe de `max_chunk_size_mb`.
+
+    Só é copiado o Opus com bitrate de até MAX_COPY_BITRATE; o resto é
+    convertido para mono em SPEECH_BITRATE.
+
+    `duration` substitui a do ffprobe quando ela não está no cabeçalho
+    (gravações do MediaRecorder), para estimar o bitrate pelo tamanho.
+    """
+    info = info or AudioInfo()
+    duration = info.duration or duration
+    bit_rate = info.bit_rate
+    if not bit_rate and duration and info.size:
+        bit_rate = int(info.size * 8 / duration)
+    bit_rate = bit_rate or FALLBACK_BITRATE
+
+    if info.codec in COPY_CODECS and bit_rate <= MAX_COPY_BITRATE:
+        return TranscodePlan(
+            mode='copy',
+            codec_args=['-c:a', 'copy'],
+            bit_rate=bit_rate,
+            max_segment_seconds=_max_segment_seconds(max_chunk_size_mb, bit_rate),
+        )
+    return speech_plan(max_chunk_size_mb)
+
+
+def speech_plan(max_chunk_size_mb: float) -> TranscodePlan:
+    """Conversão para fala (mono, SPEECH_BITRATE), usada quando não dá para copiar."""
+    return TranscodePlan(
+        mode='encode',
+        codec_args=list(SPEECH_ENCODE_ARGS),
+        bit_rate=SPEECH_BITRATE,
+        max_segment_seconds=_max_segment_seconds(max_chunk_size_mb, SPEECH_BITRATE),
+    )
+
+
+def _max_segment_seconds(max_chunk_size_mb: float, bit_rate: int) -> int:
+    max_bytes = max_chunk_size_mb * 1024 * 1024 * SIZE_MARGIN
+    return max(1, int(max_bytes * 8 / bit_rate))
+
+
+def _to_number(value, cast):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
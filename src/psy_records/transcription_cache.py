@@ -0,0 +1,102 @@
+"""
+Cache de transcrições endereçado pelo conteúdo do áudio.
+
+A chave é o SHA-256 do arquivo enviado mais a versão do prompt de
+transcrição. Entradas antigas (AUDIO_TRANSCRIPTION_CACHE_MAX_AGE_DAYS) e as
+menos usadas, quando o total passa de AUDIO_TRANSCRIPTION_CACHE_MAX_BYTES,
+são removidas a cada nova gravação.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import TranscriptionCache
+
+logger = logging.getLogger(__name__)
+
+_READ_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 do arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chain_sha256(previous: str, data: bytes) -> str:
+    """
+    Hash de um upload em partes, atualizado a cada parte recebida: SHA-256 do
+    hash anterior seguido da parte. Identifica o áudio sem reler o arquivo
+    inteiro ao final (mas difere do `hash_file` do mesmo áudio).
+    """
+    digest = hashlib.sha256(previous.encode('ascii'))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def prompt_version(prompt: str) -> str:
+    """Identifica a versão do prompt de transcrição pelo seu conteúdo."""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def get_cached_transcription(audio_sha256: str, prompt: str) -> str | None:
+    """Transcrição já feita para esse áudio e esse prompt, se houver."""
+    if not audio_sha256:
+        return None
+    entry = TranscriptionCache.objects.filter(
+        audio_sha256=audio_sha256, prompt_version=prompt_version(prompt)
+    ).first()
+    if entry is None:
+        return None
+    TranscriptionCache.objects.filter(pk=entry.pk).update(last_used_at=timezone.now())
+    logger.info(f"Transcrição do áudio {audio_sha256[:12]} encontrada no cache")
+    return entry.transcription
+
+
+def store_transcription(audio_sha256: str, prompt: str, transcription: str) -> None:
+    """Guarda a transcrição e aplica a política de remoção."""
+    if not audio_sha256 or not transcription:
+        return
+    try:
+        TranscriptionCache.objects.update_or_create(
+            audio_sha256=audio_sha256,
+            prompt_version=prompt_version(prompt),
+            defaults={
+                'transcription': transcription,
+                'size': len(transcription.encode('utf-8')),
+                'last_used_at': timezone.now(),
+            },
+        )
+    except IntegrityError:
+        # Outro worker gravou a mesma transcrição ao mesmo tempo
+        return
+    evict_transcriptions()
+
+
+def evict_transcriptions() -> int:
+    """Remove as entradas expiradas e, acima do limite de tamanho, as menos usadas."""
+    expired = timezone.now() - timedelta(days=settings.AUDIO_TRANSCRIPTION_CACHE_MAX_AGE_DAYS)
+    removed, _ = TranscriptionCache.objects.filter(last_used_at__lt=expired).delete()
+
+    total = TranscriptionCache.objects.aggregate(total=Sum('size'))['total'] or 0
+    excess = total - settings.AUDIO_TRANSCRIPTION_CACHE_MAX_BYTES
+    if excess > 0:
+        stale = []
+        for pk, size in TranscriptionCache.objects.order_by('last_used_at').values_list('pk', 'size'):
+            if excess <= 0:
+                break
+            stale.append(pk)
+            excess -= size
+        removed += TranscriptionCache.objects.filter(pk__in=stale).delete()[0]
+
+    if removed:
+        logger.info(f"{removed} transcrição(ões) removida(s) do cache")
+    return removed
@@ -0,0 +1,74 @@
+"""
+Junção das transcrições parciais de segmentos sobrepostos.
+
+Cada segmento começa alguns segundos antes do fim do anterior, para que um
+corte nunca caia no meio de uma frase sem que ela apareça inteira em algum
+dos lados. Ao juntar, as falas repetidas nessa sobreposição são descartadas.
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+# Quantas falas do fim/início de cada segmento são comparadas
+OVERLAP_LINES = 6
+# Semelhança mínima para considerar duas falas a mesma
+SIMILARITY_THRESHOLD = 0.8
+# Falas curtas ("sim", "uhum") só são descartadas se forem iguais a uma do fim
+# do segmento anterior; as longas também quando forem um pedaço de uma delas
+MIN_FRAGMENT_CHARS = 15
+
+_SPEAKER_LABEL = re.compile(r"^\s*[\w ]{1,20}:\s*")
+
+
+def merge_transcripts(parts: list[str]) -> str:
+    """Junta as transcrições dos segmentos, em ordem, sem repetir a sobreposição."""
+    lines: list[str] = []
+    for part in parts:
+        following = [line for line in (part or "").splitlines() if line.strip()]
+        if lines:
+            following = _drop_overlap(lines, following)
+        lines.extend(following)
+    return "\n".join(lines)
+
+
+def _drop_overlap(previous: list[str], following: list[str]) -> list[str]:
+    """
+    Remove de `following` as falas que já estão no fim de `previous`.
+
+    Também descarta a última fala de `previous` quando ela foi cortada no fim
+    do segmento e aparece completa no início do seguinte.
+    """
+    tail = [_normalize(line) for line in previous[-OVERLAP_LINES:]]
+    tail_text = " ".join(tail)
+
+    skip = 0
+    for line in following[:OVERLAP_LINES]:
+        normalized = _normalize(line)
+        if not normalized:
+            skip += 1
+            continue
+        is_fragment = len(normalized) >= MIN_FRAGMENT_CHARS and normalized in tail_text
+        if is_fragment or any(_similar(normalized, other) for other in tail):
+            skip += 1
+            continue
+        break
+    following = following[skip:]
+
+    if following and previous:
+        cut = _normalize(previous[-1])
+        first = _normalize(following[0])
+        if cut and first.startswith(cut) and len(first) > len(cut):
+            previous.pop()
+    return following
+
+
+def _normalize(line: str) -> str:
+    text = _SPEAKER_LABEL.sub("", line)
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _similar(a: str, b: str) -> bool:
+    return bool(a and b) and SequenceMatcher(None, a, b).ratio() >= SIMILARITY_THRESHOLD
@@ -0,0 +1,151 @@
+"""
+Recebimento dos áudios das sessões direto no diretório da fila.
+
+Sem isso, o Django grava o upload num arquivo temporário e a view copia
+esse arquivo para AUDIO_JOBS_DIR: cada sessão era escrita duas vezes. O
+`AudioUploadHandler` grava os campos de áudio (AUDIO_UPLOAD_FIELDS) já no
+destino final, calculando o SHA-256 e identificando o formato pelos
+primeiros bytes enquanto os dados chegam; `store_audio_upload` só assume o
+arquivo.
+
+A cota de AUDIO_SCRATCH_MAX_BYTES é verificada antes de gravar: um áudio que
+não cabe (pelo Content-Length ou pelos bytes já recebidos) interrompe o
+upload, em vez de encher o disco para só então ser recusado pela view
+(`rejected_upload`).
+"""
+import hashlib
+import logging
+import os
+import time
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+
+from . import scratch
+from .metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+AUDIO_UPLOAD_FIELDS = {"audio_file", "reprocess_audio"}
+
+# Assinaturas dos formatos que o navegador e os gravadores costumam enviar
+SIGNATURES = [
+    (0, b"\x1a\x45\xdf\xa3", "webm"),
+    (0, b"OggS", "ogg"),
+    (0, b"RIFF", "wav"),
+    (0, b"fLaC", "flac"),
+    (0, b"ID3", "mp3"),
+    (4, b"ftyp", "m4a"),
+]
+
+
+def sniff_format(header: bytes) -> str:
+    """Formato do áudio pelos primeiros bytes ('' se desconhecido)."""
+    for offset, magic, name in SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            return name
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        return "mp3"  # Frame MPEG sem tag ID3
+    return ""
+
+
+def rejected_upload(request) -> str:
+    """Motivo pelo qual o áudio da requisição foi recusado ('' se não foi)."""
+    return getattr(request, "_audio_upload_rejected", "")
+
+
+class StoredAudioFile(UploadedFile):
+    """
+    Áudio já gravado em AUDIO_JOBS_DIR, com hash e formato calculados.
+
+    Se ninguém assumir o arquivo (`claim`) até o fim da requisição, ele é
+    removido quando o Django fecha os uploads.
+    """
+
+    def __init__(self, path, name, content_type, size, charset, content_type_extra=None):
+        super().__init__(open(path, "w+b"), name, content_type, size, charset, content_type_extra)
+        self.path = path
+        self.sha256 = ""
+        self.format = ""
+        self.claimed = False
+
+    def temporary_file_path(self) -> str:
+        return self.path
+
+    def claim(self) -> tuple[str, str]:
+        """Passa o arquivo para a fila: retorna caminho e SHA-256, sem cópia."""
+        self.file.close()
+        # Renomear no mesmo diretório não copia os dados
+        path = scratch.audio_path(os.path.dirname(self.path), self.format or "webm")
+        os.replace(self.path, path)
+        self.path = path
+        self.claimed = True
+        return self.path, self.sha256
+
+    def close(self):
+        self.file.close()
+        if not self.claimed:
+            scratch.remove(self.path)
+
+
+class AudioUploadHandler(FileUploadHandler):
+    """Grava os campos de áudio direto no diretório da fila; os demais seguem para os handlers padrão."""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.content_length = content_length
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self.file = None
+        if field_name not in AUDIO_UPLOAD_FIELDS:
+            return
+
+        self.free_bytes = scratch.free_bytes()
+        # O Content-Length inclui os outros campos: basta para recusar o que certamente não cabe
+        if self.free_bytes is not None and (self.free_bytes <= 0 or (self.content_length or 0) > self.free_bytes):
+            self._reject()
+
+        path = os.path.join(scratch.create_dir(), "audio.upload")
+        self.file = StoredAudioFile(path, self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.digest = hashlib.sha256()
+        self.header = b""
+        self.write_seconds = 0.0
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.file is None:
+            return raw_data
+        if self.free_bytes is not None and start + len(raw_data) > self.free_bytes:
+            self._reject()
+        if len(self.header) < 16:
+            self.header += raw_data[:16 - len(self.header)]
+        self.digest.update(raw_data)
+        started = time.perf_counter()
+        self.file.write(raw_data)
+        self.write_seconds += time.perf_counter() - started
+        return None
+
+    def file_complete(self, file_size):
+        if self.file is None:
+            return None
+        self.file.flush()
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        self.file.format = sniff_format(self.header)
+        STAGE_SECONDS.observe(self.write_seconds, stage="upload_write")
+        if not self.file.format:
+            logger.warning(f"Formato de áudio não reconhecido em {self.file_name!r} ({file_size} bytes)")
+        return self.file
+
+    def upload_interrupted(self):
+        if self.file is not None:
+            self.file.close()
+
+    def _reject(self):
+        logger.warning(f"Upload de áudio {self.file_name!r} interrompido: cota de AUDIO_SCRATCH_MAX_BYTES atingida")
+        self.request._audio_upload_rejected = scratch.QUOTA_FULL_MESSAGE
+        if self.file is None:
+            # O Django fecha `handler.file` de todos os handlers ao interromper o upload
+            del self.file
+        raise StopUpload(connection_reset=True)
@@ -0,0 +1,187 @@
+"""
+Upload de áudio em partes numeradas (retomável).
+
+O arquivo no disco é sempre reconstruível a partir de `AudioUpload.size`: cada
+parte é gravada a partir desse deslocamento, então uma escrita interrompida é
+simplesmente sobrescrita quando o cliente reenviar a mesma parte.
+"""
+import os
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import scratch
+from .jobs import enqueue_segment_job
+from .metrics import observe_stage
+from .models import AudioJob, AudioUpload
+from .pipeline import SEGMENT_SECONDS
+from .transcription_cache import chain_sha256
+
+logger = logging.getLogger(__name__)
+
+# Folga (segundos) além do fim do segmento antes de transcrevê-lo, para não
+# cortar o segmento antes de o navegador ter enviado todo o seu áudio
+SEGMENT_READY_MARGIN = 5
+
+_EXTENSIONS = {
+    'audio/mp4': '.mp4',
+    'audio/ogg': '.ogg',
+}
+
+
+class UploadError(Exception):
+    """Erro ao receber uma parte do upload."""
+
+
+class UploadClosed(UploadError):
+    """O upload já foi finalizado e não aceita novas partes."""
+
+
+class ChunkOutOfOrder(UploadError):
+    """A parte recebida não é a próxima esperada."""
+
+    def __init__(self, expected_index: int):
+        super().__init__(f"Parte fora de ordem; esperada a parte {expected_index}.")
+        self.expected_index = expected_index
+
+
+def start_upload(user, patient, mime_type: str = '') -> AudioUpload:
+    """Cria a sessão de upload e o arquivo vazio que receberá as partes."""
+    base_type = mime_type.split(';')[0].strip()
+    upload = AudioUpload(user=user, patient=patient, mime_type=mime_type[:100])
+    upload.path = scratch.audio_path(scratch.create_dir(), _EXTENSIONS.get(base_type, '.webm').lstrip('.'))
+    open(upload.path, 'wb').close()
+    upload.save()
+    logger.info(f"Upload {upload.pk} iniciado para o paciente {patient.pk}")
+    return upload
+
+
+def append_chunk(upload: AudioUpload, index: int, data: bytes, end_seconds: float | None = None) -> bool:
+    """
+    Acrescenta a parte `index` ao upload.
+
+    `end_seconds` é o tempo de gravação ao fim da parte, informado pelo
+    navegador; é usado para saber quais segmentos já podem ser transcritos.
+
+    Retorna False quando a parte já havia sido recebida (reenvio após queda
+    de conexão), o que torna o envio idempotente. Levanta `ChunkOutOfOrder`
+    quando faltam partes anteriores e `scratch.ScratchFull` quando a parte
+    não cabe na cota de AUDIO_SCRATCH_MAX_BYTES.
+    """
+    if upload.status != AudioUpload.Status.OPEN:
+        raise UploadClosed("O upload já foi finalizado.")
+    if index < upload.next_index:
+        return False
+    if index > upload.next_index:
+        raise ChunkOutOfOrder(upload.next_index)
+    free = scratch.free_bytes()
+    if free is not None and len(data) > free:
+        raise scratch.ScratchFull(scratch.QUOTA_FULL_MESSAGE)
+
+    offset = upload.size
+    # Upload iniciado antes do hash por partes: sem hash, o job lê o arquivo completo
+    parts_sha256 = chain_sha256(upload.parts_sha256, data) if index == 0 or upload.parts_sha256 else ''
+    with transaction.atomic():
+        # Reserva a parte: só uma requisição avança `next_index` a partir deste estado
+        claimed = AudioUpload.objects.filter(
+            pk=upload.pk,
+            status=AudioUpload.Status.OPEN,
+            next_index=index,
+            size=offset,
+            parts_sha256=upload.parts_sha256,
+        ).update(
+            next_index=F('next_index') + 1,
+            size=F('size') + len(data),
+            parts_sha256=parts_sha256,
+            updated_at=timezone.now(),
+        )
+        if not claimed:
+            upload.refresh_from_db()
+            if upload.status != AudioUpload.Status.OPEN:
+                raise UploadClosed("O upload já foi finalizado.")
+            if index < upload.next_index:
+                return False
+            raise ChunkOutOfOrder(upload.next_index)
+
+        # Se a escrita falhar, a transação desfaz a reserva e o cliente reenvia
+        _write_at(upload.path, offset, data)
+
+    upload.next_index = index + 1
+    upload.size = offset + len(data)
+    upload.parts_sha256 = parts_sha256
+    if end_seconds and end_seconds > upload.duration:
+        AudioUpload.objects.filter(pk=upload.pk, duration__lt=end_seconds).update(duration=end_seconds)
+        upload.duration = end_seconds
+    return True
+
+
+def schedule_ready_segments(upload: AudioUpload) -> int:
+    """
+    Enfileira a transcrição dos segmentos já completamente recebidos.
+
+    Usa as mesmas fronteiras de `segment_window`, então
+    no fim da sessão só o último trecho precisa ser transcrito.
+    """
+    if not settings.AUDIO_INCREMENTAL_TRANSCRIPTION or upload.status != AudioUpload.Status.OPEN:
+        return 0
+
+    ready = int(max(0, upload.duration - SEGMENT_READY_MARGIN) // SEGMENT_SECONDS)
+    scheduled = 0
+    while upload.segments_scheduled < ready:
+        index = upload.segments_scheduled
+        # Só quem avançar o contador enfileira o segmento (evita jobs duplicados)
+        if AudioUpload.objects.filter(pk=upload.pk, segments_scheduled=index).update(
+            segments_scheduled=index + 1
+        ):
+            enqueue_segment_job(upload, index)
+            scheduled += 1
+        upload.refresh_from_db(fields=['segments_scheduled'])
+    return scheduled
+
+
+def cancel_upload(upload: AudioUpload) -> bool:
+    """
+    Descarta um upload ainda aberto (gravação cancelada, ou o navegador passou
+    a enviar o arquivo inteiro) e o áudio já recebido. Retorna False se ele já
+    tinha sido finalizado: o áudio pertence ao prontuário.
+    """
+    open_upload = AudioUpload.objects.filter(pk=upload.pk, status=AudioUpload.Status.OPEN)
+    if not open_upload.exists():
+        return False
+    # Os jobs de segmento do upload são apagados junto, desde que nenhum esteja lendo o áudio
+    deleted, _ = open_upload.exclude(jobs__status=AudioJob.Status.RUNNING).delete()
+    if deleted:
+        scratch.remove(upload.path)
+        logger.info(f"Upload {upload.pk} cancelado")
+    else:
+        # O upload fica para a limpeza de abandonados (ver `stale_uploads`)
+        AudioJob.objects.filter(upload=upload, status=AudioJob.Status.QUEUED).delete()
+        logger.info(f"Upload {upload.pk} cancelado; o áudio é descartado depois do segmento em transcrição")
+    return True
+
+
+def stale_uploads(max_age_seconds: float):
+    """
+    Uploads ainda abertos cuja última parte chegou há mais de `max_age_seconds`:
+    gravações abandonadas ou substituídas pelo envio do arquivo inteiro.
+
+    Os que têm um segmento em transcrição ficam para depois: apagar o upload
+    apagaria também o job em execução.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age_seconds)
+    return AudioUpload.objects.filter(
+        status=AudioUpload.Status.OPEN, updated_at__lt=cutoff
+    ).exclude(jobs__status=AudioJob.Status.RUNNING)
+
+
+def _write_at(path: str, offset: int, data: bytes) -> None:
+    mode = 'r+b' if os.path.exists(path) else 'wb'
+    with observe_stage("upload_write"), open(path, mode) as f:
+        f.seek(offset)
+        f.truncate()
+        f.write(data)
+        f.flush()
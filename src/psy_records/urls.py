@@ -1,5 +1,17 @@
 from django.urls import path
-from .views import PsyRecordCreateView, PsyRecordDetailView, PsyRecordUpdateView, PsyRecordDeleteView
+from .views import (
+    PsyRecordCreateView,
+    PsyRecordDetailView,
+    PsyRecordUpdateView,
+    PsyRecordDeleteView,
+    PsyRecordRegenerateView,
+    PsyRecordRetryView,
+    ProcessingStatusView,
+    AudioUploadCreateView,
+    AudioUploadDetailView,
+    AudioUploadChunkView,
+    AudioUploadFinalizeView,
+)
 
 app_name = "psy_records"
 
@@ -8,4 +20,11 @@ urlpatterns = [
     path('patient/<int:patient_id>/record/<int:pk>/', PsyRecordDetailView.as_view(), name='detail'),
     path('patient/<int:patient_id>/record/<int:pk>/edit/', PsyRecordUpdateView.as_view(), name='update'),
     path('patient/<int:patient_id>/record/<int:pk>/delete/', PsyRecordDeleteView.as_view(), name='delete'),
+    path('patient/<int:patient_id>/record/<int:pk>/regenerate/', PsyRecordRegenerateView.as_view(), name='regenerate'),
+    path('patient/<int:patient_id>/record/<int:pk>/retry/', PsyRecordRetryView.as_view(), name='retry'),
+    path('patient/<int:patient_id>/status/', ProcessingStatusView.as_view(), name='status'),
+    path('patient/<int:patient_id>/uploads/', AudioUploadCreateView.as_view(), name='upload_create'),
+    path('patient/<int:patient_id>/uploads/<uuid:upload_id>/', AudioUploadDetailView.as_view(), name='upload_detail'),
+    path('patient/<int:patient_id>/uploads/<uuid:upload_id>/chunks/<int:index>/', AudioUploadChunkView.as_view(), name='upload_chunk'),
+    path('patient/<int:patient_id>/uploads/<uuid:upload_id>/finalize/', AudioUploadFinalizeView.as_view(), name='upload_finalize'),
 ]
\ No newline at end of file
@@ -1,24 +1,42 @@
-import io
-import json
-import os
-import subprocess
-import tempfile
-import threading
+import hmac
 import logging
 
+from django.conf import settings
+from django.db import transaction
+from django.views import View
 from django.views.generic import CreateView, DetailView, UpdateView, DeleteView
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
-from google import genai
-from google.genai import types
-from pydantic import BaseModel
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 
-from .models import PsyRecord
+from . import scratch
+from .models import AudioJob, AudioUpload, PsyRecord, Transcript
 from patients.models import Patient
 from .forms import PsyRecordForm
+from .jobs import (
+    QueueFull,
+    can_retry,
+    check_admission,
+    enqueue_audio_job,
+    enqueue_summary_job,
+    queue_position,
+    retry_job,
+    store_audio_upload,
+)
+from .idempotency import IdempotentRequest
+from .metrics import REGISTRY
+from .status import status_events, wait_for_status
+from .upload_handlers import rejected_upload
+from .uploads import (
+    ChunkOutOfOrder,
+    UploadClosed,
+    append_chunk,
+    cancel_upload,
+    schedule_ready_segments,
+    start_upload,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -34,12 +52,31 @@ class PsyRecordCreateView(LoginRequiredMixin, CreateView):
         )
         return super().dispatch(request, *args, **kwargs)
 
+    def post(self, request, *args, **kwargs):
+        # Um reenvio do mesmo formulário (mesma chave) não cria outro prontuário
+        self.idempotency = IdempotentRequest(request, f"create:{self.patient.pk}")
+        return self.idempotency.run(super().post, request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["patient"] = self.patient
         return context
 
     def form_valid(self, form):
+        # Verifica se há áudio para processar
+        has_audio = self.request.POST.get("has_audio") == "true"
+        audio_file = self.request.FILES.get("audio_file")
+
+        rejected = rejected_upload(self.request)
+        if has_audio and rejected:
+            return _queue_full_response(self.request, QueueFull(rejected), self.get_success_url())
+
+        if has_audio and audio_file:
+            try:
+                check_admission(self.request.user)
+            except QueueFull as e:
+                return _queue_full_response(self.request, e, self.get_success_url())
+
         form.instance.patient = self.patient
         self.object = form.save(commit=False)
         self.object.content = (
@@ -50,23 +87,11 @@ class PsyRecordCreateView(LoginRequiredMixin, CreateView):
 
         logger.info(f'Começando o processamento via post: {self.patient.full_name}')
 
-        # Verifica se há áudio para processar
-        has_audio = self.request.POST.get("has_audio") == "true"
-        audio_file = self.request.FILES.get("audio_file")
-
         if has_audio and audio_file:
-            logger.info('Criando temp_file')
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".webm")
+            logger.info('Gravando o áudio para a fila de processamento')
             try:
-                logger.info('Iniciando o loop nos chunks')
-                # loop = 0
-                for chunk in audio_file.chunks():
-                    temp_file.write(chunk)
-                    # logger.info(f'{loop} ')
-                    # loop += 1
-                temp_file.close()
-
-                logger.info("Arquivo temporário finalizado")
+                audio_path, audio_sha256 = store_audio_upload(audio_file)
+                logger.info("Arquivo de áudio gravado")
             except Exception:
                 return JsonResponse(
                     {
@@ -75,46 +100,40 @@ class PsyRecordCreateView(LoginRequiredMixin, CreateView):
                         "redirect_url": self.get_success_url(),
                     }
                 )
-            patient_data = {
-                "objectives": self.object.patient.objectives,
-                "clinical_demand": self.object.patient.clinical_demand,
-                "clinical_procedures": self.object.patient.clinical_procedures,
-                "clinical_analysis": self.object.patient.clinical_analysis,
-                "clinical_conclusion": self.object.patient.clinical_conclusion,
-            }
-
-            # Lança uma thread para processar o áudio em segundo plano
-            threading.Thread(
-                target=_process_audio_background,
-                args=(
-                    self.object.id,
-                    self.object.patient.id,
-                    temp_file,
-                    self.request.user.api_key,
-                    PROMPT_TRANSCRIPTION,
-                    self.request.user.system_prompt,
-                    patient_data,
-                ),
-                daemon=True,
-            ).start()
+
+            # Enfileira o processamento; um worker executará em segundo plano
+            job = enqueue_audio_job(self.object, self.request.user, audio_path, audio_sha256)
+            self.idempotency.attach(self.object, job)
+            position = queue_position(job)
 
             if self.request.headers.get("X-Requested-With") == "XMLHttpRequest":
                 return JsonResponse(
                     {
                         "success": True,
-                        "message": "Prontuário criado! O conteúdo será atualizado em background.",
+                        "message": _queued_message(
+                            "Prontuário criado! O conteúdo será atualizado em background.",
+                            position,
+                        ),
+                        "queued": position > 1,
+                        "queue_position": position,
+                        "record_id": self.object.pk,
                         "redirect_url": self.get_success_url(),
-                    }
+                    },
+                    status=202,
                 )
 
             else: # Não é AJAX, mas tem áudio
                 messages.info(
                     self.request,
-                    "Prontuário criado! O conteúdo do áudio será processado em background.",
+                    _queued_message(
+                        "Prontuário criado! O conteúdo do áudio será processado em background.",
+                        position,
+                    ),
                 )
                 return redirect(self.get_success_url())
         # Comportamento normal (sem áudio ou em caso de erro)
         response = super().form_valid(form)
+        self.idempotency.attach(self.object)
 
         # Se for AJAX e chegou até aqui, retorna JSON de sucesso
         if self.request.headers.get("X-Requested-With") == "XMLHttpRequest":
@@ -155,6 +174,22 @@ class PsyRecordDetailView(LoginRequiredMixin, DetailView):
             patient__user=self.request.user, patient_id=self.kwargs["patient_id"]
         )
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["has_transcript"] = Transcript.objects.filter(record=self.object).exists()
+        job = _latest_record_job(self.object)
+        context["can_retry"] = job is not None and can_retry(job)
+        return context
+
+
+def _latest_record_job(record: PsyRecord) -> AudioJob | None:
+    """Último job que gerou (ou tentou gerar) o conteúdo do prontuário."""
+    return (
+        record.audio_jobs.filter(kind__in=[AudioJob.Kind.RECORD, AudioJob.Kind.SUMMARY])
+        .order_by("-created_at", "-pk")
+        .first()
+    )
+
 
 class PsyRecordUpdateView(LoginRequiredMixin, UpdateView):
     model = PsyRecord
@@ -177,33 +212,33 @@ class PsyRecordUpdateView(LoginRequiredMixin, UpdateView):
         return reverse("patients:detail", args=[self.kwargs["patient_id"]])
 
     def post(self, request, *args, **kwargs):
+        # Um reenvio do mesmo áudio (mesma chave) não inicia outro processamento
+        self.idempotency = IdempotentRequest(request, f"reprocess:{kwargs['pk']}")
+        return self.idempotency.run(self.update_or_reprocess, request, *args, **kwargs)
+
+    def update_or_reprocess(self, request, *args, **kwargs):
         self.object = self.get_object()
 
         logger.info('Começando o processamento via post')
 
+        rejected = rejected_upload(request)
+        if rejected:
+            return _queue_full_response(request, QueueFull(rejected), self.get_success_url())
+
         # Caso o usuário tenha enviado áudio para reprocessar
         if "reprocess_audio" in request.FILES:
 
-            user = request.user
-            api_key = user.api_key
-            system_prompt_summary = user.system_prompt
-
-
             audio_file = request.FILES["reprocess_audio"]
 
-            logger.info('Criando temp_file')
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".webm")
             try:
-                logger.info(audio_file.temporary_file_path())
-                logger.info('Iniciando o loop nos chunks')
-                loop = 0
-                for chunk in audio_file.chunks():
-                    temp_file.write(chunk)
-                    # print(f'{loop} ', end='')
-                    loop += 1
-                temp_file.close()
-
-                logger.info("Arquivo temporário finalizado")
+                check_admission(request.user)
+            except QueueFull as e:
+                return _queue_full_response(request, e, self.get_success_url())
+
+            logger.info('Gravando o áudio para a fila de processamento')
+            try:
+                audio_path, audio_sha256 = store_audio_upload(audio_file)
+                logger.info("Arquivo de áudio gravado")
             except Exception:
                 return JsonResponse(
                     {
@@ -212,47 +247,35 @@ class PsyRecordUpdateView(LoginRequiredMixin, UpdateView):
                         "redirect_url": self.get_success_url(),
                     }
                 )
-            
-            patient_data = {
-                "objectives": self.object.patient.objectives,
-                "clinical_demand": self.object.patient.clinical_demand,
-                "clinical_procedures": self.object.patient.clinical_procedures,
-                "clinical_analysis": self.object.patient.clinical_analysis,
-                "clinical_conclusion": self.object.patient.clinical_conclusion,
-            }
-
-            # Lança uma thread para processar o áudio em segundo plano
-            threading.Thread(
-                target=_process_audio_background,
-                args=(
-                    self.object.id,
-                    self.object.patient.id,
-                    temp_file,
-                    api_key,
-                    PROMPT_TRANSCRIPTION,
-                    system_prompt_summary,
-                    patient_data,
-                ),
-                daemon=True,
-            ).start()
 
             # Atualiza o conteúdo temporariamente para indicar processamento
             self.object.content = "[Reprocessando áudio em background...]"
             self.object.save(update_fields=["content"])
 
+            # Enfileira o processamento; um worker executará em segundo plano
+            job = enqueue_audio_job(self.object, request.user, audio_path, audio_sha256)
+            self.idempotency.attach(self.object, job)
+            position = queue_position(job)
+
             if request.headers.get("x-requested-with") == "XMLHttpRequest":
                 return JsonResponse(
                     {
                         "success": True,
-                        "message": "Áudio sendo reprocessado em background!",
+                        "message": _queued_message("Áudio sendo reprocessado em background!", position),
+                        "queued": position > 1,
+                        "queue_position": position,
                         "redirect_url": self.get_success_url(),
-                    }
+                    },
+                    status=202,
                 )
 
             else: # Não é AJAX, mas tem áudio
                 messages.info(
                     self.request,
-                    "Áudio sendo reprocessado em background! O conteúdo será atualizado em breve.""Prontuário criado! O conteúdo do áudio será processado em background.",
+                    _queued_message(
+                        "Áudio sendo reprocessado em background! O conteúdo será atualizado em breve.",
+                        position,
+                    ),
                 )
                 return redirect(self.get_success_url())
             
@@ -260,6 +283,151 @@ class PsyRecordUpdateView(LoginRequiredMixin, UpdateView):
         return super().post(request, *args, **kwargs)
 
 
+class PsyRecordRegenerateView(LoginRequiredMixin, View):
+    """Gera o prontuário de novo a partir da transcrição guardada, sem reenviar o áudio."""
+
+    def get_success_url(self):
+        return reverse("patients:detail", args=[self.kwargs["patient_id"]])
+
+    def post(self, request, *args, **kwargs):
+        record = get_object_or_404(
+            PsyRecord,
+            pk=kwargs["pk"],
+            patient_id=kwargs["patient_id"],
+            patient__user=request.user,
+        )
+        is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+        if not Transcript.objects.filter(record=record).exists():
+            message = "Este prontuário não tem transcrição guardada. Envie o áudio novamente."
+            if is_ajax:
+                return JsonResponse({"success": False, "message": message}, status=400)
+            messages.error(request, message)
+            return redirect("psy_records:detail", record.patient_id, record.pk)
+
+        try:
+            check_admission(request.user)
+        except QueueFull as e:
+            return _queue_full_response(request, e, self.get_success_url())
+
+        record.content = "[Gerando o prontuário novamente a partir da transcrição...]"
+        record.save(update_fields=["content"])
+        job = enqueue_summary_job(record, request.user)
+        position = queue_position(job)
+        message = _queued_message("Prontuário sendo gerado novamente em background!", position)
+
+        if is_ajax:
+            return JsonResponse(
+                {
+                    "success": True,
+                    "message": message,
+                    "queued": position > 1,
+                    "queue_position": position,
+                    "redirect_url": self.get_success_url(),
+                },
+                status=202,
+            )
+        messages.info(request, message)
+        return redirect(self.get_success_url())
+
+
+class PsyRecordRetryView(LoginRequiredMixin, View):
+    """
+    Executa de novo o último processamento do prontuário que falhou,
+    a partir da etapa em que parou (sem transcrever de novo o que já foi).
+    """
+
+    def get_success_url(self):
+        return reverse("patients:detail", args=[self.kwargs["patient_id"]])
+
+    def post(self, request, *args, **kwargs):
+        record = get_object_or_404(
+            PsyRecord,
+            pk=kwargs["pk"],
+            patient_id=kwargs["patient_id"],
+            patient__user=request.user,
+        )
+        is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+        job = _latest_record_job(record)
+        if job is None or not can_retry(job):
+            message = "Não há processamento com falha para tentar novamente. Envie o áudio novamente."
+            if is_ajax:
+                return JsonResponse({"success": False, "message": message}, status=400)
+            messages.error(request, message)
+            return redirect("psy_records:detail", record.patient_id, record.pk)
+
+        try:
+            check_admission(request.user)
+        except QueueFull as e:
+            return _queue_full_response(request, e, self.get_success_url())
+
+        record.content = "[Tentando processar novamente...]"
+        record.save(update_fields=["content"])
+        retry_job(job)
+        position = queue_position(job)
+        message = _queued_message("Processamento retomado em background!", position)
+
+        if is_ajax:
+            return JsonResponse(
+                {
+                    "success": True,
+                    "message": message,
+                    "queued": position > 1,
+                    "queue_position": position,
+                    "redirect_url": self.get_success_url(),
+                },
+                status=202,
+            )
+        messages.info(request, message)
+        return redirect(self.get_success_url())
+
+
+class ProcessingStatusView(LoginRequiredMixin, View):
+    """
+    Andamento do processamento dos prontuários do paciente.
+
+    Com `Accept: text/event-stream` responde com Server-Sent Events; sem ele,
+    funciona como long-poll (`?since=<version>` espera até haver mudança).
+    `?record=<id>` restringe a um prontuário.
+    """
+
+    def get(self, request, *args, **kwargs):
+        patient = get_object_or_404(Patient, id=kwargs["patient_id"], user=request.user)
+        record_id = request.GET.get("record", "")
+        record_id = int(record_id) if record_id.isdigit() else None
+
+        if "text/event-stream" in request.headers.get("Accept", ""):
+            response = StreamingHttpResponse(
+                status_events(patient, record_id), content_type="text/event-stream"
+            )
+            response["Cache-Control"] = "no-cache"
+            # Evita que o nginx segure os eventos em buffer
+            response["X-Accel-Buffering"] = "no"
+            return response
+        return JsonResponse(wait_for_status(patient, record_id, request.GET.get("since")))
+
+
+class MetricsView(View):
+    """
+    Métricas do processamento de áudio no formato do Prometheus.
+
+    Com METRICS_TOKEN, exige `Authorization: Bearer <token>`; sem ele, só
+    usuários da equipe (is_staff) logados podem ver.
+    """
+
+    def get(self, request, *args, **kwargs):
+        token = settings.METRICS_TOKEN
+        if token:
+            provided = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            allowed = hmac.compare_digest(provided.encode(), token.encode())
+        else:
+            allowed = request.user.is_staff
+        if not allowed:
+            return HttpResponseForbidden()
+        return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 class PsyRecordDeleteView(LoginRequiredMixin, DeleteView):
     model = PsyRecord
     template_name = "psy_records/psyrecord_confirm_delete.html"
@@ -279,270 +447,197 @@ class PsyRecordDeleteView(LoginRequiredMixin, DeleteView):
         return reverse("patients:detail", args=[self.kwargs["patient_id"]])
 
 
-# Função auxiliar
 
+class AudioUploadMixin(LoginRequiredMixin):
+    """Resolve o paciente e o upload (sempre do usuário logado)."""
 
-class PsySummaryData(BaseModel):
-    objectives: str
-    clinical_demand: str
-    clinical_procedures: str
-    clinical_analysis: str
-    clinical_conclusion: str
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        self.patient = get_object_or_404(
+            Patient, id=kwargs["patient_id"], user=request.user
+        )
+        if "upload_id" in kwargs:
+            self.upload = get_object_or_404(
+                AudioUpload,
+                pk=kwargs["upload_id"],
+                patient=self.patient,
+                user=request.user,
+            )
+        return super().dispatch(request, *args, **kwargs)
 
+    def upload_state(self, upload: AudioUpload) -> dict:
+        return {
+            "upload_id": str(upload.pk),
+            "status": upload.status,
+            "next_index": upload.next_index,
+            "size": upload.size,
+            "upload_url": reverse(
+                "psy_records:upload_detail", args=[self.patient.id, upload.pk]
+            ),
+        }
 
-class ResultPsySummaryData(PsySummaryData):
-    psy_record: str
 
+class AudioUploadCreateView(AudioUploadMixin, View):
+    """Inicia um upload em partes; chamado quando a gravação começa."""
 
-def _process_audio_background(
-    record_id: int,
-    patient_id: int,
-    audio_file: tempfile._TemporaryFileWrapper,
-    api_key: str,
-    system_prompt_transcription: str,
-    system_prompt_summary: str,
-    patient_data: PsySummaryData,
-):
-    """Executa o processamento com Gemini em background"""
+    def post(self, request, *args, **kwargs):
+        try:
+            check_admission(request.user)
+        except QueueFull as e:
+            return JsonResponse({"success": False, "message": str(e)}, status=503)
 
-    logger.info(f"Iniciando processamento de áudio para record_id: {record_id} - {patient_id}")
-    try:
+        upload = start_upload(request.user, self.patient, request.POST.get("mime_type", ""))
+        return JsonResponse({"success": True, **self.upload_state(upload)}, status=201)
 
-        from psy_records.models import PsyRecord
 
-        try:
-            
-            logger.info('Iniciando a função process_audio_with_gemini')
-            processed_content = process_audio_with_gemini(
-                audio_file,
-                api_key,
-                system_prompt_transcription,
-                system_prompt_summary,
-                patient_data,
-            )
-            patient = Patient.objects.get(id=patient_id)
-            record = PsyRecord.objects.get(id=record_id)
-            if processed_content:
-                patient.objectives = processed_content.get("objectives")
-                patient.clinical_demand = processed_content.get("clinical_demand")
-                patient.clinical_procedures = processed_content.get("clinical_procedures")
-                patient.clinical_analysis = processed_content.get("clinical_analysis")
-                patient.clinical_conclusion = processed_content.get("clinical_conclusion")
-
-                record.content = processed_content.get("psy_record")
-            else:
-                record.content = "⚠ Não foi possível processar o áudio."
-            patient.save(
-                update_fields=[
-                    "objectives",
-                    "clinical_demand",
-                    "clinical_procedures",
-                    "clinical_analysis",
-                    "clinical_conclusion",
-                ]
-            )
-            record.save(update_fields=["content"])
-        except Exception as e:
-            record = PsyRecord.objects.get(id=record_id)
-            record.content = f"⚠ Erro ao processar áudio: {e}"
-            record.save(update_fields=["content"])
-    
-    finally:
-        try:
-            if os.path.exists(audio_file):
-                os.unlink(audio_file)
-                print(f"Arquivo temporário {audio_file} removido.")
-        except Exception:
-            print(f"Falha ao apagar arquivo temporário {audio_file}.")
-
-
-def process_audio_with_gemini(
-    audio_file: tempfile._TemporaryFileWrapper,
-    api_key: str,
-    system_prompt_transcription: str,
-    system_prompt_summary: str,
-    patient_data: PsySummaryData,
-) -> ResultPsySummaryData:
+class AudioUploadDetailView(AudioUploadMixin, View):
     """
-    Processa o arquivo de áudio usando Google Gemini com upload inline
+    Estado do upload, usado pelo navegador para retomar após uma queda.
+
+    DELETE descarta o upload e o áudio recebido até ali.
     """
-    try:
-        # Verifica se o usuário tem API key configurada
-        if not api_key:
-            raise ValueError("API key do Gemini não configurada para este usuário")
 
-        # Configura o Gemini com a API key do usuário
-        client = genai.Client(api_key=api_key)
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({"success": True, **self.upload_state(self.upload)})
 
-        audio_bytes = split_audio_with_ffmpeg_into_chunks(audio_file.name)
+    def delete(self, request, *args, **kwargs):
+        if not cancel_upload(self.upload):
+            return JsonResponse(
+                {"success": False, "message": "O upload já foi finalizado.", **self.upload_state(self.upload)},
+                status=409,
+            )
+        return JsonResponse({"success": True})
 
-        part_list = []
 
-        for i in audio_bytes:
-            part_list.append(types.Part.from_bytes(data=i.getvalue(), mime_type="audio/webm"))
-            i.close()
-        del audio_bytes[:]
+class AudioUploadChunkView(AudioUploadMixin, View):
+    """Recebe a parte `index` do upload no corpo da requisição."""
 
-        logger.info("Enviando requisição de transcrição para o gemini")
-        transcription_response = client.models.generate_content(
-            model="gemini-2.5-flash", contents=[system_prompt_transcription, part_list]
-        )
+    def put(self, request, *args, **kwargs):
+        try:
+            end_seconds = float(request.headers.get("X-Audio-End-Seconds", 0))
+        except ValueError:
+            end_seconds = 0
 
-        del part_list
-
-        import re
-
-        logger.info("Transcrição concluida")
-        patient_data_json = json.dumps(patient_data, ensure_ascii=False)
-        logger.info("Iniciando a produção do prontuário")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                system_prompt_summary,
-                patient_data_json,
-                transcription_response.text,
-            ],
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": ResultPsySummaryData,
-            }
+        try:
+            accepted = append_chunk(self.upload, kwargs["index"], request.body, end_seconds)
+        except ChunkOutOfOrder as e:
+            return JsonResponse(
+                {"success": False, "message": str(e), **self.upload_state(self.upload)},
+                status=409,
+            )
+        except UploadClosed as e:
+            return JsonResponse(
+                {"success": False, "message": str(e), **self.upload_state(self.upload)},
+                status=409,
+            )
+        except scratch.ScratchFull as e:
+            # O navegador guarda a parte e tenta de novo mais tarde
+            return JsonResponse(
+                {"success": False, "message": str(e), **self.upload_state(self.upload)},
+                status=503,
+            )
+        if accepted:
+            schedule_ready_segments(self.upload)
+        return JsonResponse(
+            {"success": True, "duplicate": not accepted, **self.upload_state(self.upload)}
         )
-        logger.info("Prontuário escrito")
-        update_text = response.text
-        json_match = re.search(r"\{.*\}", update_text, re.DOTALL)
-        if json_match:
-            processed_content = json.loads(json_match.group())
-        else:
-            processed_content = {"psy_record": update_text}
-
-        print("### Processamento concluído ###")
-        return processed_content
-
-    except Exception as e:
-        print(f"Erro ao processar áudio com Gemini: {str(e)}")
-        result = {
-            'objectives': '',
-            'clinical_demand': '',
-            'clinical_procedures': '',
-            'clinical_analysis': '',
-            'clinical_conclusion': '',
-            'psy_record': str(e)
-        }
-        return None
 
+    post = put
 
-PROMPT_TRANSCRIPTION = """
-Você é um transcritor clínico. Sua tarefa é transcrever a gravação da sessão verbalizando trocas entre participantes.
 
-Regras obrigatórias:
-1) Responda EXCLUSIVAMENTE com um único OBJETO JSON válido (UTF-8) e nada mais.
-2) O objeto JSON deve conter a chave "transcription" (string). Não inclua outras chaves.
-3) A transcrição deve diferenciar falantes usando rótulos padronizados em português: "Psicólogo:", "Paciente:", "Familiar:", "Outro:" (use apenas os rótulos relevantes).
-4) Separe cada fala em nova linha com o rótulo do falante no início da linha. Exemplo: "Paciente: ...\nPsicólogo: ...".
-5) Preserve o conteúdo verbal (transcreva literalmente quando possível). Para trechos inaudíveis, insira o marcador "[inaudível]".
-6) NÃO inclua timestamps, metadados ou comentários. NÃO generalize nomes automaticamente — se houver identificação direta, substitua por "[parente]" ou "[local]" e anote nada mais além da transcrição.
-7) Não tente resumir, interpretar ou corrigir o texto; faça transcrição fiel.
-8) Se não der para identificar o falante em um trecho, use "Outro:".
-Fim.
-"""
+class AudioUploadFinalizeView(AudioUploadMixin, View):
+    """
+    Cria o prontuário com o áudio já recebido e enfileira o processamento.
 
-def split_audio_with_ffmpeg_into_chunks(input_filepath: str, max_chunk_size_mb: int = 19) -> list[io.BytesIO] | None:
+    Repetir a finalização devolve o mesmo prontuário em vez de criar outro.
     """
-    Divide um arquivo de áudio grande em múltiplos arquivos menores (chunks) usando FFmpeg,
-    limitando o tamanho de cada chunk. Os chunks são retornados como uma lista de io.BytesIO.
 
-    Args:
-        input_filepath: Caminho completo para o arquivo de áudio de entrada.
-        max_chunk_size_mb: Tamanho máximo desejado para cada chunk em megabytes.
+    def post(self, request, *args, **kwargs):
+        upload = self.upload
+        redirect_url = reverse("patients:detail", args=[self.patient.id])
 
-    Returns:
-        Uma lista de objetos io.BytesIO, cada um contendo um chunk de áudio,
-        ou None em caso de falha.
-    """
-    chunk_buffers = []
-    temp_dir = None # Para gerenciar arquivos temporários de saída do ffmpeg
-
-    try:
-        # 1. Obter informações do arquivo de entrada para estimar a duração por MB
-        # Usamos ffprobe para isso
-        ffprobe_command = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration,size',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            input_filepath
-        ]
-        
-        logger.debug(f"Executando ffprobe: {' '.join(ffprobe_command)}")
-        ffprobe_result = subprocess.run(ffprobe_command, check=True, capture_output=True, text=True)
-        duration_str, size_bytes_str = ffprobe_result.stdout.strip().split('\n')
-        print(f"Duration_str: {duration_str}, size_bytes: {size_bytes_str}")
-        total_size_bytes = int(size_bytes_str)
-        
-        if total_size_bytes == 0:
-            logger.error(f"Arquivo de entrada {input_filepath} tem tamanho 0.")
-            return None
-
-             
-        # 2. Criar um diretório temporário para os arquivos de saída do FFmpeg
-        # O ffmpeg pode criar vários arquivos de saída, então um diretório é melhor
-        temp_dir = tempfile.mkdtemp()
-        output_filename_pattern = os.path.join(temp_dir, "chunk_%03d.webm") # Saída sempre em webm para consistência
-        
-        # 3. Comando FFmpeg para dividir o áudio
-        # Usamos `-segment_time` para dividir por tempo. Pode ser um pouco impreciso em tamanho,
-        # mas é a forma mais fácil de dividir sem reencodar todo o arquivo múltiplas vezes.
-        # `-f segment` e `-segment_times` seriam mais precisos, mas um pouco mais complexos.
-        # `-map 0` mapeia todos os streams de entrada para saída
-        # `-c copy` tenta copiar os streams sem re-encodificar para velocidade,
-        # mas pode não ser possível se a divisão cair no meio de um frame ou se o codec não suportar.
-        # Se for preciso re-encodificar (ex: para garantir WebM e controle de bitrate), mude `-c copy`
-        # para `-c:a libopus -b:a 64k` (ou outro codec/bitrate).
-        # Por simplicidade e velocidade, tentaremos `-c copy` primeiro.
-        
-        # Se você quer garantir a saída em WEBM e um tamanho aproximado, é melhor re-encodificar.
-        # Vamos usar re-encodificação para garantir consistência e controle de tamanho.
-        ffmpeg_split_command = [
-            'ffmpeg',
-            '-i', input_filepath,       # Arquivo de entrada
-            '-map', '0',                # Mapeia todos os streams (áudio)
-            '-f', 'segment',            # Usa o muxer de segmento
-            '-segment_time', str(600), # Divide por tempo
-            '-c:a', 'libopus',          # Codec de áudio para WebM (garantir formato)
-            '-b:a', '64k',              # Bitrate para controlar tamanho
-            '-vbr', 'on',               # VBR para Opus
-            '-compression_level', '10', # Nível de compressão
-            output_filename_pattern     # Padrão de nome de arquivo de saída
-        ]
-
-        logger.info(f"Executando FFmpeg split: {' '.join(ffmpeg_split_command)}")
-        subprocess.run(ffmpeg_split_command, check=True, capture_output=True, text=True)
-        logger.info(f"FFmpeg split concluído no diretório temporário: {temp_dir}")
-
-        # 4. Ler os arquivos divididos para io.BytesIO
-        for filename in sorted(os.listdir(temp_dir)):
-            chunk_filepath = os.path.join(temp_dir, filename)
-            if os.path.isfile(chunk_filepath):
-                with open(chunk_filepath, 'rb') as f:
-                    chunk_buffer = io.BytesIO(f.read())
-                    chunk_buffers.append(chunk_buffer)
-                logger.debug(f"Lido chunk {filename} para buffer em memória (tamanho: {chunk_buffer.getbuffer().nbytes / (1024*1024):.2f}MB).")
-        
-        if not chunk_buffers:
-            logger.warning(f"FFmpeg não gerou nenhum chunk para {input_filepath}.")
-            return None
-
-        return chunk_buffers
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Erro FFmpeg/ffprobe ao dividir áudio: {e.stderr}", exc_info=True)
-        return None
-    except Exception as e:
-        logger.error(f"Erro inesperado ao dividir áudio em chunks: {e}", exc_info=True)
-        return None
-    finally:
-        # Limpar o diretório temporário e seus conteúdos
-        if temp_dir and os.path.exists(temp_dir):
-            import shutil
-            shutil.rmtree(temp_dir)
-            logger.info(f"Diretório temporário {temp_dir} e seus conteúdos removidos.")
\ No newline at end of file
+        if upload.status == AudioUpload.Status.FINALIZED:
+            return self.accepted_response(upload.record, redirect_url)
+
+        total_chunks = request.POST.get("total_chunks", "")
+        if total_chunks.isdigit() and int(total_chunks) != upload.next_index:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": "Ainda faltam partes do áudio.",
+                    **self.upload_state(upload),
+                },
+                status=409,
+            )
+        if upload.size == 0:
+            return JsonResponse(
+                {"success": False, "message": "Nenhum áudio foi recebido."}, status=400
+            )
+
+        form = PsyRecordForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": "Erro nos dados do formulário",
+                    "errors": form.errors,
+                }
+            )
+
+        with transaction.atomic():
+            finalized = AudioUpload.objects.filter(
+                pk=upload.pk, status=AudioUpload.Status.OPEN
+            ).update(status=AudioUpload.Status.FINALIZED)
+            if not finalized:
+                # Outra requisição finalizou o mesmo upload ao mesmo tempo
+                upload.refresh_from_db()
+                return self.accepted_response(upload.record, redirect_url)
+
+            record = form.save(commit=False)
+            record.patient = self.patient
+            record.content = record.content or "[Processando áudio em background...]"
+            record.save()
+            AudioUpload.objects.filter(pk=upload.pk).update(record=record)
+            enqueue_audio_job(record, request.user, upload.path, upload.parts_sha256)
+
+        logger.info(f"Upload {upload.pk} finalizado no prontuário {record.pk}")
+        return self.accepted_response(record, redirect_url)
+
+    def accepted_response(self, record, redirect_url):
+        job = record.audio_jobs.order_by("-created_at").first() if record else None
+        position = queue_position(job) if job else 0
+        return JsonResponse(
+            {
+                "success": True,
+                "message": _queued_message(
+                    "Prontuário criado! O conteúdo será atualizado em background.",
+                    position,
+                ),
+                "queued": position > 1,
+                "queue_position": position,
+                "redirect_url": redirect_url,
+            },
+            status=202,
+        )
+
+
+def _queued_message(message: str, position: int) -> str:
+    """Acrescenta a posição na fila quando o job não for o próximo a rodar."""
+    if position > 1:
+        return f"{message} O áudio está na fila de processamento (posição {position})."
+    return message
+
+
+def _queue_full_response(request, error: QueueFull, redirect_url: str):
+    if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return JsonResponse(
+            {
+                "success": False,
+                "message": str(error),
+                "redirect_url": redirect_url,
+            },
+            status=503,
+        )
+    messages.error(request, str(error))
+    return redirect(redirect_url)
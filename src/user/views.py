@@ -7,6 +7,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView, PasswordChangeView
 from django.urls import reverse_lazy
 from django.views.generic import UpdateView
+from psy_records.gemini_clients import invalidate_client
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, UserUpdateForm
 
 
@@ -51,6 +52,9 @@ class UserUpdateView(LoginRequiredMixin, UpdateView):
         return self.request.user
 
     def form_valid(self, form):
+        if "api_key" in form.changed_data:
+            # O cliente do Gemini da chave antiga não deve mais ser usado
+            invalidate_client(form.initial.get("api_key") or "")
         messages.success(self.request, "Seus dados foram atualizados com sucesso!")
         return super().form_valid(form)
 